@@ -1,7 +1,6 @@
 
 import random
 import json
-import time
 from collections import defaultdict
 from datetime import datetime, timedelta
 from threading import Thread
@@ -14,6 +13,8 @@ from chaosgarden.alicloud import (AliyunBot)
 
 from chaosgarden.util import (norm_filters, validate_duration, validate_mode,
                               validate_zone)
+from chaosgarden.util.engine import cooperative
+from chaosgarden.util.scheduler import Scheduler
 from chaosgarden.util.terminator import Terminator
 from chaosgarden.util.threading import launch_thread
 
@@ -87,6 +88,7 @@ def run_compute_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_compute_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_compute_failure_simulation(
         mode: str = 'terminate', # modes: 'terminate'|'restart'
         min_runtime: int = 0,
@@ -121,25 +123,26 @@ def run_compute_failure_simulation(
 
     # mess up instances continuously until terminated
     logger.info(f'Messing up instances matching {instance_filter} in zone {zone} ({mode} between {min_runtime}s and {max_runtime}s).')
-    schedule_by_id = {}
+    scheduler = Scheduler()
     terminator = Terminator(duration)
     while not terminator.is_terminated():
         try:
             instance_list, the_vpc = get_impact_instance_and_vpc(alibot, instance_tag_key, vpc_name, [zone])
-            for instance in instance_list:
-                instance_id = instance['InstanceId']
-                if instance_id not in schedule_by_id:
-                    schedule_by_id[instance_id] = datetime.now().astimezone() + timedelta(seconds = random.randint(min_runtime, max_runtime))
-                    logger.info(f'Scheduled virtual machine to {mode}: {instance_id} at {schedule_by_id[instance_id]}')
-                if datetime.now().astimezone() > schedule_by_id[instance_id]:
-                    schedule_by_id[instance_id] = datetime.now().astimezone() + reschedule_timedelta
-                    if not operation(InstId=instance_id):
-                        logger.error(f'Virtual machine:{instance_id} failed to {mode} ')
-                        schedule_by_id[instance_id] = datetime.now().astimezone() + timedelta(seconds = 1)
+            instance_ids = {instance['InstanceId'] for instance in instance_list}
+            for instance_id in instance_ids:
+                if instance_id not in scheduler:
+                    scheduler.schedule(instance_id, datetime.now().astimezone() + timedelta(seconds = random.randint(min_runtime, max_runtime)))
+                    logger.info(f'Scheduled virtual machine to {mode}: {instance_id} at {scheduler.get(instance_id)}')
+            scheduler.retain(instance_ids)
+            for instance_id in scheduler.pop_due(eligible = lambda instance_id: instance_id in instance_ids):
+                scheduler.schedule(instance_id, datetime.now().astimezone() + reschedule_timedelta)
+                if not operation(InstId=instance_id):
+                    logger.error(f'Virtual machine:{instance_id} failed to {mode} ')
+                    scheduler.schedule(instance_id, datetime.now().astimezone() + timedelta(seconds = 1))
         except Exception as e:
             logger.error(f'Virtual machines failed to {mode}: {type(e)}: {e}')
         finally:
-            time.sleep(2)
+            yield terminator.pause(scheduler.wait_time(2))
 
 
 
@@ -158,6 +161,7 @@ def run_network_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_network_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_network_failure_simulation(
         mode: str = 'total', # modes: 'total'|'ingress'|'egress'
         zone: str = None,
@@ -192,7 +196,7 @@ def run_network_failure_simulation(
     # wait until terminated
     terminator = Terminator(duration)
     while not terminator.is_terminated():
-        time.sleep(1)
+        yield terminator.pause(1)
 
     # rollback
     rollback_network_failure_simulation(mode, zone, filters, configuration, secrets)
@@ -1,6 +1,5 @@
 import hashlib
 import random
-import time
 from collections import defaultdict
 from datetime import datetime, timedelta
 from threading import Thread
@@ -14,6 +13,8 @@ from logzero import logger
 
 from chaosgarden.util import (norm_filters, validate_duration, validate_mode,
                               validate_zone)
+from chaosgarden.util.engine import cooperative
+from chaosgarden.util.scheduler import Scheduler
 from chaosgarden.util.terminator import Terminator
 from chaosgarden.util.threading import launch_thread
 
@@ -76,6 +77,7 @@ def run_compute_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_compute_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_compute_failure_simulation(
         mode: str = 'terminate', # modes: 'terminate'|'restart'
         min_runtime: int = 0,
@@ -108,26 +110,26 @@ def run_compute_failure_simulation(
     logger.info(f'Messing up instances matching {instances_filter} in zone {zone} ({mode} between {min_runtime}s and {max_runtime}s).')
     instances_filter = list(instances_filter)
     instances_filter.append({'Name': 'availability-zone', 'Values': [zone]})
-    schedule_by_id = {}
+    scheduler = Scheduler()
     terminator = Terminator(duration)
     while not terminator.is_terminated():
         try:
             instances_by_type = defaultdict(list)
-            for instance in list_instances(client, instances_filter):
-                instance_id = instance['InstanceId']
-                if eligible(instance):
-                    if instance_id not in schedule_by_id:
-                        schedule_by_id[instance_id] = instance['LaunchTime'] + timedelta(seconds = random.randint(min_runtime, max_runtime))
-                        logger.info(f'Scheduled instance to {mode}: {instance_id} at {schedule_by_id[instance_id]}')
-                    if datetime.now().astimezone() > schedule_by_id[instance_id]:
-                        schedule_by_id[instance_id] = datetime.now().astimezone() + reschedule_timedelta
-                        instances_by_type[instance.get('InstanceLifecycle', 'normal')].append(instance_id)
+            instance_by_id = {instance['InstanceId']: instance for instance in list_instances(client, instances_filter)}
+            for instance_id, instance in instance_by_id.items():
+                if eligible(instance) and instance_id not in scheduler:
+                    scheduler.schedule(instance_id, instance['LaunchTime'] + timedelta(seconds = random.randint(min_runtime, max_runtime)))
+                    logger.info(f'Scheduled instance to {mode}: {instance_id} at {scheduler.get(instance_id)}')
+            scheduler.retain(instance_by_id.keys())
+            for instance_id in scheduler.pop_due(eligible = lambda instance_id: instance_id in instance_by_id and eligible(instance_by_id[instance_id])):
+                scheduler.schedule(instance_id, datetime.now().astimezone() + reschedule_timedelta)
+                instances_by_type[instance_by_id[instance_id].get('InstanceLifecycle', 'normal')].append(instance_id)
             operation(instances_by_type, client)
         except Exception as e:
             logger.error(f'Instances failed to {mode}: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(1)
+            yield terminator.pause(scheduler.wait_time(1))
 
 
 #############################################
@@ -143,6 +145,7 @@ def run_network_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_network_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_network_failure_simulation(
         mode: str = 'total', # modes: 'total'|'ingress'|'egress'
         zone: str = None,
@@ -170,7 +173,7 @@ def run_network_failure_simulation(
     # wait until terminated
     terminator = Terminator(duration)
     while not terminator.is_terminated():
-        time.sleep(1)
+        yield terminator.pause(1)
 
     # rollback
     rollback_network_failure_simulation(mode, zone, filters, configuration, secrets)
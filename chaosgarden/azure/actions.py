@@ -1,6 +1,5 @@
 import hashlib
 import random
-import time
 from datetime import datetime, timedelta
 from threading import Thread
 from typing import Dict
@@ -15,6 +14,8 @@ from chaosgarden.azure import (AzureClient, azure_client, create_nsg,
                                wait_on_operation, wait_on_operations)
 from chaosgarden.util import (norm_filters, validate_duration, validate_mode,
                               validate_zone)
+from chaosgarden.util.engine import cooperative
+from chaosgarden.util.scheduler import Scheduler
 from chaosgarden.util.terminator import Terminator
 from chaosgarden.util.threading import launch_thread
 
@@ -70,6 +71,7 @@ def run_compute_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_compute_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_compute_failure_simulation(
         mode: str = 'terminate', # modes: 'terminate'|'restart'
         min_runtime: int = 0,
@@ -100,29 +102,30 @@ def run_compute_failure_simulation(
 
     # mess up instances continuously until terminated
     logger.info(f'Messing up virtual machines matching `{virtual_machines_filter}` in zone {region}-{zone} ({mode} between {min_runtime}s and {max_runtime}s).')
-    schedule_by_name = {}
+    scheduler = Scheduler()
     terminator = Terminator(duration)
     while not terminator.is_terminated():
         try:
-            for vm in list_vms(client, resource_group, zone, virtual_machines_filter):
-                vm_name = vm.name
+            vm_names = {vm.name for vm in list_vms(client, resource_group, zone, virtual_machines_filter)}
+            for vm_name in vm_names:
+                # strangely, the Azure VM resource contains neither status nor creation timestamp
+                if vm_name not in scheduler:
+                    scheduler.schedule(vm_name, datetime.now().astimezone() + timedelta(seconds = random.randint(min_runtime, max_runtime)))
+                    logger.info(f'Scheduled virtual machine to {mode}: {vm_name} at {scheduler.get(vm_name)}')
+            scheduler.retain(vm_names)
+            for vm_name in scheduler.pop_due(eligible = lambda vm_name: vm_name in vm_names):
                 try:
-                    # strangely, the Azure VM resource contains neither status nor creation timestamp
-                    if vm_name not in schedule_by_name:
-                        schedule_by_name[vm_name] = datetime.now().astimezone() + timedelta(seconds = random.randint(min_runtime, max_runtime))
-                        logger.info(f'Scheduled virtual machine to {mode}: {vm_name} at {schedule_by_name[vm_name]}')
-                    if datetime.now().astimezone() > schedule_by_name[vm_name]:
-                        schedule_by_name[vm_name] = datetime.now().astimezone() + reschedule_timedelta
-                        operation(client, resource_group, zone, vm_name)
+                    scheduler.schedule(vm_name, datetime.now().astimezone() + reschedule_timedelta)
+                    operation(client, resource_group, zone, vm_name)
                 except Exception as e:
                     logger.error(f'Virtual machine failed to {mode}: {type(e)}: {e}')
                     # logger.error(traceback.format_exc())
-                    schedule_by_name[vm_name] = datetime.now().astimezone() + timedelta(seconds = 1)
+                    scheduler.schedule(vm_name, datetime.now().astimezone() + timedelta(seconds = 1))
         except Exception as e:
             logger.error(f'Virtual machines failed to {mode}: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(2)
+            yield terminator.pause(scheduler.wait_time(2))
 
 
 #############################################
@@ -138,6 +141,7 @@ def run_network_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_network_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_network_failure_simulation(
         mode: str = 'total', # modes: 'total'|'ingress'|'egress'
         zone: str = None,
@@ -172,7 +176,7 @@ def run_network_failure_simulation(
             logger.error(f'Virtual machine blocking failed: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(2)
+            yield terminator.pause(2)
 
     # rollback
     rollback_network_failure_simulation(mode, zone, filters, configuration, secrets)
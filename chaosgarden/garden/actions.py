@@ -12,6 +12,7 @@ from chaosgarden.garden import get_kubeconfig
 from chaosgarden.k8s import supplement_selector, to_authenticator
 from chaosgarden.k8s.actions import run_pod_failure_simulation
 from chaosgarden.k8s.api.cluster import API, Cluster
+from chaosgarden.util.engine import cooperative
 from chaosgarden.util.threading import launch_thread
 
 __all__ = [
@@ -47,6 +48,7 @@ def run_control_plane_pod_failure_simulation_in_background(
         secrets: Dict = None) -> Thread:
     return launch_thread(target = run_control_plane_pod_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_control_plane_pod_failure_simulation(
         min_runtime: int = 0,
         max_runtime: int = 0,
@@ -69,7 +71,7 @@ def run_control_plane_pod_failure_simulation(
         pod_owner_selector = pod_owner_selector,
         configuration = configuration,
         secrets = secrets)
-    return run_pod_failure_simulation(
+    return (yield from run_pod_failure_simulation.steps(
         min_runtime = min_runtime,
         max_runtime = max_runtime,
         grace_period = grace_period,
@@ -78,7 +80,7 @@ def run_control_plane_pod_failure_simulation(
         pod_metadata_selector = pod_metadata_selector,
         pod_owner_selector = pod_owner_selector,
         duration = duration,
-        secrets = secrets)
+        secrets = secrets))
 
 
 ############################################
@@ -100,6 +102,7 @@ def run_system_components_pod_failure_simulation_in_background(
         secrets: Dict = None) -> Thread:
     return launch_thread(target = run_system_components_pod_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_system_components_pod_failure_simulation(
         min_runtime: int = 0,
         max_runtime: int = 0,
@@ -123,7 +126,7 @@ def run_system_components_pod_failure_simulation(
         pod_owner_selector = pod_owner_selector,
         configuration = configuration,
         secrets = secrets)
-    return run_pod_failure_simulation(
+    return (yield from run_pod_failure_simulation.steps(
         min_runtime = min_runtime,
         max_runtime = max_runtime,
         grace_period = grace_period,
@@ -132,7 +135,7 @@ def run_system_components_pod_failure_simulation(
         pod_metadata_selector = pod_metadata_selector,
         pod_owner_selector = pod_owner_selector,
         duration = duration,
-        secrets = secrets)
+        secrets = secrets))
 
 
 ##################################
@@ -154,6 +157,7 @@ def run_general_pod_failure_simulation_in_background(
         secrets: Dict = None) -> Thread:
     return launch_thread(target = run_general_pod_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_general_pod_failure_simulation(
         min_runtime: int = 0,
         max_runtime: int = 0,
@@ -177,7 +181,7 @@ def run_general_pod_failure_simulation(
         pod_owner_selector = pod_owner_selector,
         configuration = configuration,
         secrets = secrets)
-    return run_pod_failure_simulation(
+    return (yield from run_pod_failure_simulation.steps(
         min_runtime = min_runtime,
         max_runtime = max_runtime,
         grace_period = grace_period,
@@ -186,7 +190,7 @@ def run_general_pod_failure_simulation(
         pod_metadata_selector = pod_metadata_selector,
         pod_owner_selector = pod_owner_selector,
         duration = duration,
-        secrets = secrets)
+        secrets = secrets))
 
 
 #################################
@@ -222,6 +226,7 @@ def run_cloud_provider_compute_failure_simulation_in_background(
         secrets: Dict = None) -> Thread:
     return launch_thread(target = run_cloud_provider_compute_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_cloud_provider_compute_failure_simulation(
         mode: str = 'terminate',
         min_runtime: int = 0,
@@ -234,7 +239,7 @@ def run_cloud_provider_compute_failure_simulation(
         zone,
         configuration,
         secrets)
-    return simulation(
+    return (yield from simulation.steps(
         mode = mode,
         min_runtime = min_runtime,
         max_runtime = max_runtime,
@@ -242,7 +247,7 @@ def run_cloud_provider_compute_failure_simulation(
         filters = filters,
         duration = duration,
         configuration = configuration,
-        secrets = secrets)
+        secrets = secrets))
 
 
 #############################################
@@ -257,6 +262,7 @@ def run_cloud_provider_network_failure_simulation_in_background(
         secrets: Dict = None) -> Thread:
     return launch_thread(target = run_cloud_provider_network_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_cloud_provider_network_failure_simulation(
         mode: str = 'total',
         zone: Union[int, str] = None,
@@ -267,13 +273,13 @@ def run_cloud_provider_network_failure_simulation(
         zone,
         configuration,
         secrets)
-    return simulation(
+    return (yield from simulation.steps(
         mode = mode,
         zone = zone,
         filters = filters,
         duration = duration,
         configuration = configuration,
-        secrets = secrets)
+        secrets = secrets))
 
 def rollback_cloud_provider_network_failure_simulation(
         mode: str = 'total',
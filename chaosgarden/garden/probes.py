@@ -11,6 +11,7 @@ from chaosgarden.k8s.probe.thresholds import Thresholds
 from chaosgarden.k8s.probes import (list_cluster_key_resources,
                                     rollback_cluster_health_probe,
                                     run_cluster_health_probe)
+from chaosgarden.util.engine import cooperative
 from chaosgarden.util.threading import launch_thread
 
 __all__ = [
@@ -53,14 +54,23 @@ def list_shoot_cluster_key_resources(
 def run_shoot_cluster_health_probe_in_background(
         duration: int = 0,
         thresholds: Dict = None,
+        terminate_on_violation: bool = False,
+        heartbeat_window: int = 0,
+        probe_interval: float = 1,
+        heartbeat_retention: int = 0,
         configuration: Dict = None,
         secrets: Dict = None) -> Thread:
     return launch_thread(target = run_shoot_cluster_health_probe, kwargs = locals())
 
+@cooperative
 def run_shoot_cluster_health_probe(
         duration: int = 0,
         thresholds: Dict = None,
         silent: bool = False,
+        terminate_on_violation: bool = False,
+        heartbeat_window: int = 0,
+        probe_interval: float = 1,
+        heartbeat_retention: int = 0,
         configuration: Dict = None,
         secrets: Dict = None):
     secrets, spec = resolve_secrets_and_spec(
@@ -72,19 +82,25 @@ def run_shoot_cluster_health_probe(
         # substitute technical numbered zone with Kubernetes named zone that will be used as label at nodes (e.g. Azure)
         kubernetes_zones.add(f'{spec.region}-{zone}' if zone.isnumeric() else zone)
     thresholds = Thresholds.from_dict(thresholds).substitute_zones(dict(enumerate(sorted(kubernetes_zones)))).to_dict()
-    return run_cluster_health_probe(
+    return (yield from run_cluster_health_probe.steps(
         duration = duration,
         thresholds = thresholds,
         silent = silent,
-        secrets = secrets)
+        terminate_on_violation = terminate_on_violation,
+        heartbeat_window = heartbeat_window,
+        probe_interval = probe_interval,
+        heartbeat_retention = heartbeat_retention,
+        secrets = secrets))
 
 def rollback_shoot_cluster_health_probe(
+        heartbeat_retention: int = None,
         configuration: Dict = None,
         secrets: Dict = None):
     secrets, _ = resolve_secrets_and_spec(
         configuration = configuration,
         secrets = secrets)
     return rollback_cluster_health_probe(
+        heartbeat_retention = heartbeat_retention,
         secrets = secrets)
 
 
@@ -1,6 +1,5 @@
 import hashlib
 import random
-import time
 from datetime import datetime, timedelta
 from threading import Thread
 from typing import Dict, Tuple
@@ -17,6 +16,8 @@ from chaosgarden.gcp import (create_firewall, delete_firewall, list_firewalls,
                              wait_on_zonal_operations)
 from chaosgarden.util import (norm_filters, validate_duration, validate_mode,
                               validate_zone)
+from chaosgarden.util.engine import cooperative
+from chaosgarden.util.scheduler import Scheduler
 from chaosgarden.util.terminator import Terminator
 from chaosgarden.util.threading import launch_thread
 
@@ -75,6 +76,7 @@ def run_compute_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_compute_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_compute_failure_simulation(
         mode: str = 'terminate', # modes: 'terminate'|'restart'
         min_runtime: int = 0,
@@ -106,29 +108,29 @@ def run_compute_failure_simulation(
 
     # mess up instances continuously until terminated
     logger.info(f'Messing up instances matching `{instances_filter}` in zone {zone} ({mode} between {min_runtime}s and {max_runtime}s).')
-    schedule_by_name = {}
+    scheduler = Scheduler()
     terminator = Terminator(duration)
     while not terminator.is_terminated():
         try:
-            for instance in list_instances(client, project, zone, instances_filter):
-                instance_name = instance['name']
+            instance_by_name = {instance['name']: instance for instance in list_instances(client, project, zone, instances_filter)}
+            for instance_name, instance in instance_by_name.items():
+                if eligible(instance) and instance_name not in scheduler:
+                    scheduler.schedule(instance_name, datetime.fromisoformat(instance['creationTimestamp']) + timedelta(seconds = random.randint(min_runtime, max_runtime)))
+                    logger.info(f'Scheduled instance to {mode}: {instance_name} at {scheduler.get(instance_name)}')
+            scheduler.retain(instance_by_name.keys())
+            for instance_name in scheduler.pop_due(eligible = lambda instance_name: instance_name in instance_by_name and eligible(instance_by_name[instance_name])):
                 try:
-                    if eligible(instance):
-                        if instance_name not in schedule_by_name:
-                            schedule_by_name[instance_name] = datetime.fromisoformat(instance['creationTimestamp']) + timedelta(seconds = random.randint(min_runtime, max_runtime))
-                            logger.info(f'Scheduled instance to {mode}: {instance_name} at {schedule_by_name[instance_name]}')
-                        if datetime.now().astimezone() > schedule_by_name[instance_name]:
-                            schedule_by_name[instance_name] = datetime.now().astimezone() + reschedule_timedelta
-                            operation(client, project, zone, instance_name)
+                    scheduler.schedule(instance_name, datetime.now().astimezone() + reschedule_timedelta)
+                    operation(client, project, zone, instance_name)
                 except Exception as e:
                     logger.error(f'Instance failed to {mode}: {type(e)}: {e}')
                     # logger.error(traceback.format_exc())
-                    schedule_by_name[instance_name] = datetime.now().astimezone() + timedelta(seconds = 1)
+                    scheduler.schedule(instance_name, datetime.now().astimezone() + timedelta(seconds = 1))
         except Exception as e:
             logger.error(f'Instances failed to {mode}: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(1)
+            yield terminator.pause(scheduler.wait_time(1))
 
 
 #############################################
@@ -144,6 +146,7 @@ def run_network_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_network_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_network_failure_simulation(
         mode: str = 'total', # modes: 'total'|'ingress'|'egress' with possible suffix '_with_instance_restart' to restart instead of suspend/resume the instance to terminate existing connections (see suspend/resume limitations https://cloud.google.com/compute/docs/instances/suspend-resume-instance#limitations)
         zone: str = None,
@@ -180,7 +183,7 @@ def run_network_failure_simulation(
             logger.error(f'Instance blocking failed: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(1)
+            yield terminator.pause(1)
 
     # rollback
     rollback_network_failure_simulation(mode, zone, filters, configuration, secrets)
@@ -1,15 +1,28 @@
 import os
 import re
-from typing import Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Set, Tuple
 
 from box import Box
 from chaoslib.types import Secrets
+from logzero import logger
 
 from chaosgarden.k8s.api.authenticators import (Authenticator,
                                                 ConfigAsDictAuthenticator,
                                                 ConfigAsFileAuthenticator,
                                                 ConfigAsYamlAuthenticator)
 from chaosgarden.k8s.api.cluster import API, Cluster
+from chaosgarden.k8s.api.projections import (LeaseProjection, NodeProjection,
+                                             PodProjection)
+
+_MISSING = object()
+
+MAX_LIST_FAN_OUT = 10 # maximum number of parallel lists/watches a selection may be split into (per namespace and/or node)
+FIELD_SELECTOR_PATHS = {'name': 'metadata.name', 'namespace': 'metadata.namespace'}
+NAME_PATTERN = re.compile(r'^[a-z0-9]([-a-z0-9.]*[a-z0-9])?$')
+LABEL_KEY_PATTERN = re.compile(r'^([a-z0-9]([-a-z0-9.]*[a-z0-9])?/)?[A-Za-z0-9]([-A-Za-z0-9_.]*[A-Za-z0-9])?$')
+LABEL_VALUE_PATTERN = re.compile(r'^(([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])?$')
+LITERAL_ALTERNATIVES_PATTERN = re.compile(r'^\(([A-Za-z0-9_-]+(\|[A-Za-z0-9_-]+)*)\)\$$|^([A-Za-z0-9_-]+)\$$') # e.g. `(a|b|c)$` or `a$`
 
 
 class SelectorRequirement():
@@ -21,43 +34,123 @@ class SelectorRequirement():
             self.val = matches.group(3).strip()
         else:
             raise ValueError(f'Selector requirement "{requirement}" invalid!')
+        self._pattern = re.compile(f'^{self.val}') if self.op in ['=~', '!~'] else None # compiled once, not on every match
 
     def __repr__(self):
         return f'{self.key} {self.op} {self.val}'
 
+    def literals(self) -> List[str]:
+        # values this requirement accepts (`==`) or rejects (`!=`) if they can be enumerated, e.g. also for an anchored alternation like `=~(a|b)$`
+        if self.op in ['==', '!=']:
+            return [self.val]
+        matches = LITERAL_ALTERNATIVES_PATTERN.match(self.val)
+        if matches:
+            return (matches.group(1) or matches.group(3)).split('|')
+        return None
+
     def matches(self, labels: Dict[str, str]) -> bool:
-        default = False if self.op.startswith('=') else True if self.op.startswith('!') else None
-        for key, val in labels.items():
-            if self.key == key:
-                if self.op == '==':
-                    if self.val == val:
-                        return True
-                if self.op == '!=':
-                    if self.val == val:
-                        return False
-                if self.op == '=~':
-                    if re.match(f'^{self.val}', val):
-                        return True
-                if self.op == '!~':
-                    if re.match(f'^{self.val}', val):
-                        return False
-        return default
+        val = labels.get(self.key, _MISSING) # direct lookup instead of scanning all labels
+        if val is _MISSING:
+            return self.op.startswith('!')
+        if self.op == '==':
+            return self.val == val
+        if self.op == '!=':
+            return self.val != val
+        if self.op == '=~':
+            return isinstance(val, str) and self._pattern.match(val) is not None
+        if self.op == '!~':
+            return not (isinstance(val, str) and self._pattern.match(val) is not None)
 
     @staticmethod
     def matches_selector(selector: List, entity: Any, labels: Dict[str, str]) -> bool:
-        matches = True
-        if selector:
-            for r in selector:
-                matches &= r.matches(labels)
-        return matches
+        return Selector.of(selector).matches(labels)
 
     @staticmethod
     def filter_by_selector(selector: List, entity_to_labels: List[Tuple[Any, Dict[str, str]]]) -> List[Any]:
-        result = []
-        for (entity, labels) in entity_to_labels:
-            if SelectorRequirement.matches_selector(selector, entity, labels):
-                result.append(entity)
-        return result
+        matches = Selector.of(selector).matches # evaluate the selector as one predicate
+        return [entity for (entity, labels) in entity_to_labels if matches(labels)]
+
+
+class Selector():
+    # compiled once from a selector string; requirements are evaluated cheapest first (equality before regex) and the first mismatch ends the evaluation
+    def __init__(self, requirements: List[SelectorRequirement] = None):
+        self.requirements = list(requirements) if requirements else []
+        self._ordered = sorted(self.requirements, key = lambda r: r.op not in ['==', '!='])
+
+    @staticmethod
+    def parse(selector: str) -> 'Selector':
+        return Selector([SelectorRequirement(r) for r in selector.split(',')] if selector else [])
+
+    @staticmethod
+    def of(selector) -> 'Selector':
+        return selector if isinstance(selector, Selector) else Selector(selector)
+
+    def __repr__(self):
+        return repr(self.requirements)
+
+    def __iter__(self):
+        return iter(self.requirements)
+
+    def __len__(self):
+        return len(self.requirements)
+
+    def matches(self, labels: Dict[str, str]) -> bool:
+        for r in self._ordered:
+            if not r.matches(labels):
+                return False
+        return True
+
+
+class ListPlan():
+    # splits selector requirements into what the API server can evaluate (field and label selectors, individual namespaces) and what stays client-side
+    def __init__(self):
+        self.namespaces: Set[str] = None      # namespaces to list individually (`None` lists all namespaces, an empty set nothing at all)
+        self.field_selector: List[str] = []   # requirements pushed down as field selector
+        self.label_selector: List[str] = []   # requirements pushed down as (set-based) label selector
+        self.residual: List[SelectorRequirement] = [] # requirements evaluated client-side
+
+    def __repr__(self):
+        return f'namespaces={sorted(self.namespaces) if self.namespaces is not None else "all"}, field_selector={self.get_field_selector()}, label_selector={self.get_label_selector()}, client_side={self.residual}'
+
+    def get_field_selector(self, supplement: str = None) -> str:
+        return ','.join(self.field_selector + ([supplement] if supplement else [])) or None
+
+    def get_label_selector(self, supplement: str = None) -> str:
+        return ','.join(([supplement] if supplement else []) + self.label_selector) or None
+
+    def get_residual_selector(self) -> Selector:
+        return Selector(self.residual)
+
+    @staticmethod
+    def for_metadata_selector(selector: Selector) -> 'ListPlan':
+        plan = ListPlan()
+        namespace_requirements = []
+        for r in selector:
+            literals = r.literals()
+            if r.key == 'namespace' and r.op in ['==', '=~'] and literals and all(NAME_PATTERN.match(l) for l in literals):
+                plan.namespaces = set(literals) if plan.namespaces is None else plan.namespaces & set(literals)
+                namespace_requirements.append(r)
+            elif r.key in FIELD_SELECTOR_PATHS and (r.op == '==' or r.op.startswith('!')) and literals and all(NAME_PATTERN.match(l) for l in literals):
+                plan.field_selector.extend(f'{FIELD_SELECTOR_PATHS[r.key]}{"=" if r.op == "==" else "!="}{l}' for l in literals) # field selector requirements are AND-ed
+            else:
+                plan.residual.append(r)
+        if plan.namespaces and len(plan.namespaces) > MAX_LIST_FAN_OUT: # too many namespaces to list individually
+            plan.namespaces = None
+            plan.residual.extend(namespace_requirements)
+        return plan
+
+    @staticmethod
+    def for_label_selector(selector: Selector) -> 'ListPlan':
+        plan = ListPlan()
+        for r in selector:
+            literals = r.literals()
+            if not LABEL_KEY_PATTERN.match(r.key) or not literals or not all(LABEL_VALUE_PATTERN.match(l) for l in literals):
+                plan.residual.append(r)
+            elif r.op in ['==', '!=']:
+                plan.label_selector.append(f'{r.key}{"=" if r.op == "==" else "!="}{r.val}')
+            else: # semantics match: `!~`/`notin` also select entities without the label, just like `!=`
+                plan.label_selector.append(f'{r.key} {"in" if r.op == "=~" else "notin"} ({",".join(literals)})')
+        return plan
 
 
 def supplement_selector(supplement: str, selector: str) -> str:
@@ -67,42 +160,64 @@ def supplement_selector(supplement: str, selector: str) -> str:
         return supplement
 
 
-def filter_pods(
+def list_planned(
         cluster: Cluster,
-        nodes: List[Dict],
-        pod_node_label_selector: List = None,
-        pod_label_selector: str = None,
-        pod_metadata_selector: List = None,
-        pod_owner_selector: List = None) -> List[str]:
-    # fetch pods either for one namespace (performance optimization) or for all namespaces
-    namespaces = []
-    for r in pod_metadata_selector:
-        if r.key == 'namespace' and r.op == '==':
-            namespaces.append(r.val)
-    if len(namespaces) == 1:
-        pods = cluster.client(API.CoreV1).list_namespaced_pod(namespaces[0], label_selector = pod_label_selector, _request_timeout = 60)
-    else:
-        pods = cluster.client(API.CoreV1).list_pod_for_all_namespaces(label_selector = pod_label_selector, _request_timeout = 60)
-    pods = cluster.boxed(cluster.sanitize_result(cluster.convert_snakecase_to_camelcase_dict_keys(pods.to_dict())))
+        api: API,
+        kind: str,
+        plan: ListPlan,
+        label_selector: str = None,
+        node_names: Set[str] = None) -> List[Any]:
+    # fan out into one list/watch per namespace (and node, if only a few are selected), all of them initially listed in parallel
+    namespaces = sorted(plan.namespaces) if plan.namespaces is not None else [None]
+    field_selectors = [plan.get_field_selector()]
+    if node_names is not None and len(namespaces) * len(node_names) <= MAX_LIST_FAN_OUT:
+        field_selectors = [plan.get_field_selector(f'spec.nodeName={node_name}') for node_name in sorted(node_names)]
+    informers = [cluster.informer(api, kind, namespace = namespace, label_selector = plan.get_label_selector(label_selector), field_selector = field_selector) for namespace in namespaces for field_selector in field_selectors]
+    cluster.retain_informers((api, kind, tuple(namespaces), plan.get_field_selector(), plan.get_label_selector(label_selector)), informers) # releases informers of this selection that aren't needed anymore, e.g. when the selected nodes changed
+    new_informers = [informer for informer in informers if not informer.started]
+    if new_informers:
+        logger.info(f'Pushing down {kind} selection to the API server with {plan} in {len(informers)} list(s)/watch(es){f" on {len(field_selectors)} node(s)" if len(field_selectors) > 1 or field_selectors[0] != plan.get_field_selector() else ""}.')
+        with ThreadPoolExecutor(max_workers = len(new_informers)) as executor:
+            list(executor.map(lambda informer: informer.start(), new_informers))
+    return [item for informer in informers for item in informer.items()]
 
-    # filter pods by pod metadata and owner selector
-    pods = SelectorRequirement.filter_by_selector(pod_metadata_selector, [(pod, pod.metadata) for pod in pods])
-    pods = SelectorRequirement.filter_by_selector(pod_owner_selector, [(pod, pod.metadata.ownerReferences[0]) for pod in pods if 'ownerReferences' in pod.metadata and pod.metadata.ownerReferences])
 
-    # filter pods by node label selector
-    node_names = {node.metadata.name: node for node in nodes} if nodes else []
+def filter_pods(
+        cluster: Cluster,
+        nodes: List[NodeProjection] = None,
+        pod_node_label_selector: Selector = None,
+        pod_label_selector: str = None,
+        pod_metadata_selector: Selector = None,
+        pod_owner_selector: Selector = None) -> List[PodProjection]:
+    # plan which requirements the API server can evaluate (namespace, name and node name field selectors, node label selectors) and which stay client-side
+    pod_plan = ListPlan.for_metadata_selector(pod_metadata_selector)
+    node_plan = ListPlan.for_label_selector(pod_node_label_selector)
+
+    # nodes are indexed by name and kept up-to-date by their own watch, so that new nodes never require a relist
+    node_index = cluster.informer(API.CoreV1, 'node', label_selector = node_plan.get_label_selector(), namespaced = False, key = 'name')
+    if not node_index.started:
+        logger.info(f'Pushing down node selection to the API server with {node_plan}.')
+    node_names = None
+    if pod_node_label_selector:
+        node_selector = node_plan.get_residual_selector()
+        node_names = {node.name for node in node_index.items() if node_selector.matches(node.labels)}
+    if nodes is not None:
+        nodes[:] = node_index.items() # preserve list as callers may hold on to it
+
+    # query pods from the informer stores (listed once, then kept up-to-date by a watch, both as compact projections of the raw objects)
+    pods = list_planned(cluster, API.CoreV1, 'pod', pod_plan, pod_label_selector, node_names)
+
+    # filter pods by remaining pod metadata and owner selector
+    pods = SelectorRequirement.filter_by_selector(pod_plan.get_residual_selector(), [(pod, pod.metadata) for pod in pods])
+    pods = SelectorRequirement.filter_by_selector(pod_owner_selector, [(pod, pod.owner) for pod in pods if pod.owner])
+
+    # filter pods by node label selector (pods on nodes that are not (yet) known are skipped and picked up once the node shows up in the index)
+    pods_and_nodes = []
     for pod in pods:
-        if 'nodeName' in pod.spec and pod.spec.nodeName not in node_names:
-            nodes.clear() # preserve list as we keep updating it on every refresh that becomes necessary
-            nodes.extend(cluster.boxed(cluster.sanitize_result(cluster.convert_snakecase_to_camelcase_dict_keys(cluster.client(API.CoreV1).list_node(_request_timeout = 15).to_dict()))))
-            node_names = {node.metadata.name: node for node in nodes}
-        if 'nodeName' in pod.spec and pod.spec.nodeName in node_names:
-            for key, value in node_names[pod.spec.nodeName].metadata.labels.items():
-                if key in ['topology.kubernetes.io/zone']: # copy useful node labels to pod metadata for convenience
-                    if not 'labels' in pod.metadata:
-                        pod.metadata['labels'] = Box()
-                    pod.metadata['labels'][key] = value
-    pods = SelectorRequirement.filter_by_selector(pod_node_label_selector, [(pod, node_names[pod.spec.nodeName].metadata.labels) for pod in pods if 'nodeName' in pod.spec and pod.spec.nodeName in node_names])
+        node = node_index.get(pod.node_name) if pod.node_name else None
+        if node:
+            pods_and_nodes.append((pod.with_labels({**pod.labels, **node.copied_labels}), node.labels)) # per call, as pods are shared via the informer store and may move
+    pods = SelectorRequirement.filter_by_selector(node_plan.get_residual_selector(), pods_and_nodes)
 
     # return filtered pods
     return pods
@@ -111,20 +226,13 @@ def filter_pods(
 def filter_leases(
         cluster: Cluster,
         lease_label_selector: str = None,
-        lease_metadata_selector: List = None) -> List[str]:
-    # fetch leases either for one namespace (performance optimization) or for all namespaces
-    namespaces = []
-    for r in lease_metadata_selector:
-        if r.key == 'namespace' and r.op == '==':
-            namespaces.append(r.val)
-    if len(namespaces) == 1:
-        leases = cluster.client(API.CoordinationV1).list_namespaced_lease(namespaces[0], label_selector = lease_label_selector, _request_timeout = 60)
-    else:
-        leases = cluster.client(API.CoordinationV1).list_lease_for_all_namespaces(label_selector = lease_label_selector, _request_timeout = 60)
-    leases = cluster.boxed(cluster.sanitize_result(cluster.convert_snakecase_to_camelcase_dict_keys(leases.to_dict())))
+        lease_metadata_selector: Selector = None) -> List[LeaseProjection]:
+    # plan which requirements the API server can evaluate and query leases from the informer stores (listed once, then kept up-to-date by a watch)
+    lease_plan = ListPlan.for_metadata_selector(lease_metadata_selector)
+    leases = list_planned(cluster, API.CoordinationV1, 'lease', lease_plan, lease_label_selector)
 
-    # filter leases by lease metadata
-    leases = SelectorRequirement.filter_by_selector(lease_metadata_selector, [(lease, lease.metadata) for lease in leases])
+    # filter leases by remaining lease metadata
+    leases = SelectorRequirement.filter_by_selector(lease_plan.get_residual_selector(), [(lease, lease.metadata) for lease in leases])
 
     # return filtered leases
     return leases
@@ -1,16 +1,29 @@
 import random
-import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from threading import Thread
+from typing import List
 
 from chaoslib.types import Secrets
+from kubernetes.client.exceptions import ApiException
 from logzero import logger
 
-from chaosgarden.k8s import SelectorRequirement, filter_pods, to_authenticator
+from chaosgarden.k8s import (ListPlan, Selector, filter_pods, list_planned,
+                             to_authenticator)
 from chaosgarden.k8s.api.cluster import API, Cluster
+from chaosgarden.k8s.api.projections import PodProjection
+from chaosgarden.util.engine import cooperative
+from chaosgarden.util.rate_limiter import RateLimiter
+from chaosgarden.util.scheduler import Scheduler
 from chaosgarden.util.terminator import Terminator
 from chaosgarden.util.threading import launch_thread
 
+DELETION_WORKERS = 16            # max concurrent pod deletions
+DELETION_RATE_PER_NAMESPACE = 20 # max pod deletions (or collection deletions) per second and namespace
+DELETION_BACK_OFF_SECONDS = 5    # back-off after a failed pod deletion
+POLL_SECONDS = 1                 # max time between two loop iterations (to collect finished deletions and check for termination)
+
 __all__ = [
     'run_pod_failure_simulation_in_background',
     'run_pod_failure_simulation']
@@ -32,6 +45,7 @@ def run_pod_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_pod_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_pod_failure_simulation(
         min_runtime: int = 0,
         max_runtime: int = 0,
@@ -44,41 +58,93 @@ def run_pod_failure_simulation(
         secrets: Secrets = None):
     # input validation
     max_runtime = max(min_runtime, max_runtime)
-    pod_node_label_selector = [SelectorRequirement(r) for r in pod_node_label_selector.split(',')] if pod_node_label_selector else []
+    pod_node_label_selector = Selector.parse(pod_node_label_selector)
     pod_label_selector      = pod_label_selector if pod_label_selector else None
-    pod_metadata_selector   = [SelectorRequirement(r) for r in pod_metadata_selector.split(',')] if pod_metadata_selector else []
-    pod_owner_selector      = [SelectorRequirement(r) for r in pod_owner_selector.split(',')] if pod_owner_selector else []
+    pod_metadata_selector   = Selector.parse(pod_metadata_selector)
+    pod_owner_selector      = Selector.parse(pod_owner_selector)
     cluster = Cluster(f'cluster', to_authenticator(secrets))
 
-    # mess up pods continuously until terminated
+    # mess up pods continuously until terminated (deletions run in a bounded pool, rate-limited per namespace, so that a large wave of due pods doesn't stall the loop)
     logger.info(f'Terminating pods in {cluster.host} matching {pod_node_label_selector=}, {pod_label_selector=}, {pod_metadata_selector=}, {pod_owner_selector=} with runtime between {min_runtime}s and {max_runtime}s with a grace period of {grace_period}s.')
-    nodes = []
-    schedule_by_id = {}
+    pod_plan = ListPlan.for_metadata_selector(pod_metadata_selector)
+    collection_deletable = max_runtime == 0 and not pod_node_label_selector and not pod_owner_selector and not pod_plan.get_residual_selector() # selection is (mostly) evaluated by the API server and every pod is due right away
+    scheduler = Scheduler()
+    deletion_by_id = {}
+    rate_limiter_by_namespace = defaultdict(lambda: RateLimiter(DELETION_RATE_PER_NAMESPACE))
+    executor = ThreadPoolExecutor(max_workers = DELETION_WORKERS, thread_name_prefix = 'pod-deletion')
     terminator = Terminator(duration)
     while not terminator.is_terminated():
         try:
+            # collect finished deletions (failed ones are backed off and retried)
+            for pod_id, deletion in list(deletion_by_id.items()):
+                if deletion.done():
+                    del deletion_by_id[pod_id]
+                    if deletion.exception():
+                        scheduler.schedule(pod_id, datetime.now().astimezone() + timedelta(seconds = DELETION_BACK_OFF_SECONDS)) # back-off
+
+            # schedule new pods and forget pods that are gone
+            cluster.changes.clear()
             pods = filter_pods(
                 cluster = cluster,
-                nodes = nodes,
                 pod_node_label_selector = pod_node_label_selector,
                 pod_label_selector = pod_label_selector,
                 pod_metadata_selector = pod_metadata_selector,
                 pod_owner_selector = pod_owner_selector)
+            pod_by_id = {}
             for pod in pods:
-                pod_id = pod.metadata.uid
-                if pod_id not in schedule_by_id:
-                    schedule_by_id[pod_id] = pod.metadata.creationTimestamp + timedelta(seconds = random.randint(min_runtime, max_runtime))
-                    logger.info(f'Scheduling pod termination: {cluster.host}:{pod.metadata.namespace}/{pod.metadata.name} at {schedule_by_id[pod_id]}')
-                if datetime.now().astimezone() > schedule_by_id[pod_id]:
-                    try:
-                        cluster.client(API.CoreV1).delete_namespaced_pod(pod.metadata.name, pod.metadata.namespace, grace_period_seconds = grace_period, _request_timeout = 15)
-                        del schedule_by_id[pod_id]
-                    except Exception as e:
-                        logger.error(f'Pod termination failed for {cluster.host}:{pod.metadata.namespace}/{pod.metadata.name}: {type(e)}: {e}')
-                        # logger.error(traceback.format_exc())
-                        schedule_by_id[pod_id] = datetime.now().astimezone() + timedelta(seconds = 5) # back-off
+                pod_id = pod.uid
+                pod_by_id[pod_id] = pod
+                if pod_id not in scheduler and pod_id not in deletion_by_id:
+                    scheduler.schedule(pod_id, pod.creation_timestamp + timedelta(seconds = random.randint(min_runtime, max_runtime)))
+                    logger.info(f'Scheduling pod termination: {cluster.host}:{pod.namespace}/{pod.name} at {scheduler.get(pod_id)}')
+            scheduler.retain(pod_by_id.keys())
+
+            # delete due pods, all pods of a namespace at once if the API server would select exactly them (pods that are selected server-side,
+            # but skipped client-side, e.g. pods without owner or on nodes that are not yet known, must not be deleted with the collection)
+            due_pods_by_namespace = defaultdict(list)
+            for pod_id in scheduler.pop_due(eligible = lambda pod_id: pod_id in pod_by_id):
+                due_pods_by_namespace[pod_by_id[pod_id].namespace].append(pod_by_id[pod_id])
+            collection_pod_ids_by_namespace = defaultdict(set)
+            if collection_deletable and any(len(due_pods) > 1 for due_pods in due_pods_by_namespace.values()):
+                for pod in list_planned(cluster, API.CoreV1, 'pod', pod_plan, pod_label_selector): # same informers as `filter_pods`, but unfiltered
+                    if pod.node_name: # unscheduled pods are excluded server-side, see `delete_pods`
+                        collection_pod_ids_by_namespace[pod.namespace].add(pod.uid)
+            for namespace, due_pods in due_pods_by_namespace.items():
+                rate_limiter = rate_limiter_by_namespace[namespace]
+                if collection_deletable and len(due_pods) > 1 and {pod.uid for pod in due_pods} == collection_pod_ids_by_namespace[namespace]:
+                    deletion = executor.submit(delete_pods, cluster, namespace, due_pods, pod_label_selector, pod_plan.get_field_selector('spec.nodeName!='), grace_period, rate_limiter)
+                    deletion_by_id.update({pod.uid: deletion for pod in due_pods})
+                else:
+                    for pod in due_pods:
+                        deletion_by_id[pod.uid] = executor.submit(delete_pod, cluster, pod, grace_period, rate_limiter)
         except Exception as e:
             logger.error(f'Pod termination failed: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(1)
+            yield terminator.pause(scheduler.wait_time(POLL_SECONDS), cluster.changes) # wake up when the next pod is due or pods were added/deleted
+    executor.shutdown(wait = True, cancel_futures = True)
+    cluster.stop_informers()
+
+def delete_pod(cluster: Cluster, pod: PodProjection, grace_period: int, rate_limiter: RateLimiter):
+    rate_limiter.acquire()
+    try:
+        cluster.client(API.CoreV1).delete_namespaced_pod(pod.name, pod.namespace, grace_period_seconds = grace_period, _request_timeout = 15)
+    except ApiException as e:
+        if e.status == 404:
+            return # pod is already gone
+        logger.error(f'Pod termination failed for {cluster.host}:{pod.namespace}/{pod.name}: {type(e)}: {e}')
+        raise e
+    except Exception as e:
+        logger.error(f'Pod termination failed for {cluster.host}:{pod.namespace}/{pod.name}: {type(e)}: {e}')
+        # logger.error(traceback.format_exc())
+        raise e
+
+def delete_pods(cluster: Cluster, namespace: str, pods: List[PodProjection], label_selector: str, field_selector: str, grace_period: int, rate_limiter: RateLimiter):
+    rate_limiter.acquire()
+    try:
+        logger.info(f'Terminating all {len(pods)} selected pods at once: {cluster.host}:{namespace}/* matching {label_selector=}, {field_selector=}')
+        cluster.client(API.CoreV1).delete_collection_namespaced_pod(namespace, label_selector = label_selector, field_selector = field_selector, grace_period_seconds = grace_period, _request_timeout = 60)
+    except Exception as e:
+        logger.error(f'Pod termination failed for {cluster.host}:{namespace}/* matching {label_selector=}, {field_selector=}: {type(e)}: {e}')
+        # logger.error(traceback.format_exc())
+        raise e
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from threading import RLock
+
+from kubernetes.client.exceptions import ApiException
+
+from chaosgarden.k8s.api.clients import API
+
+DISCOVERY_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'chaosgarden', 'discovery')
+DISCOVERY_CACHE_TTL_SECONDS = 6 * 3600 # discovered resources (per API server and group/version) are trusted that long, so that repeated experiments skip discovery
+FIELD_MANAGER = 'chaosgarden'           # field manager of server-side applied objects
+
+
+class Discovery():
+  # resolves the kind of an API group/version to its resource (plural) and scope via the discovery endpoints of the API server; results
+  # are cached per group/version in memory and on disk (one file per API server), so that only unknown or expired group/versions and
+  # kinds that aren't known yet (e.g. of custom resource definitions created in the meantime) are discovered
+  def __init__(self, cluster, cache_dir = DISCOVERY_CACHE_DIR, ttl = DISCOVERY_CACHE_TTL_SECONDS):
+    self._logger = logging.getLogger(self.__class__.__name__)
+    self._cluster = cluster
+    self._cache_dir = cache_dir
+    self._ttl = ttl
+    self._lock = RLock()
+    self._cache = None # group/version -> {'timestamp': discovery time, 'resources': {kind: [plural, namespaced]}}
+
+  def resolve(self, api_version, kind):
+    # returns plural and whether the resource is namespaced
+    with self._lock:
+      self._load()
+      entry = self._cache.get(api_version)
+      if not entry or entry['timestamp'] + self._ttl < time.time() or kind not in entry['resources']:
+        entry = self._cache[api_version] = self._discover(api_version)
+        self._store()
+      if kind not in entry['resources']:
+        raise LookupError(f'Kind {kind} not served by {api_version} on {self._cluster.host}!')
+      plural, namespaced = entry['resources'][kind]
+      return plural, namespaced
+
+  def invalidate(self, api_version):
+    with self._lock:
+      self._load()
+      if self._cache.pop(api_version, None):
+        self._store()
+
+  def _discover(self, api_version):
+    start = time.monotonic()
+    resource_list = self._cluster.client(API.Plain).get(base_path(api_version))
+    resources = {resource['kind']: [resource['name'], resource['namespaced']] for resource in resource_list['resources'] if '/' not in resource['name']} # skip subresources, e.g. `deployments/scale`
+    self._logger.debug(f'Discovered {len(resources)} resources of {api_version} in {time.monotonic() - start:.2f}s.')
+    return {'timestamp': time.time(), 'resources': resources}
+
+  def _cache_file(self):
+    return os.path.join(self._cache_dir, hashlib.sha256(self._cluster.host.encode('utf-8')).hexdigest()[:16] + '.json')
+
+  def _load(self):
+    if self._cache is None:
+      try:
+        with open(self._cache_file(), 'r') as file:
+          self._cache = json.load(file)
+      except Exception:
+        self._cache = {} # ignore missing or corrupt cache
+    return self._cache
+
+  def _store(self):
+    # best-effort, written to a temporary file first and then replaced atomically, so that concurrent experiments never read partial files
+    try:
+      os.makedirs(self._cache_dir, exist_ok = True)
+      cache_file = self._cache_file()
+      with open(f'{cache_file}.{os.getpid()}', 'w') as file:
+        json.dump(self._cache, file)
+      os.replace(f'{cache_file}.{os.getpid()}', cache_file)
+    except Exception as e:
+      self._logger.debug(f'Discovery cache not stored: {type(e)}: {e}')
+
+
+class Applier():
+  # applies and deletes arbitrary objects (as rendered, i.e. as dicts) via their resource paths, without typed clients or guessed plurals;
+  # applying is idempotent and reconciles drift (server-side apply with conflicts forced in favour of this field manager)
+  def __init__(self, cluster, discovery = None, field_manager = FIELD_MANAGER):
+    self._cluster = cluster
+    self._discovery = discovery or Discovery(cluster)
+    self._field_manager = field_manager
+
+  def resource_path(self, resource):
+    api_version = resource['apiVersion']
+    plural, namespaced = self._discovery.resolve(api_version, resource['kind'])
+    if namespaced:
+      return f'{base_path(api_version)}/namespaces/{resource["metadata"]["namespace"]}/{plural}/{resource["metadata"]["name"]}'
+    else:
+      return f'{base_path(api_version)}/{plural}/{resource["metadata"]["name"]}'
+
+  def apply(self, resource):
+    try:
+      return self._cluster.client(API.Plain).apply(self.resource_path(resource), resource, self._field_manager)
+    except ApiException as e:
+      if e.status == 404:
+        self._discovery.invalidate(resource['apiVersion']) # resource may have been discovered before its definition changed
+      raise e
+
+  def delete(self, resource, propagation_policy = 'Foreground'):
+    # returns whether the object was still found (deletion is asynchronous, so it may remain for a while, e.g. until its finalizers ran)
+    try:
+      self._cluster.client(API.Plain).delete(self.resource_path(resource), propagation_policy = propagation_policy)
+      return True
+    except ApiException as e:
+      if e.status == 404:
+        return False
+      raise e
+    except LookupError:
+      return False # kind not (or no longer) served, e.g. because its custom resource definition is already gone
+
+
+def base_path(api_version):
+  return f'/api/{api_version}' if '/' not in api_version else f'/apis/{api_version}'
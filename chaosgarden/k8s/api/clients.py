@@ -2,6 +2,7 @@ import json
 import logging
 import warnings
 from enum import Enum
+from socket import SO_KEEPALIVE, SOL_SOCKET
 from threading import RLock
 
 import yaml
@@ -11,6 +12,7 @@ from kubernetes.client import (AdmissionregistrationV1Api, ApiextensionsV1Api,
                                PolicyV1Api, RbacAuthorizationV1Api, VersionApi)
 from kubernetes.client.exceptions import ApiException
 from kubernetes.client.models.events_v1_event import EventsV1Event
+from urllib3.connection import HTTPConnection
 
 
 # patch EventsV1Event class
@@ -84,42 +86,35 @@ class PlainClient():
 
   def get(self, resource_path):
     self._logger.debug('Getting: %s', resource_path)
-    try:
-      method = 'GET'
-      response = self._client.call_api(resource_path          = resource_path,
-                                       method                 = method,
-                                       auth_settings          = ['BearerToken'],
-                                       _preload_content       = False,
-                                       _return_http_data_only = True,
-                                       _request_timeout       = 60)
-      if response.status != 200:
-        raise IOError(f'{method} failed with {response.status}!')
-    except Exception as exc:
-      # self._logger.error(exc, exc_info = True)
-      raise exc
-    if response.data is None:
-      return None
-    else:
-      if response.headers['Content-Type'].startswith('application/json'):
-        return json.loads(response.data)
-      elif response.headers['Content-Type'].startswith('application/yaml'):
-        return yaml.load(response.data, Loader = yaml.FullLoader)
-      else:
-        return response.data
+    return self._request('GET', resource_path, [200])
 
   def post(self, resource_path, body):
     self._logger.debug('Posting: %s', resource_path)
+    return self._request('POST', resource_path, [201], header_params = {'Content-Type': 'application/yaml'}, body = body)
+
+  def apply(self, resource_path, body, field_manager, force = True):
+    # server-side apply, i.e. creates or updates the object in one request and reconciles all fields owned by the field manager
+    self._logger.debug('Applying: %s', resource_path)
+    query_params = [('fieldManager', field_manager)] + ([('force', 'true')] if force else [])
+    return self._request('PATCH', resource_path, [200, 201], query_params = query_params, header_params = {'Content-Type': 'application/apply-patch+yaml'}, body = body)
+
+  def delete(self, resource_path, propagation_policy = None):
+    self._logger.debug('Deleting: %s', resource_path)
+    query_params = [('propagationPolicy', propagation_policy)] if propagation_policy else []
+    return self._request('DELETE', resource_path, [200, 202], query_params = query_params)
+
+  def _request(self, method, resource_path, statuses, query_params = None, header_params = None, body = None):
     try:
-      method = 'POST'
       response = self._client.call_api(resource_path          = resource_path,
                                        method                 = method,
-                                       header_params          = {'Content-Type': 'application/yaml'},
+                                       query_params           = query_params,
+                                       header_params          = header_params,
                                        body                   = body,
                                        auth_settings          = ['BearerToken'],
                                        _preload_content       = False,
                                        _return_http_data_only = True,
                                        _request_timeout       = 60)
-      if response.status != 201:
+      if response.status not in statuses:
         raise IOError(f'{method} failed with {response.status}!')
     except Exception as exc:
       # self._logger.error(exc, exc_info = True)
@@ -135,6 +130,33 @@ class PlainClient():
         return response.data
 
 
+class ConnectionPools():
+  # process-wide registry of urllib3 pool managers, shared by all raw clients that connect the same way, so that re-authentication
+  # (e.g. after a 401) and multiple clusters/simulations against the same API server reuse open (kept-alive) connections instead of
+  # paying for new TLS handshakes (certificates are compared by file name, which is stable, because the kubernetes client writes
+  # inlined certificate data to one temporary file per distinct content)
+  def __init__(self, size = 32, keep_alive = True):
+    self.size = size             # max connections kept open per host (should cover parallel informers, deletions and probes)
+    self.keep_alive = keep_alive # enable TCP keep-alive, so that idle connections aren't silently dropped by load balancers or NAT
+    self._lock = RLock()
+    self._pool_managers = {}
+
+  def share(self, raw_client):
+    configuration = raw_client.configuration
+    pool_key = (configuration.host, configuration.ssl_ca_cert, configuration.cert_file, configuration.key_file, configuration.verify_ssl, configuration.proxy)
+    with self._lock:
+      if pool_key not in self._pool_managers:
+        pool_manager = raw_client.rest_client.pool_manager # adopt the pool manager of the first client (no connections are opened yet)
+        pool_manager.connection_pool_kw['maxsize'] = self.size
+        if self.keep_alive:
+          pool_manager.connection_pool_kw['socket_options'] = HTTPConnection.default_socket_options + [(SOL_SOCKET, SO_KEEPALIVE, 1)]
+        self._pool_managers[pool_key] = pool_manager
+      raw_client.rest_client.pool_manager = self._pool_managers[pool_key]
+    return raw_client
+
+CONNECTION_POOLS = ConnectionPools() # configure before first use, e.g. `CONNECTION_POOLS.size = 64`
+
+
 class WrappedRawClient():
   def __init__(self, authenticator):
     self._authenticator = authenticator
@@ -149,7 +171,7 @@ class WrappedRawClient():
         # print(f'*' * 100)
         # print(f'* Authenticating via {self._authenticator} for API {api.name}...')
         # print(f'*' * 100)
-        self._raw_client = self._authenticator.authenticate()
+        self._raw_client = CONNECTION_POOLS.share(self._authenticator.authenticate())
         self._api_clients = {}
       if api not in self._api_clients:
         self._api_clients[api] = (api.client(self._raw_client), self._raw_client)
@@ -1,9 +1,17 @@
 import logging
+import time
 from socket import AF_INET, SOCK_STREAM, socket
+from threading import RLock
 
 from box import Box
+from kubernetes.client.exceptions import ApiException
 
 from chaosgarden.k8s.api.clients import API, WrappedRawClient
+from chaosgarden.k8s.api.informer import Informer
+from chaosgarden.k8s.api.projections import loads
+from chaosgarden.util.engine import NotifyingEvent
+
+LIST_PAGE_SIZE = 500 # items per list request, so that neither the API server nor chaosgarden ever materialize a large collection at once
 
 
 class Cluster():
@@ -11,6 +19,10 @@ class Cluster():
     self._logger = logging.getLogger(self.__class__.__name__)
     self._cluster_name = cluster_name
     self._client = WrappedRawClient(authenticator)
+    self._lock = RLock()
+    self._informers = {}
+    self._informers_by_owner = {}
+    self._changes = NotifyingEvent()
 
   @property
   def host(self):
@@ -19,6 +31,82 @@ class Cluster():
   def client(self, api = API.Raw):
     return self._client.client(api)
 
+  def informer(self, api, kind, namespace = None, label_selector = None, field_selector = None, namespaced = True, key = 'uid', project = None, params = None, handler = None, keep = True):
+    # informers are shared per cluster and selection, so that repeated filter calls query the same in-memory store
+    informer_key = (api, kind, namespace, label_selector, field_selector, namespaced, key, project, tuple(sorted((params or {}).items())), handler, keep)
+    with self._lock:
+      if informer_key not in self._informers:
+        self._informers[informer_key] = Informer(self, api, kind, namespace = namespace, label_selector = label_selector, field_selector = field_selector, namespaced = namespaced, key = key, project = project, params = params, handler = handler, keep = keep)
+      return self._informers[informer_key]
+
+  def retain_informers(self, owner, informers):
+    # informers are retained per owner (e.g. a selection, whose informers change with the selected nodes) and stopped only once no owner needs them
+    # anymore, so that concurrent selections on the same cluster never stop each other's informers (informers without owners are not touched)
+    with self._lock:
+      previous = self._informers_by_owner.get(owner, set())
+      self._informers_by_owner[owner] = set(informers)
+      needed = set().union(*self._informers_by_owner.values())
+      released = [(k, i) for k, i in self._informers.items() if i in previous and i not in needed]
+      for k, _ in released:
+        del self._informers[k]
+    for _, informer in released:
+      informer.stop()
+
+  @property
+  def changes(self):
+    # set by informers when objects were added or deleted (not on mere updates, which do not change the set of objects), to be waited
+    # on and cleared by the reader (whatever happens after clearing it is seen by the next read)
+    return self._changes
+
+  def signal_changes(self):
+    self._changes.set()
+
+  def stop_informers(self):
+    with self._lock:
+      informers = list(self._informers.values())
+      self._informers = {}
+      self._informers_by_owner = {}
+    for informer in informers:
+      informer.stop()
+
+  def list_raw(self, api, method, **kwargs):
+    # bypasses model deserialization and returns the decoded JSON list (keys in camelcase, timestamps as strings)
+    response = getattr(self.client(api), method)(**kwargs, _preload_content = False, _request_timeout = 60)
+    return loads(response.data)
+
+  def list_pages(self, api, method, limit = LIST_PAGE_SIZE, retries = 0, inconsistent = False, **kwargs):
+    # lists in chunks of `limit` items (`limit`/`continue`) and yields the decoded pages lazily; failed page requests are retried
+    # with the same continue token up to `retries` times; an expired continue token (410 Gone) is raised, unless `inconsistent`
+    # continuation is acceptable, in which case the remainder is listed with the token the API server hands out for that purpose
+    continue_token = None
+    attempt = 0
+    while True:
+      try:
+        attempt += 1
+        page = self.list_raw(api, method, limit = limit, _continue = continue_token, **kwargs)
+      except Exception as e:
+        expired = isinstance(e, ApiException) and e.status == 410
+        if expired and continue_token and inconsistent:
+          continue_token = ((loads(e.body) if e.body else {}).get('metadata') or {}).get('continue')
+          if continue_token:
+            self._logger.warning(f'Listing {method} continues inconsistently, because the continue token expired.')
+            continue
+        if expired or attempt > retries:
+          raise e
+        self._logger.error(f'Listing {method} failed: {type(e)}: {e}')
+        time.sleep(attempt * 5)
+        continue
+      attempt = 0
+      yield page
+      continue_token = page['metadata'].get('continue')
+      if not continue_token:
+        break
+
+  def list_items(self, api, method, limit = LIST_PAGE_SIZE, retries = 0, inconsistent = False, **kwargs):
+    # same as above, but yields the raw items one by one
+    for page in self.list_pages(api, method, limit = limit, retries = retries, inconsistent = inconsistent, **kwargs):
+      yield from page['items']
+
   def convert_snakecase_to_camelcase_dict_keys(self, result):
     # results returned by certain API clients have their keys in snakecase, see https://github.com/kubernetes-client/python/issues/1228
     if isinstance(result, dict):
@@ -0,0 +1,148 @@
+import logging
+from threading import Event, RLock, Thread
+
+from kubernetes.client.exceptions import ApiException
+from kubernetes.watch.watch import iter_resp_lines
+
+from chaosgarden.k8s.api.projections import PROJECTIONS, Projection, loads
+
+WATCH_TIMEOUT_SECONDS = 60 # server-side watch timeout, after which the watch is resumed from the last known resource version
+WATCH_BACK_OFF_SECONDS = 5 # back-off after a failed list or watch (other than 410 Gone, which triggers an immediate relist)
+
+
+class Informer():
+  def __init__(self, cluster, api, kind, namespace = None, label_selector = None, field_selector = None, namespaced = True, key = 'uid', project = None, params = None, handler = None, keep = True):
+    self._logger = logging.getLogger(self.__class__.__name__)
+    self._cluster = cluster
+    self._api = api
+    self._kind = kind
+    self._kwargs = {}
+    if label_selector:
+      self._kwargs['label_selector'] = label_selector
+    if field_selector:
+      self._kwargs['field_selector'] = field_selector
+    if namespaced and namespace:
+      self._list_method = f'list_namespaced_{kind}'
+      self._kwargs['namespace'] = namespace
+    elif namespaced:
+      self._list_method = f'list_{kind}_for_all_namespaces'
+    else:
+      self._list_method = f'list_{kind}'
+    self._key = key                                              # projection attribute by which items are stored and can be looked up, e.g. `uid` or `name`
+    self._project = project or PROJECTIONS.get(kind, Projection) # projection that is computed once per changed item from the raw object and stored instead
+    self._kwargs.update(params or {})                            # further list parameters, e.g. `group`, `version` and `plural` of custom resources
+    self._handler = handler                                      # called with the event type and projection of every listed (`ADDED`) and watched item, e.g. to aggregate items as they arrive
+    self._keep = keep                                            # whether items are kept in the store (not necessary, if the handler consumes them)
+    self._lock = RLock()
+    self._store = {}
+    self._resource_version = None
+    self._stopped = Event()
+    self._thread = None
+
+  def __repr__(self):
+    return f'{self._list_method}({", ".join(f"{k}={v}" for k, v in self._kwargs.items())})'
+
+  @property
+  def started(self):
+    return self._thread is not None
+
+  def start(self):
+    # initial list is performed synchronously in the caller's thread (errors surface there), thereafter the store is kept up-to-date by a watch
+    with self._lock:
+      if not self._thread:
+        self._logger.info(f'Listing and watching {self}.')
+        self._list()
+        self._thread = Thread(target = self._run, name = f'informer-{self._kind}', daemon = True)
+        self._thread.start()
+    return self
+
+  def items(self):
+    self.start()
+    with self._lock:
+      return list(self._store.values())
+
+  def get(self, key, default = None):
+    self.start()
+    return self._store.get(key, default)
+
+  def stop(self):
+    self._stopped.set()
+
+  def _list(self):
+    # paged list, projected page by page, so that only one page of raw objects is held at any time (all pages are served
+    # from the same snapshot, i.e. the resource version of the last page is the one to resume watching from)
+    while True:
+      try:
+        store = {}
+        for page in self._cluster.list_pages(self._api, self._list_method, **self._kwargs):
+          for raw in page['items']:
+            item = self._project(raw)
+            if self._keep:
+              store[getattr(item, self._key)] = item
+            if self._handler:
+              self._handler('ADDED', item)
+          resource_version = page['metadata']['resourceVersion']
+        break
+      except ApiException as e:
+        if e.status != 410:
+          raise e
+        self._logger.info(f'List {self} expired (410 Gone) while paging. Relisting now.')
+    with self._lock:
+      self._store = store
+      self._resource_version = resource_version
+    if self._keep:
+      self._cluster.signal_changes()
+
+  def _run(self):
+    while not self._stopped.is_set():
+      try:
+        if self._resource_version is None:
+          self._list()
+        self._watch()
+      except ApiException as e:
+        if e.status == 410:
+          self._logger.info(f'Watch {self} expired (410 Gone). Relisting now.')
+          self._resource_version = None
+        else:
+          self._logger.error(f'Watch {self} failed: {type(e)}: {e}')
+          self._stopped.wait(WATCH_BACK_OFF_SECONDS)
+      except Exception as e:
+        self._logger.error(f'Watch {self} failed: {type(e)}: {e}')
+        self._stopped.wait(WATCH_BACK_OFF_SECONDS)
+
+  def _watch(self):
+    # raw watch stream: events are decoded from JSON and projected right away (no model deserialization)
+    response = getattr(self._cluster.client(self._api), self._list_method)(
+      watch                 = True,
+      resource_version      = self._resource_version,
+      allow_watch_bookmarks = True,
+      timeout_seconds       = WATCH_TIMEOUT_SECONDS,
+      _preload_content      = False,
+      _request_timeout      = WATCH_TIMEOUT_SECONDS + 15,
+      **self._kwargs)
+    try:
+      for line in iter_resp_lines(response):
+        if self._stopped.is_set():
+          break
+        event = loads(line)
+        raw = event['object']
+        if event['type'] == 'ERROR':
+          raise ApiException(status = raw.get('code'), reason = raw.get('message'))
+        resource_version = raw['metadata']['resourceVersion']
+        if event['type'] == 'BOOKMARK':
+          self._resource_version = resource_version # bookmarks only advance the resource version, so that resuming a watch does not replay (or expire on) older events
+          continue
+        item = self._project(raw)
+        with self._lock:
+          if self._keep and event['type'] == 'DELETED':
+            self._store.pop(getattr(item, self._key), None)
+          elif self._keep:
+            self._store[getattr(item, self._key)] = item
+          self._resource_version = resource_version
+        if self._handler:
+          self._handler(event['type'], item)
+        if self._keep and event['type'] != 'MODIFIED':
+          self._cluster.signal_changes()
+    finally:
+      response.close()
+      response.release_conn()
@@ -0,0 +1,95 @@
+import copy
+from datetime import datetime
+
+try:
+  from orjson import loads # optional, but considerably faster when decoding large lists
+except ImportError:
+  from json import loads
+
+ZONE_LABEL = 'topology.kubernetes.io/zone'
+
+
+def parse_timestamp(timestamp):
+  # Kubernetes (micro) timestamps are RFC 3339 in UTC, e.g. `2024-01-01T00:00:00Z` or `2024-01-01T00:00:00.000000Z`
+  return datetime.fromisoformat(timestamp.replace('Z', '+00:00')) if timestamp else None
+
+
+def parse_conditions(raw):
+  return {c['type']: c['status'] for c in (raw.get('status') or {}).get('conditions') or []}
+
+
+class Projection():
+  # compact projection of a raw (JSON-decoded) object that keeps only what chaosgarden reads (no model deserialization,
+  # no `to_dict()`, no key conversion and no `Box`), so that everything else can be garbage collected right away
+  __slots__ = ('metadata', 'labels', 'creation_timestamp')
+
+  def __init__(self, raw):
+    metadata = raw['metadata']
+    self.metadata = {key: value for key, value in metadata.items() if isinstance(value, str)} # scalar fields only, e.g. for metadata selectors
+    self.labels = metadata.get('labels') or {}
+    self.creation_timestamp = parse_timestamp(metadata.get('creationTimestamp'))
+
+  def __repr__(self):
+    return f'{self.__class__.__name__}({self.namespace + "/" if self.namespace else ""}{self.name})'
+
+  def with_labels(self, labels):
+    # shallow copy with other labels (e.g. merged with those of related objects), so that projections shared via informer stores stay untouched
+    projection = copy.copy(self)
+    projection.labels = labels
+    return projection
+
+  @property
+  def uid(self):
+    return self.metadata.get('uid')
+
+  @property
+  def name(self):
+    return self.metadata.get('name')
+
+  @property
+  def namespace(self):
+    return self.metadata.get('namespace')
+
+
+class PodProjection(Projection):
+  __slots__ = ('owner', 'node_name', 'phase', 'conditions')
+
+  def __init__(self, raw):
+    super().__init__(raw)
+    owners = raw['metadata'].get('ownerReferences')
+    self.owner = owners[0] if owners else None
+    self.node_name = (raw.get('spec') or {}).get('nodeName')
+    self.phase = (raw.get('status') or {}).get('phase')
+    self.conditions = parse_conditions(raw)
+
+
+class NodeProjection(Projection):
+  __slots__ = ('copied_labels', 'conditions')
+
+  COPIED_LABELS = [ZONE_LABEL] # useful node labels copied to pod labels for convenience
+
+  def __init__(self, raw):
+    super().__init__(raw)
+    self.copied_labels = {key: value for key, value in self.labels.items() if key in NodeProjection.COPIED_LABELS}
+    self.conditions = parse_conditions(raw)
+
+  @property
+  def zone(self):
+    return self.labels.get(ZONE_LABEL)
+
+
+class LeaseProjection(Projection):
+  __slots__ = ('holder_identity', 'acquire_time', 'renew_time')
+
+  def __init__(self, raw):
+    super().__init__(raw)
+    spec = raw.get('spec') or {}
+    self.holder_identity = spec.get('holderIdentity')
+    self.acquire_time = parse_timestamp(spec.get('acquireTime'))
+    self.renew_time = parse_timestamp(spec.get('renewTime'))
+
+
+PROJECTIONS = {
+  'pod':   PodProjection,
+  'node':  NodeProjection,
+  'lease': LeaseProjection}
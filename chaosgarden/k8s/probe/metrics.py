@@ -1,37 +1,55 @@
+import math
 import re
 import sys
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from copy import copy
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
 from functools import reduce
-from typing import Dict, List, Tuple
+from itertools import chain, islice
+from operator import itemgetter
+from threading import RLock
+from typing import Dict, Iterable, List, Tuple
 
 from logzero import logger
 
 from chaosgarden.k8s.probe.thresholds import Thresholds
 
-INITIAL_FAILURE_EXCLUSION = defaultdict(lambda: 0, **{
-    'dns-management': 60,
-    'web-hook': 50})
-INITIAL_GAP_TOLERATION = defaultdict(lambda: 30, **{
-    'api': 15,
-    'api-external': 30,
-    'api-internal': 30,
-    'dns-external': 30,
-    'dns-internal': 30,
-    'dns-management': 60,
-    'pod-lifecycle': 40,
-    'web-hook': 50})
-REGULAR_GAP_TOLERATION = defaultdict(lambda: 15, **{
-    'api': 15,
-    'api-external': 15,
-    'api-internal': 15,
-    'dns-external': 15,
-    'dns-internal': 15,
-    'dns-management': 30,
-    'pod-lifecycle': 30,
-    'web-hook': 30})
+HEARTBEAT_NAME = re.compile(r'^(.+)-probe-(.+)-([0-9]+)') # e.g. `api-probe-regional-1700000000000` (milliseconds, or seconds as before)
+SECONDS_TIMESTAMP_LIMIT = 10**11                           # timestamps below are seconds (in milliseconds, that's 1973)
+INITIAL_FAILURE_EXCLUSION = defaultdict(lambda: 0, **{     # all tolerations in milliseconds
+    'dns-management': 60_000,
+    'web-hook': 50_000})
+INITIAL_GAP_TOLERATION = defaultdict(lambda: 30_000, **{
+    'api': 15_000,
+    'api-external': 30_000,
+    'api-internal': 30_000,
+    'dns-external': 30_000,
+    'dns-internal': 30_000,
+    'dns-management': 60_000,
+    'pod-lifecycle': 40_000,
+    'web-hook': 50_000})
+REGULAR_GAP_TOLERATION = defaultdict(lambda: 15_000, **{
+    'api': 15_000,
+    'api-external': 15_000,
+    'api-internal': 15_000,
+    'dns-external': 15_000,
+    'dns-internal': 15_000,
+    'dns-management': 30_000,
+    'pod-lifecycle': 30_000,
+    'web-hook': 30_000})
+
+
+def to_milliseconds(timestamp: int) -> int:
+    # heartbeats are named with milliseconds, but heartbeats named with seconds are still understood
+    return timestamp * 1000 if timestamp < SECONDS_TIMESTAMP_LIMIT else timestamp
+
+def to_seconds(milliseconds: int):
+    # whole seconds as `int` (as with the default probe interval of one second), else fractional seconds
+    return milliseconds // 1000 if milliseconds % 1000 == 0 else milliseconds / 1000
 
 
 class HeartbeatState(Enum):
@@ -40,78 +58,206 @@ class HeartbeatState(Enum):
     UNKNOWN = 'Unknown' # a.k.a. gap, inserted when we did not receive a heartbeat in time
 
 
+HEARTBEAT_STATES = tuple(HeartbeatState)                                             # state code (index) to state
+HEARTBEAT_STATE_CODES = {state: code for code, state in enumerate(HEARTBEAT_STATES)} # state to state code
+READY_CODE = HEARTBEAT_STATE_CODES[HeartbeatState.READY]
+NOT_READY_CODE = HEARTBEAT_STATE_CODES[HeartbeatState.NOT_READY]
+UNKNOWN_CODE = HEARTBEAT_STATE_CODES[HeartbeatState.UNKNOWN]
+
+
 class HeartbeatStateSeries:
+    # columnar series (sorted timestamps in milliseconds, state codes and interned payload indices in parallel arrays) that also keeps track of
+    # where the state changes and where heartbeats are missing while heartbeats are recorded (in order, as they are listed and
+    # sent), so that computing gaps and phases of long probes is proportional to the number of changes and gaps, not heartbeats
     def __init__(self, probe: str):
         self._probe: str = probe
-        self._series: Dict[int, Tuple[HeartbeatState, str]] = {}
+        self._regular_gap = max(1, REGULAR_GAP_TOLERATION[probe])
+        self._timestamps = array('q')
+        self._states = array('B')
+        self._payloads = array('I')
+        self._payload_table: List[str] = [None]         # interned payloads by index (index 0 means no payload)
+        self._payload_index: Dict[str, int] = {None: 0}
+        self._changes: List[int] = []                   # indices of heartbeats with a different state than their predecessor
+        self._gap_ends: List[int] = []                  # indices of heartbeats that came later than tolerated after their predecessor
+        self._pending: List[Tuple[int, int, int]] = []  # out-of-order heartbeats, merged into the columns when accessed next
+        self._pending_timestamps = set()                # timestamps of the above
+        self._indexed = True                            # whether the above indices reflect the columns
         self._gaps = 0
 
-    def __iter__(self):
-        return iter(sorted(self._series.items()))
+    def __len__(self):
+        self._merge()
+        return len(self._timestamps)
 
-    def record(self, timestamp: int, ready: HeartbeatState, payload: str = None):
-        self._series[timestamp] = (ready, payload)
-        if ready == HeartbeatState.UNKNOWN:
+    def __iter__(self):
+        self._merge()
+        for timestamp, state, payload in zip(self._timestamps, self._states, self._payloads):
+            yield timestamp, (HEARTBEAT_STATES[state], self._payload_table[payload])
+
+    def _intern(self, payload: str) -> int:
+        index = self._payload_index.get(payload)
+        if index is None:
+            index = self._payload_index[payload] = len(self._payload_table)
+            self._payload_table.append(payload)
+        return index
+
+    def _merge(self):
+        if not self._pending:
+            return
+        pending, self._pending = list(zip(self._timestamps, self._states, self._payloads)) + self._pending, []
+        self._pending_timestamps = set()
+        pending.sort(key = itemgetter(0)) # stable, so that later heartbeats for the same timestamp win
+        timestamps, states, payloads = zip(*dict((record[0], record) for record in pending).values())
+        self._timestamps, self._states, self._payloads = array('q', timestamps), array('B', states), array('I', payloads)
+        self._indexed = False
+
+    def _index(self):
+        self._merge()
+        if not self._indexed:
+            self._changes = [index for index, (prev_state, next_state) in enumerate(zip(self._states, islice(self._states, 1, None)), 1) if next_state != prev_state]
+            self._gap_ends = [index for index, (prev_timestamp, next_timestamp) in enumerate(zip(self._timestamps, islice(self._timestamps, 1, None)), 1) if next_timestamp > prev_timestamp + self._regular_gap]
+            self._indexed = True
+
+    def record(self, timestamp: int, ready: HeartbeatState, payload: str = None) -> bool:
+        # return whether there was no heartbeat for this timestamp yet (heartbeats may be seen more than once, e.g. when listed again)
+        state, payload = HEARTBEAT_STATE_CODES[ready], self._intern(payload) if payload else 0
+        if state == UNKNOWN_CODE:
             self._gaps += 1
+        timestamps, states = self._timestamps, self._states
+        if timestamps:
+            if self._pending or timestamp <= timestamps[-1]:
+                index = bisect_left(timestamps, timestamp)
+                new = (index == len(timestamps) or timestamps[index] != timestamp) and timestamp not in self._pending_timestamps
+                self._pending.append((timestamp, state, payload)) # out of order (rare)
+                self._pending_timestamps.add(timestamp)
+                return new
+            if state != states[-1]:
+                self._changes.append(len(timestamps))
+            if timestamp > timestamps[-1] + self._regular_gap:
+                self._gap_ends.append(len(timestamps))
+        timestamps.append(timestamp)
+        states.append(state)
+        self._payloads.append(payload)
+        return True
 
     def drop(self, timestamp: int):
-        return self._series.pop(timestamp, None)
+        self._merge()
+        index = bisect_left(self._timestamps, timestamp)
+        if index < len(self._timestamps) and self._timestamps[index] == timestamp:
+            record = (HEARTBEAT_STATES[self._states[index]], self._payload_table[self._payloads[index]])
+            del self._timestamps[index], self._states[index], self._payloads[index]
+            self._indexed = False
+            return record
+        return None
+
+    def truncate(self, to_timestamp: int):
+        # drop all heartbeats after the given timestamp
+        self._merge()
+        index = bisect_right(self._timestamps, to_timestamp)
+        if index < len(self._timestamps):
+            del self._timestamps[index:], self._states[index:], self._payloads[index:]
+            self._indexed = False
 
     def get_timestamps(self, from_timestamp: int = 0, to_timestamp: int = sys.maxsize):
-        return sorted([timestamp for timestamp in self._series.keys() if timestamp >= from_timestamp and timestamp < to_timestamp])
+        self._merge()
+        return self._timestamps[bisect_left(self._timestamps, from_timestamp):bisect_left(self._timestamps, to_timestamp)]
 
     def get_state(self, timestamp):
-        return self._series[timestamp][0]
+        self._merge()
+        index = bisect_left(self._timestamps, timestamp)
+        if index == len(self._timestamps) or self._timestamps[index] != timestamp:
+            raise KeyError(timestamp)
+        return HEARTBEAT_STATES[self._states[index]]
+
+    def copy(self):
+        self._merge()
+        series = copy(self)
+        series._timestamps, series._states, series._payloads = array('q', self._timestamps), array('B', self._states), array('I', self._payloads)
+        series._payload_table, series._payload_index = list(self._payload_table), dict(self._payload_index)
+        series._changes, series._gap_ends = list(self._changes), list(self._gap_ends)
+        series._pending, series._pending_timestamps = [], set()
+        return series
+
+    def get_columns(self) -> Tuple[array, array, List[int]]:
+        # sorted timestamps, their state codes (see `HEARTBEAT_STATES`) and the indices where the state changes (not to be modified)
+        self._index()
+        return self._timestamps, self._states, self._changes
 
     def get_gaps(self):
         return self._gaps
 
     def compute(self, from_timestamp: int, to_timestamp: int):
+        self._index()
+
         # drop failed heartbeats until state changes for the first time or grace period ends
         # (happens e.g. with web hook acknowledged heartbeats that are reporting `False` until
         #  the web hook becomes active; we don't care and don't want to see those heartbeats)
-        for timestamp in self.get_timestamps(to_timestamp = from_timestamp + max(0, INITIAL_FAILURE_EXCLUSION[self._probe])):
-            if self.get_state(timestamp) == HeartbeatState.NOT_READY:
-                self.drop(timestamp)
-            else:
-                break
+        if self._timestamps and self._states[0] == NOT_READY_CODE:
+            excluded = min(bisect_left(self._timestamps, from_timestamp + max(0, INITIAL_FAILURE_EXCLUSION[self._probe])), self._changes[0] if self._changes else len(self._timestamps))
+            del self._timestamps[:excluded], self._states[:excluded], self._payloads[:excluded]
+            self._changes = [index - excluded for index in self._changes if index > excluded]
+            self._gap_ends = [index - excluded for index in self._gap_ends if index > excluded]
 
         # get (default) tolerated initial and regular gaps before/in between individual heartbeats, so that we know when to insert gap heartbeats indicating loss of heartbeat
         initial_gap = max(0, INITIAL_GAP_TOLERATION[self._probe])
-        regular_gap = max(1, REGULAR_GAP_TOLERATION[self._probe])
+        regular_gap = self._regular_gap
 
         # insert first and/or last gap heartbeat if missing
-        timestamps = self.get_timestamps()
-        if timestamps[0] > from_timestamp + initial_gap:
-            self.record(from_timestamp + initial_gap, HeartbeatState.UNKNOWN, 'Gap (Initial)')
-        if timestamps[-1] + regular_gap < to_timestamp:
+        if not self._timestamps or self._timestamps[0] > from_timestamp + initial_gap:
+            self._timestamps.insert(0, from_timestamp + initial_gap)
+            self._states.insert(0, UNKNOWN_CODE)
+            self._payloads.insert(0, self._intern('Gap (Initial)'))
+            self._gaps += 1
+            self._changes = ([1] if len(self._states) > 1 and self._states[1] != UNKNOWN_CODE else []) + [index + 1 for index in self._changes]
+            self._gap_ends = ([1] if len(self._timestamps) > 1 and self._timestamps[1] > self._timestamps[0] + regular_gap else []) + [index + 1 for index in self._gap_ends]
+        if self._timestamps[-1] + regular_gap < to_timestamp:
             self.record(to_timestamp, HeartbeatState.UNKNOWN, 'Gap (Final)')
 
-        # insert intermediate gap heartbeats if missing
-        timestamps = self.get_timestamps()
-        prev_timestamp = timestamps[0]
-        for next_timestamp in timestamps[1:]:
-            if next_timestamp > prev_timestamp + regular_gap:
-                for timestamp in range(prev_timestamp + regular_gap, next_timestamp, regular_gap):
-                    self.record(timestamp, HeartbeatState.UNKNOWN, 'Gap')
-            prev_timestamp = next_timestamp
+        # insert intermediate gap heartbeats if missing (splice columns and gap heartbeats together in one pass, carrying over the state changes)
+        if self._gap_ends:
+            gap_payload = self._intern('Gap')
+            timestamps, states, payloads, changes = array('q'), array('B'), array('I'), []
+            start = change = 0
+            for end in self._gap_ends:
+                while change < len(self._changes) and self._changes[change] < end:
+                    changes.append(self._changes[change] + len(timestamps) - start)
+                    change += 1
+                if change < len(self._changes) and self._changes[change] == end:
+                    change += 1 # superseded by the state changes around the gap heartbeats
+                timestamps.extend(self._timestamps[start:end])
+                states.extend(self._states[start:end])
+                payloads.extend(self._payloads[start:end])
+                gaps = range(self._timestamps[end - 1] + regular_gap, self._timestamps[end], regular_gap)
+                if self._states[end - 1] != UNKNOWN_CODE:
+                    changes.append(len(timestamps))
+                timestamps.extend(gaps)
+                states.extend(array('B', [UNKNOWN_CODE]) * len(gaps))
+                payloads.extend(array('I', [gap_payload]) * len(gaps))
+                if self._states[end] != UNKNOWN_CODE:
+                    changes.append(len(timestamps))
+                self._gaps += len(gaps)
+                start = end
+            changes.extend(index + len(timestamps) - start for index in self._changes[change:])
+            timestamps.extend(self._timestamps[start:])
+            states.extend(self._states[start:])
+            payloads.extend(self._payloads[start:])
+            self._timestamps, self._states, self._payloads, self._changes, self._gap_ends = timestamps, states, payloads, changes, []
 
     def dump(self):
         for timestamp, (state, payload) in self:
-            logger.debug(f'    - {state.value:>9} at {datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")}' + (f' ({payload})' if payload else ''))
+            logger.debug(f'    - {state.value:>9} at {datetime.fromtimestamp(timestamp // 1000).strftime("%H:%M:%S")}{f".{timestamp % 1000:03d}" if timestamp % 1000 else ""}' + (f' ({payload})' if payload else ''))
 
 
 @dataclass
 class HeartbeatPhase:
     state: HeartbeatState
-    duration: int
+    duration: int # milliseconds
 
 
 class HeartbeatPhaseSeries:
     def __init__(self, probe: str):
         self._probe: str = probe
         self._series: List[HeartbeatPhase] = []
-        self._downtime: int = 0
+        self._downtime: int = 0 # milliseconds
 
     def __iter__(self):
         return iter(self._series)
@@ -120,29 +266,93 @@ class HeartbeatPhaseSeries:
         return self._probe
 
     def get_downtime(self):
-        return self._downtime
+        return to_seconds(self._downtime)
 
     def compute(self, heartbeats: HeartbeatStateSeries):
-        # replace stable individual states with phases with duration
-        timestamps = heartbeats.get_timestamps()
-        prev_timestamp = timestamps[0]
-        prev_state = heartbeats.get_state(prev_timestamp)
-        if len(timestamps) >= 2:
-            for next_timestamp in timestamps[1:]:
-                next_state = heartbeats.get_state(next_timestamp)
-                if next_state != prev_state or next_timestamp == timestamps[-1]:
-                    phase = HeartbeatPhase(prev_state, next_timestamp - prev_timestamp)
-                    self._series.append(phase)
-                    if prev_state != HeartbeatState.READY:
-                        self._downtime  += phase.duration
-                    prev_timestamp = next_timestamp
-                    prev_state = next_state
+        # replace stable individual states with phases with duration (one phase per state change, plus the last one)
+        timestamps, states, changes = heartbeats.get_columns()
+        last = len(timestamps) - 1
+        if last >= 1:
+            prev_index = 0
+            for next_index in changes if changes and changes[-1] == last else chain(changes, [last]):
+                phase = HeartbeatPhase(HEARTBEAT_STATES[states[prev_index]], timestamps[next_index] - timestamps[prev_index])
+                self._series.append(phase)
+                if states[prev_index] != READY_CODE:
+                    self._downtime  += phase.duration
+                prev_index = next_index
         else:
-            self._series.append(HeartbeatPhase(prev_state, 0))
+            self._series.append(HeartbeatPhase(HEARTBEAT_STATES[states[0]], 0))
 
     def dump(self):
         for phase in self:
-            logger.info(f'    - {phase.state.value:>9} for {phase.duration:>4}s')
+            logger.info(f'    - {phase.state.value:>9} for {to_seconds(phase.duration):>4}s')
+
+
+class LatencyHistogram:
+    # log-linear (HDR-style) histogram of latencies in microseconds: every power of two is split into the same number of linear sub-buckets,
+    # so that memory stays constant and the relative error stays below 1/64 for all values, while histograms can be merged (e.g. across zones)
+    SUB_BUCKET_BITS = 7
+    SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+
+    def __init__(self):
+        self._counts = array('Q')
+        self._count = 0
+        self._max = 0
+
+    def __len__(self):
+        return self._count
+
+    def _index(self, value: int) -> int:
+        exponent = max(0, value.bit_length() - LatencyHistogram.SUB_BUCKET_BITS)
+        return exponent * LatencyHistogram.SUB_BUCKET_HALF + (value >> exponent)
+
+    def _highest_value(self, index: int) -> int:
+        # highest value that falls into the bucket (reported as percentile value, so that percentiles are never underestimated)
+        exponent = max(0, index // LatencyHistogram.SUB_BUCKET_HALF - 1)
+        return ((index - exponent * LatencyHistogram.SUB_BUCKET_HALF) << exponent) + (1 << exponent) - 1
+
+    def record(self, latency: float):
+        # latency in milliseconds
+        value = max(0, int(round(latency * 1000)))
+        index = self._index(value)
+        if index >= len(self._counts):
+            self._counts.extend(array('Q', [0]) * (index + 1 - len(self._counts)))
+        self._counts[index] += 1
+        self._count += 1
+        self._max = max(self._max, value)
+
+    def merge(self, other: 'LatencyHistogram'):
+        if len(other._counts) > len(self._counts):
+            self._counts.extend(array('Q', [0]) * (len(other._counts) - len(self._counts)))
+        for index, count in enumerate(other._counts):
+            if count:
+                self._counts[index] += count
+        self._count += other._count
+        self._max = max(self._max, other._max)
+        return self
+
+    def copy(self):
+        histogram = LatencyHistogram()
+        return histogram.merge(self)
+
+    def get_percentile(self, percentile: float) -> float:
+        # latency in milliseconds that the given percentage of all latencies doesn't exceed (`None` if there are no latencies)
+        if not self._count:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * self._count))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                return min(self._highest_value(index), self._max) / 1000
+        return self._max / 1000
+
+    def get_max(self) -> float:
+        return self._max / 1000 if self._count else None
+
+    def dump(self, indent: str = '    '):
+        if self._count:
+            logger.info(f'{indent}- Latency: p50 {self.get_percentile(50):.1f}ms, p95 {self.get_percentile(95):.1f}ms, p99 {self.get_percentile(99):.1f}ms, max {self.get_max():.1f}ms ({self._count}x measured)')
 
 
 class MetricsForZone:
@@ -152,6 +362,7 @@ class MetricsForZone:
         self._heartbeats = HeartbeatStateSeries(probe)
         self._heartbeats_sent = self._heartbeats_received = None
         self._phases = HeartbeatPhaseSeries(probe)
+        self._latencies = LatencyHistogram()
 
     def get_probe_name(self):
         return self._probe
@@ -159,8 +370,23 @@ class MetricsForZone:
     def get_zone_name(self):
         return self._zone
 
-    def record_heartbeat(self, timestamp, ready, payload = None):
-        self._heartbeats.record(timestamp, ready, payload)
+    def record_heartbeat(self, timestamp, ready, payload = None, latency = None):
+        # latencies are counted once per heartbeat (heartbeats may be seen more than once)
+        if self._heartbeats.record(timestamp, ready, payload) and latency is not None:
+            self._latencies.record(latency)
+
+    def record_latency(self, latency):
+        self._latencies.record(latency)
+
+    def get_latencies(self):
+        return self._latencies
+
+    def copy(self):
+        metrics = MetricsForZone(self._probe, self._zone)
+        metrics._heartbeats = self._heartbeats.copy()
+        metrics._latencies = self._latencies.copy()
+        metrics._heartbeats_sent, metrics._heartbeats_received = self._heartbeats_sent, self._heartbeats_received
+        return metrics
 
     def record_heartbeats_sent(self, sent):
         self._heartbeats_sent = sent
@@ -182,7 +408,7 @@ class MetricsForZone:
 
     def compute(self, from_timestamp: int, to_timestamp: int):
         # record actual number of sent and received heartbeats (sent is assumed to be equal to received unless overwritten by setter function)
-        self._heartbeats_received = len(self._heartbeats.get_timestamps()) if self._heartbeats_received == None else self._heartbeats_received
+        self._heartbeats_received = len(self._heartbeats) if self._heartbeats_received == None else self._heartbeats_received
         self._heartbeats_sent = self._heartbeats_received if self._heartbeats_sent == None else self._heartbeats_sent
 
         # compute gap heartbeats
@@ -193,6 +419,7 @@ class MetricsForZone:
 
     def dump(self, thresholds: Thresholds):
         logger.info(f'  - Zone: {self.get_zone_name().upper()} ({self.get_heartbeats_sent()}x sent, {self.get_heartbeats_received()}x received, {self.get_heartbeats_gaps()}x gaps, {self.get_heartbeats_lost()}x lost, {self.get_downtime()}s total downtime and {thresholds.get_toleration(probe = self.get_probe_name(), zone = self.get_zone_name())}s maximum toleration)')
+        self._latencies.dump()
         self._phases.dump()
         logger.debug(f'    Records:')
         self._heartbeats.dump()
@@ -201,10 +428,26 @@ class MetricsForZone:
         violations = []
         if self.get_heartbeats_lost() != 0:
             violations.append(f'Data loss detected: {self.get_heartbeats_sent()}x sent, {self.get_heartbeats_received()}x received, {self.get_heartbeats_lost()}x lost, which means we lost ETCD data!')
+        violations.extend(self.assess_downtime(thresholds))
+        violations.extend(self.assess_latency(thresholds))
+        return violations
+
+    def assess_downtime(self, thresholds: Thresholds):
+        # can also be assessed while the probe is running (data loss only when it's known how many heartbeats were sent)
+        violations = []
         if self.get_downtime() > thresholds.get_toleration(probe = self.get_probe_name(), zone = self.get_zone_name()):
             violations.append(f'Functional outage detected: {self.get_probe_name().upper()} in zone {self.get_zone_name().upper()} was {self.get_downtime()}s not Ready, but only {thresholds.get_toleration(probe = self.get_probe_name(), zone = self.get_zone_name())}s were tolerated, which means we missed KPI goals!')
         return violations
 
+    def assess_latency(self, thresholds: Thresholds):
+        # assessed only at the end (unlike downtime, percentiles may still recover)
+        violations = []
+        for percentile, slo in thresholds.get_latency_slos(probe = self.get_probe_name(), zone = self.get_zone_name()).items():
+            latency = self._latencies.get_percentile(float(percentile[1:]))
+            if latency is not None and latency > slo:
+                violations.append(f'Latency degradation detected: {self.get_probe_name().upper()} in zone {self.get_zone_name().upper()} had a {percentile} latency of {latency:.1f}ms, but only {slo:.1f}ms were tolerated, which means we missed KPI goals!')
+        return violations
+
 
 class MetricsForZoneCollection:
     def __init__(self, probe):
@@ -214,6 +457,9 @@ class MetricsForZoneCollection:
     def __iter__(self):
         return iter(sorted(self._zones.values(), key = lambda x: x.get_zone_name()))
 
+    def __len__(self):
+        return len(self._zones)
+
     def get_probe_name(self):
         return self._probe
 
@@ -221,7 +467,24 @@ class MetricsForZoneCollection:
         return self._zones.setdefault(zone.lower(), MetricsForZone(self._probe, zone.lower()))
 
     def get_downtime(self):
-        return reduce(lambda x, y: x + y, [m.get_downtime() for m in self._zones.values()], 0)
+        return round(reduce(lambda x, y: x + y, [m.get_downtime() for m in self._zones.values()], 0), 3)
+
+    def get_latencies(self):
+        # latencies across all zones
+        return reduce(lambda x, y: x.merge(y), [m.get_latencies() for m in self._zones.values()], LatencyHistogram())
+
+    def copy(self):
+        metrics = MetricsForZoneCollection(self._probe)
+        metrics._zones = {zone: m.copy() for zone, m in self._zones.items()}
+        return metrics
+
+    def truncate(self, to_timestamp: int):
+        # drop heartbeats after the given timestamp and zones that had only such heartbeats (they were ingested before the end was known,
+        # but would otherwise show up as phantom zones without any received heartbeat)
+        for zone in self:
+            zone._heartbeats.truncate(to_timestamp)
+            if not len(zone._heartbeats):
+                del self._zones[zone.get_zone_name()]
 
     def compute(self, from_timestamp: int, to_timestamp: int):
         for zone in self:
@@ -239,17 +502,77 @@ class MetricsForZoneCollection:
 
 
 class Metrics:
-    def __init__(self, heartbeats: List[Dict], from_timestamp: int, to_timestamp: int):
+    # heartbeats are either passed all at once (and computed right away) or ingested one by one as they arrive while the probe
+    # is running (see `ingest()`, `snapshot()` and `compute()`), in which case only the last phases need to be closed at the end
+    # (all timestamps in milliseconds)
+    def __init__(self, heartbeats: Iterable[Dict] = (), from_timestamp: int = None, to_timestamp: int = None):
+        self._lock = RLock()
         self._probes: Dict[str, MetricsForZoneCollection] = {}
+        self._windows: Dict[str, str] = {} # last seen readiness by heartbeat window (windows are updated while they fill up)
+        self._from_timestamp = from_timestamp
+        self._to_timestamp = None
         for heartbeat in heartbeats:
-            segments = re.match(r'^(.+)-probe-(.+)-([0-9]+)', heartbeat['metadata']['name'].lower())
-            probe, zone, timestamp = segments.group(1), segments.group(2), int(segments.group(3))
-            if timestamp >= (from_timestamp - 5) and timestamp <= (to_timestamp + 15):
-                self.get_metrics_for_probe(probe).get_metrics_for_zone(zone).record_heartbeat(timestamp, HeartbeatState.READY if heartbeat['ready'] else HeartbeatState.NOT_READY, heartbeat['payload'] if 'payload' in heartbeat and heartbeat['payload'] else None)
+            self.ingest(heartbeat)
+        if to_timestamp is not None:
+            self.compute(to_timestamp)
+
+    def ingest(self, heartbeat: Dict):
+        # heartbeats come either one per object or aggregated into heartbeat windows (one object per probe, zone and window)
+        segments = HEARTBEAT_NAME.match(heartbeat['metadata']['name'].lower())
+        probe, zone, timestamp = segments.group(1), segments.group(2), to_milliseconds(int(segments.group(3)))
+        with self._lock:
+            if self._to_timestamp is not None:
+                pass # rejecting heartbeats that arrive after the metrics were computed
+            elif 'readiness' in heartbeat:
+                self.ingest_window(heartbeat['metadata']['name'].lower(), probe, zone, timestamp, heartbeat['readiness'] or '', heartbeat.get('interval') or 1000, heartbeat.get('payloads') or {}, heartbeat.get('latencies') or {})
+            elif self._from_timestamp is None or timestamp >= (self._from_timestamp - 5000):
+                self.get_metrics_for_probe(probe).get_metrics_for_zone(zone).record_heartbeat(timestamp, HeartbeatState.READY if heartbeat['ready'] else HeartbeatState.NOT_READY, heartbeat['payload'] if 'payload' in heartbeat and heartbeat['payload'] else None, heartbeat.get('latency'))
             else:
-                pass # rejecting {probe} heartbeat from zone {zone} with timestamp {datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")}
-        for probe in self:
-            probe.compute(from_timestamp, to_timestamp)
+                pass # rejecting {probe} heartbeat from zone {zone} with timestamp {datetime.fromtimestamp(timestamp / 1000).strftime("%H:%M:%S")}
+
+    def ingest_window(self, name: str, probe: str, zone: str, start: int, readiness: str, interval: int, payloads: Dict[str, str], latencies: Dict[str, float]):
+        # record only the slots (one per probe interval in milliseconds) that changed since the last update of the window
+        last_readiness = self._windows.get(name, '')
+        self._windows[name] = readiness
+        metrics = None
+        payload = None
+        for offset, state in enumerate(readiness):
+            if str(offset) in payloads:
+                payload = payloads[str(offset)] or None # payloads are sampled whenever they change
+            if state == '-' or (offset < len(last_readiness) and last_readiness[offset] == state):
+                continue
+            if self._from_timestamp is None or start + offset * interval >= (self._from_timestamp - 5000):
+                metrics = metrics or self.get_metrics_for_probe(probe).get_metrics_for_zone(zone)
+                metrics.record_heartbeat(start + offset * interval, HeartbeatState.READY if state == 'R' else HeartbeatState.NOT_READY, payload, latencies.get(str(offset)))
+
+    def record_latency(self, probe: str, zone: str, latency: float):
+        # latency measured here (e.g. by the regional API probe), in milliseconds
+        with self._lock:
+            if self._to_timestamp is None:
+                self.get_metrics_for_probe(probe).get_metrics_for_zone(zone).record_latency(latency)
+
+    def get_from_timestamp(self):
+        return self._from_timestamp
+
+    def get_to_timestamp(self):
+        return self._to_timestamp
+
+    def snapshot(self, to_timestamp: int):
+        # metrics computed from a copy of what was ingested so far (e.g. to report intermediate downtimes), while ingestion continues
+        with self._lock:
+            metrics = Metrics(from_timestamp = self._from_timestamp)
+            metrics._probes = {probe: m.copy() for probe, m in self._probes.items()}
+        metrics.compute(to_timestamp)
+        return metrics
+
+    def compute(self, to_timestamp: int):
+        with self._lock:
+            self._to_timestamp = to_timestamp
+            for probe in self:
+                probe.truncate(to_timestamp + 15000) # heartbeats that were ingested before the end was known
+            self._probes = {name: probe for name, probe in self._probes.items() if len(probe)}
+            for probe in self:
+                probe.compute(self._from_timestamp, to_timestamp)
 
     def __iter__(self):
         return iter(sorted(self._probes.values(), key = lambda x: x.get_probe_name()))
@@ -258,12 +581,13 @@ class Metrics:
         return self._probes.setdefault(probe.lower(), MetricsForZoneCollection(probe.lower()))
 
     def get_downtime(self):
-        return reduce(lambda x, y: x + y, [m.get_downtime() for m in self._probes.values()], 0)
+        return round(reduce(lambda x, y: x + y, [m.get_downtime() for m in self._probes.values()], 0), 3)
 
     def dump(self, thresholds: Thresholds):
         logger.info(f'Metrics:')
         for m in self:
             logger.info(f'- Probe:  {m.get_probe_name().upper()} ({m.get_downtime()}s total downtime)')
+            m.get_latencies().dump(indent = '  ')
             m.dump(thresholds)
 
     def assess(self, thresholds: Thresholds):
@@ -3,6 +3,7 @@ import datetime
 import pkgutil
 from collections.abc import Sized
 from textwrap import indent
+from threading import Lock
 
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes, serialization
@@ -10,48 +11,85 @@ from cryptography.hazmat.primitives.asymmetric import rsa
 from cryptography.x509.oid import NameOID
 from mako.template import Template
 
+CRT_REUSE_HOURS = 24 # cached key and certificate are issued for this much longer than the requested validity and renewed once less than the requested validity remains (so that every run gets all of it)
+
+__lock = Lock()
+__template = None  # compiled template and indented sources (read and compiled once per process)
+__tls_by_key = {}  # cached key and certificate (base64-encoded PEM) and their expiry by key size and validity
+
 
 def render(
         zones: Sized = (None,),
         key_size = 2048,
-        crt_validity_hours: int = 24):
-    # read template and sources
-    templated_resources = pkgutil.get_data(__name__, 'templated_resources.yaml')
-    probe_pod_source    = pkgutil.get_data(__name__, 'probe_pod.py')
-    suicidal_pod_source = pkgutil.get_data(__name__, 'suicidal_pod.py')
-
-    # generate RSA private key
-    key = rsa.generate_private_key(
-        public_exponent = 65537, # recommended value, see https://cryptography.io/en/latest/hazmat/primitives/asymmetric/rsa/#generation
-        key_size = key_size)
-    key_pem = key.private_bytes(
-        encoding = serialization.Encoding.PEM,
-        format = serialization.PrivateFormat.TraditionalOpenSSL,
-        encryption_algorithm = serialization.NoEncryption())
-    key_pem_b64 = base64.b64encode(key_pem).decode('utf-8')
-
-    # generate self-signed X.509 certificate
-    crt_common_name = r'probe.chaos-garden-probe.svc' # must match name and namespace of service
-    subject = issuer = x509.Name([
-        x509.NameAttribute(NameOID.COMMON_NAME, crt_common_name)
-    ])
-    crt = x509.CertificateBuilder() \
-        .subject_name(subject) \
-        .issuer_name(issuer) \
-        .public_key(key.public_key()) \
-        .serial_number(x509.random_serial_number()) \
-        .not_valid_before(datetime.datetime.utcnow()) \
-        .not_valid_after(datetime.datetime.utcnow() + datetime.timedelta(hours = crt_validity_hours)) \
-        .add_extension(x509.SubjectAlternativeName([x509.DNSName(crt_common_name)]), critical = True) \
-        .sign(key, hashes.SHA256())
-    crt_pem = crt.public_bytes(serialization.Encoding.PEM)
-    crt_pem_b64 = base64.b64encode(crt_pem).decode('utf-8')
-
-    # render template
-    template = Template(templated_resources)
+        crt_validity_hours: int = 24,
+        heartbeat_window: int = 0,
+        probe_interval: float = 1,
+        heartbeat_retention: int = 0,
+        run_id: str = '',
+        tls: bool = True): # without key and certificate, e.g. if only names and kinds are needed (cleanup), which is considerably faster
+    template, probe_pod_source, suicidal_pod_source = load_template()
+    key_pem_b64, crt_pem_b64 = generate_tls(key_size, crt_validity_hours) if tls else ('', '')
     return template.render(
         replicas = max(1, len(zones)),
+        heartbeat_window = max(0, heartbeat_window),
+        probe_interval = max(0.001, probe_interval),
+        heartbeat_retention = max(0, heartbeat_retention),
+        run_id = run_id,
         key = key_pem_b64,
         crt = crt_pem_b64,
-        probe_pod_source = indent(probe_pod_source.decode('utf-8'), '    '),
-        suicidal_pod_source = indent(suicidal_pod_source.decode('utf-8'), '    '))
+        probe_pod_source = probe_pod_source,
+        suicidal_pod_source = suicidal_pod_source)
+
+def load_template():
+    global __template
+    with __lock:
+        if not __template:
+            # read template and sources
+            templated_resources = pkgutil.get_data(__name__, 'templated_resources.yaml')
+            probe_pod_source    = pkgutil.get_data(__name__, 'probe_pod.py')
+            suicidal_pod_source = pkgutil.get_data(__name__, 'suicidal_pod.py')
+            __template = (
+                Template(templated_resources),
+                indent(probe_pod_source.decode('utf-8'), '    '),
+                indent(suicidal_pod_source.decode('utf-8'), '    '))
+        return __template
+
+def generate_tls(key_size: int, crt_validity_hours: int):
+    # RSA key generation is expensive, so key and certificate are reused across renders (and runs) as long as they remain valid for at least
+    # the requested validity
+    with __lock:
+        now = datetime.datetime.utcnow()
+        cached = __tls_by_key.get((key_size, crt_validity_hours))
+        if cached and cached[2] - now >= datetime.timedelta(hours = crt_validity_hours):
+            return cached[0], cached[1]
+
+        # generate RSA private key
+        key = rsa.generate_private_key(
+            public_exponent = 65537, # recommended value, see https://cryptography.io/en/latest/hazmat/primitives/asymmetric/rsa/#generation
+            key_size = key_size)
+        key_pem = key.private_bytes(
+            encoding = serialization.Encoding.PEM,
+            format = serialization.PrivateFormat.TraditionalOpenSSL,
+            encryption_algorithm = serialization.NoEncryption())
+        key_pem_b64 = base64.b64encode(key_pem).decode('utf-8')
+
+        # generate self-signed X.509 certificate
+        crt_common_name = r'probe.chaos-garden-probe.svc' # must match name and namespace of service
+        subject = issuer = x509.Name([
+            x509.NameAttribute(NameOID.COMMON_NAME, crt_common_name)
+        ])
+        expiry = now + datetime.timedelta(hours = crt_validity_hours + CRT_REUSE_HOURS)
+        crt = x509.CertificateBuilder() \
+            .subject_name(subject) \
+            .issuer_name(issuer) \
+            .public_key(key.public_key()) \
+            .serial_number(x509.random_serial_number()) \
+            .not_valid_before(now) \
+            .not_valid_after(expiry) \
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(crt_common_name)]), critical = True) \
+            .sign(key, hashes.SHA256())
+        crt_pem = crt.public_bytes(serialization.Encoding.PEM)
+        crt_pem_b64 = base64.b64encode(crt_pem).decode('utf-8')
+
+        __tls_by_key[(key_size, crt_validity_hours)] = (key_pem_b64, crt_pem_b64, expiry)
+        return key_pem_b64, crt_pem_b64
@@ -1,10 +1,16 @@
 import base64
+import ipaddress
+import math
+import os
+import random
 import re
 import signal
 import socket
+import struct
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from queue import Queue
+from queue import Empty, Queue
 from subprocess import PIPE, Popen
 from threading import Lock, Thread, current_thread
 from urllib.parse import urlparse
@@ -14,12 +20,25 @@ from kubernetes import client, config
 from kubernetes.client.exceptions import ApiException
 
 DNS_MGMT_PROBE_MAX_LAG = 60
+DNS_RESOLVER = os.environ.get('DNS_RESOLVER', 'in-process')                 # `in-process` (query the nameservers from `/etc/resolv.conf` directly) or `forked` (resolve in a forked interpreter)
+DNS_LOOKUP_TIMEOUT = 5                                                      # max seconds per in-process lookup (across all search domains, attempts and nameservers)
+EMITTER_PARALLELISM = int(os.environ.get('EMITTER_PARALLELISM', '8'))       # max heartbeats sent at the same time
+EMITTER_BATCH_SIZE = int(os.environ.get('EMITTER_BATCH_SIZE', '64'))        # max heartbeats taken from the queue at once
+EMITTER_MIN_BACK_OFF = float(os.environ.get('EMITTER_MIN_BACK_OFF', '0.5')) # back-off after the first failed batch, doubled with every further one
+EMITTER_MAX_BACK_OFF = float(os.environ.get('EMITTER_MAX_BACK_OFF', '8'))   # max back-off
+HEARTBEAT_WINDOW = int(os.environ.get('HEARTBEAT_WINDOW', '0'))             # seconds aggregated into one heartbeat window object per probe (0 means one heartbeat object per heartbeat)
+RUN_ID = os.environ.get('RUN_ID', '')                                       # id of the probe run, heartbeats are labelled with (and their zone), so that they can be deleted by run and zone
 
 pod_name = open('/pod/name', 'rt').read()
 pod_namespace = open('/pod/namespace', 'rt').read()
 zone_name = 'na'
-interval = 1
-queue = Queue()
+interval = float(os.environ.get('PROBE_INTERVAL', '1')) # seconds between two heartbeats of a probe (fixed rate, may be sub-second)
+interval_ms = max(1, round(interval * 1000))
+window_ms = math.ceil(HEARTBEAT_WINDOW * 1000 / interval_ms) * interval_ms # windows hold whole intervals (one readiness slot per interval)
+queue = Queue() # (enqueue time, heartbeat)
+resolv_conf = None # nameservers, search domains and options, if DNS is resolved in-process
+windows = {}    # heartbeat windows by name, if heartbeats are aggregated (see `HEARTBEAT_WINDOW`)
+emitter_metrics = {'heartbeats_sent': 0, 'heartbeats_failed': 0, 'drain_latency_seconds': 0.0}
 lock = Lock()
 in_termination = False
 flask_app = Flask(__name__)
@@ -38,6 +57,36 @@ def livez():
 def readyz():
     return 'OK'
 
+@flask_app.route('/metrics', methods=['GET'])
+def metrics():
+    # emitter metrics in Prometheus text format
+    return '\n'.join([
+        f'emitter_queue_depth {queue.qsize()}',
+        f'emitter_drain_latency_seconds {emitter_metrics["drain_latency_seconds"]}',
+        f'emitter_heartbeats_sent_total {emitter_metrics["heartbeats_sent"]}',
+        f'emitter_heartbeats_failed_total {emitter_metrics["heartbeats_failed"]}']) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+
+##########
+# Ticker #
+##########
+
+class Ticker:
+    # fixed-rate ticks on the monotonic clock (fixed delays drift by the time spent in between), aligned to multiples of the interval on the
+    # wall clock (so that ticks of different probes line up); ticks that were missed by more than one interval are skipped, not caught up
+    def __init__(self, interval):
+        wall = time.time()
+        self._interval = interval
+        self._wall = math.ceil(wall / interval) * interval # wall clock time of the first tick
+        self._monotonic = time.monotonic() + self._wall - wall # monotonic time of the first tick
+        self._tick = -1
+
+    def wait(self):
+        # sleep until the next tick that wasn't missed and return its (scheduled) wall clock time in milliseconds (heartbeats are named after it)
+        self._tick = max(self._tick + 1, math.floor((time.monotonic() - self._monotonic) / self._interval))
+        time.sleep(max(0, self._monotonic + self._tick * self._interval - time.monotonic()))
+        return round((self._wall + self._tick * self._interval) * 1000)
+
 
 ##########
 # Probes #
@@ -57,7 +106,13 @@ def webhook_probe():
                 }
             }
         }
-    jsonpatch = f'[{{"op": "replace", "path": "/ready", "value": true}}, {{"op": "add", "path": "/payload", "value": "acknowledged by {pod_name} in {zone_name}"}}]' # https://json8.github.io/patch/demos/apply
+    jsonpatch = f'[{{"op": "replace", "path": "/ready", "value": true}}, {{"op": "add", "path": "/payload", "value": "acknowledged by {pod_name} in {zone_name}"}}' # https://json8.github.io/patch/demos/apply
+    try:
+        sent = float(req['request']['object']['metadata']['annotations']['chaos.gardener.cloud/sent'])
+        jsonpatch += f', {{"op": "add", "path": "/latency", "value": {max(0, time.time() - sent) * 1000:.3f}}}' # from challenger to web hook (wall clocks of both pods)
+    except Exception:
+        pass # no (valid) send time
+    jsonpatch += ']'
     res['response']['patchType'] = 'JSONPatch'
     res['response']['patch']     = base64.b64encode(jsonpatch.encode('utf-8')).decode('utf-8')
     return jsonify(res)
@@ -67,12 +122,17 @@ def web_hook_challenger():
     crd_client = None
 
     # run challenger
+    ticker = Ticker(interval)
     while not is_terminated():
+        timestamp = ticker.wait()
         try:
             hb = {
                 'apiVersion': 'chaos.gardener.cloud/v1',
                 'kind': 'AcknowledgedHeartbeat',
-                'metadata': {'name': f'web-hook-probe-regional-{int(datetime.now(tz=timezone.utc).timestamp())}'},
+                'metadata': {
+                    'name': f'web-hook-probe-regional-{timestamp}',
+                    'labels': heartbeat_labels('regional'),
+                    'annotations': {'chaos.gardener.cloud/sent': f'{time.time():.6f}'}},
                 'ready': False
                 }
             if not crd_client:
@@ -86,8 +146,6 @@ def web_hook_challenger():
                 crd_client = None
         else:
             print(f'Web hook challenge resource creation succeeded')
-        finally:
-            time.sleep(interval)
 
 def resolve_all_ips_from_this_process(host):
     if ':' in host:
@@ -105,6 +163,135 @@ def resolve_any_ip_from_forked_process(host):
         raise RuntimeError(f'Resolving FQDN {host} returned exit code {code}: {err.decode("utf-8") if err else "n/a"}')
     return host, out.decode('utf-8')
 
+def read_resolv_conf(path = '/etc/resolv.conf'):
+    # read nameservers, search domains and the options that matter for the lookup order and timeouts (defaults as in resolv.conf(5))
+    conf = {'nameservers': [], 'search': [], 'ndots': 1, 'timeout': 5, 'attempts': 2}
+    for line in open(path, 'rt'):
+        fields = re.split(r'[#;]', line)[0].split()
+        if len(fields) < 2:
+            continue
+        if fields[0] == 'nameserver':
+            conf['nameservers'].append(fields[1])
+        elif fields[0] in ['search', 'domain']:
+            conf['search'] = fields[1:]
+        elif fields[0] == 'options':
+            for option in fields[1:]:
+                key, _, value = option.partition(':')
+                if key in ['ndots', 'timeout', 'attempts'] and value.isdigit():
+                    conf[key] = int(value)
+    return conf
+
+def build_dns_query(id, name):
+    # header (recursion desired) and one question for the A record of the name
+    header = struct.pack('!HHHHHH', id, 0x0100, 1, 0, 0, 0)
+    question = b''.join(bytes([len(label)]) + label for label in name.rstrip('.').encode('idna').split(b'.')) + b'\x00' + struct.pack('!HH', 1, 1)
+    return header + question
+
+def skip_dns_name(data, offset):
+    # skip (possibly compressed) name and return offset after it
+    while True:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        offset += 1 + length
+        if length == 0:
+            return offset
+
+def parse_dns_response(data):
+    # return id, flags and all A record addresses (CNAME chains are followed by the recursive nameserver)
+    id, flags, qdcount, ancount, _, _ = struct.unpack_from('!HHHHHH', data)
+    offset = 12
+    for _ in range(qdcount):
+        offset = skip_dns_name(data, offset) + 4
+    ips = []
+    for _ in range(ancount):
+        offset = skip_dns_name(data, offset)
+        rtype, rclass, _, rdlength = struct.unpack_from('!HHIH', data, offset)
+        offset += 10
+        if rtype == 1 and rclass == 1 and rdlength == 4:
+            ips.append(socket.inet_ntoa(data[offset:offset + 4]))
+        offset += rdlength
+    return id, flags, ips
+
+def receive_exactly(sock, count):
+    data = b''
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise RuntimeError('Connection closed by nameserver')
+        data += chunk
+    return data
+
+def query_nameserver(nameserver, name, timeout):
+    # query over UDP (and over TCP if the response was truncated), nothing is cached
+    id = random.getrandbits(16)
+    query = build_dns_query(id, name)
+    deadline = time.monotonic() + timeout
+    with socket.socket(socket.AF_INET6 if ':' in nameserver else socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.connect((nameserver, 53))
+        sock.send(query)
+        while True:
+            sock.settimeout(max(0.001, deadline - time.monotonic()))
+            response_id, flags, ips = parse_dns_response(sock.recv(65535))
+            if response_id == id:
+                break # else stray response (e.g. to an earlier timed out query)
+    if flags & 0x0200:
+        with socket.create_connection((nameserver, 53), timeout = max(0.001, deadline - time.monotonic())) as sock:
+            sock.sendall(struct.pack('!H', len(query)) + query)
+            _, flags, ips = parse_dns_response(receive_exactly(sock, struct.unpack('!H', receive_exactly(sock, 2))[0]))
+    return flags & 0x000F, ips
+
+def resolve_any_ip_from_nameservers(host):
+    if ':' in host:
+        host = urlparse(host).hostname
+    # try the name as is and with the search domains (in the order the system resolver would, see `ndots`), so that the lookups match the forked ones
+    if host.endswith('.'):
+        names = [host]
+    elif host.count('.') >= resolv_conf['ndots']:
+        names = [host] + [f'{host}.{domain}' for domain in resolv_conf['search']]
+    else:
+        names = [f'{host}.{domain}' for domain in resolv_conf['search']] + [host]
+    deadline = time.monotonic() + DNS_LOOKUP_TIMEOUT
+    for name in names:
+        answered = False
+        errors = []
+        for _ in range(resolv_conf['attempts']):
+            for nameserver in resolv_conf['nameservers']:
+                timeout = min(resolv_conf['timeout'], deadline - time.monotonic())
+                if timeout <= 0:
+                    raise RuntimeError(f'Resolving FQDN {host} timed out after {DNS_LOOKUP_TIMEOUT}s: {"; ".join(errors) if errors else "n/a"}')
+                try:
+                    rcode, ips = query_nameserver(nameserver, name, timeout)
+                except Exception as e:
+                    errors.append(f'{nameserver}: {type(e).__name__}: {e}')
+                    continue
+                if rcode == 0 and ips:
+                    return host, ips[0]
+                if rcode in [0, 3]: # no address or no such name, try next name
+                    answered = True
+                    break
+                errors.append(f'{nameserver}: response code {rcode}')
+            if answered:
+                break
+        if not answered:
+            raise RuntimeError(f'Resolving FQDN {host} failed: {"; ".join(errors)}')
+    raise RuntimeError(f'Resolving FQDN {host} failed: no address found')
+
+def resolve_any_ip(host):
+    # resolve without any caching and return the resolved host, any ip and the lookup latency in seconds
+    if ':' in host:
+        host = urlparse(host).hostname
+    try:
+        return host, str(ipaddress.ip_address(host)), 0 # ip literals (e.g. the cluster ip of the api server) are nothing to look up
+    except ValueError:
+        pass
+    started = time.monotonic()
+    if resolv_conf:
+        host, ip = resolve_any_ip_from_nameservers(host)
+    else:
+        host, ip = resolve_any_ip_from_forked_process(host)
+    return host, ip, time.monotonic() - started
+
 def dns_probe():
     # resolve external and internal fqdn (as baseline)
     ext_fqdn = client.ApiClient().configuration.host
@@ -115,30 +302,30 @@ def dns_probe():
     print(f'DNS internal probe resolved FQDN {int_fqdn} to {int_ips}')
 
     # run probe
+    ticker = Ticker(interval)
     while not is_terminated():
+        timestamp = ticker.wait()
         try:
             try:
-                _, ip = resolve_any_ip_from_forked_process(ext_fqdn)
+                _, ip, latency = resolve_any_ip(ext_fqdn)
                 assert re.match(r'^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}$', ip), f'FQDN {ext_fqdn} resolved to something that does not look like an IP ({ip}) but should be one of {ext_ips}!'
             except Exception as e:
-                enqueue('dns-external', False, e)
+                enqueue('dns-external', False, e, timestamp = timestamp)
                 print(f'DNS external probe failed: {type(e)}: {e}')
             else:
-                enqueue('dns-external', True, ip)
-                print(f'DNS external probe resolved {ext_fqdn} to {ip}')
+                enqueue('dns-external', True, ip, latency, timestamp)
+                print(f'DNS external probe resolved {ext_fqdn} to {ip} in {latency * 1000:.1f}ms')
             try:
-                _, ip = resolve_any_ip_from_forked_process(int_fqdn)
+                _, ip, latency = resolve_any_ip(int_fqdn)
                 assert re.match(r'^[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}\.[0-9]{1,3}$', ip), f'FQDN {int_fqdn} resolved to something that does not look like an IP ({ip}) but should be one of {int_ips}!'
             except Exception as e:
-                enqueue('dns-internal', False, e)
+                enqueue('dns-internal', False, e, timestamp = timestamp)
                 print(f'DNS internal probe failed: {type(e)}: {e}')
             else:
-                enqueue('dns-internal', True, ip)
-                print(f'DNS internal probe resolved {int_fqdn} to {ip}')
+                enqueue('dns-internal', True, ip, latency, timestamp)
+                print(f'DNS internal probe resolved {int_fqdn} to {ip} in {latency * 1000:.1f}ms')
         except Exception as e:
             print(f'DNS probe failed: {type(e)}: {e}')
-        finally:
-            time.sleep(interval)
 
 def create_dns_mgmt_test_record(fqdn):
     # define dns management test record
@@ -162,7 +349,9 @@ def dns_mgmt_updater(fqdn):
 
     # run updater
     record_created = False
+    ticker = Ticker(max(1, interval)) # test record targets encode seconds
     while not is_terminated():
+        ticker.wait()
         operation = 'operation'
         try:
             if not crd_client:
@@ -182,8 +371,6 @@ def dns_mgmt_updater(fqdn):
                 crd_client = None
         else:
             print(f'DNS management test record {operation} succeeded')
-        finally:
-            time.sleep(interval)
 
 def dns_mgmt_probe():
     # compute dns management test record fqdn
@@ -196,9 +383,11 @@ def dns_mgmt_probe():
 
     # run probe
     resolve_succeeded_once = False
+    ticker = Ticker(interval)
     while not is_terminated():
+        timestamp = ticker.wait()
         try:
-            _, ip = resolve_any_ip_from_forked_process(fqdn)
+            _, ip, latency = resolve_any_ip(fqdn)
             resolve_succeeded_once = True
             ip = [int(segment) for segment in ip.split('.')]
             now = datetime.now(tz=timezone.utc)
@@ -207,13 +396,11 @@ def dns_mgmt_probe():
             lag = (now_timestamp - ip_timestamp) if now_timestamp >= ip_timestamp else (24*60*60 + now_timestamp - ip_timestamp)
         except Exception as e:
             if resolve_succeeded_once:
-                enqueue('dns-management', False, e)
+                enqueue('dns-management', False, e, timestamp = timestamp)
             print(f'DNS management probe failed: {type(e)}: {e}')
         else:
-            enqueue('dns-management', lag <= DNS_MGMT_PROBE_MAX_LAG, f'lags {lag}s')
-            print(f'DNS management probe succeeded with a lag of {lag}s')
-        finally:
-            time.sleep(interval)
+            enqueue('dns-management', lag <= DNS_MGMT_PROBE_MAX_LAG, f'lags {lag}s', latency, timestamp)
+            print(f'DNS management probe succeeded with a lag of {lag}s (resolved in {latency * 1000:.1f}ms)')
 
 def api_probe():
     # put together internal Kubernetes client configuration
@@ -228,80 +415,197 @@ def api_probe():
     int_version_client = None
 
     # run probe
+    ticker = Ticker(interval)
     while not is_terminated():
+        timestamp = ticker.wait()
         try:
             try:
                 if not ext_version_client:
                     ext_version_client = client.VersionApi(client.ApiClient())
+                started = time.monotonic()
                 version = ext_version_client.get_code(_request_timeout = 5)
+                latency = time.monotonic() - started
             except Exception as e:
-                enqueue('api-external', False, e)
+                enqueue('api-external', False, e, timestamp = timestamp)
                 print(f'API external probe failed: {type(e)}: {e}')
                 ext_version_client = None
             else:
-                enqueue('api-external', True)
-                print(f'API external probe read v{version.major}.{version.minor} using {ext_version_client.api_client.configuration.host}')
+                enqueue('api-external', True, None, latency, timestamp)
+                print(f'API external probe read v{version.major}.{version.minor} using {ext_version_client.api_client.configuration.host} in {latency * 1000:.1f}ms')
             try:
                 if not int_version_client:
                     int_version_client = client.VersionApi(client.ApiClient(int_k8s_cfg))
+                started = time.monotonic()
                 version = int_version_client.get_code(_request_timeout = 5)
+                latency = time.monotonic() - started
             except Exception as e:
-                enqueue('api-internal', False, e)
+                enqueue('api-internal', False, e, timestamp = timestamp)
                 print(f'API internal probe failed: {type(e)}: {e}')
                 int_version_client = None
             else:
-                enqueue('api-internal', True)
-                print(f'API internal probe read v{version.major}.{version.minor} using {int_version_client.api_client.configuration.host}')
+                enqueue('api-internal', True, None, latency, timestamp)
+                print(f'API internal probe read v{version.major}.{version.minor} using {int_version_client.api_client.configuration.host} in {latency * 1000:.1f}ms')
         except Exception as e:
             print(f'API probe failed: {type(e)}: {e}')
-        finally:
-            time.sleep(interval)
 
 
 ###########
 # Emitter #
 ###########
 
-def enqueue(probe, ready, payload = None):
-    # create and enqueue heartbeat
-    print(f'Creating heartbeat for probe {probe} with ready={ready} and payload={payload}...')
+def enqueue(probe, ready, payload = None, latency = None, timestamp = None):
+    # create and enqueue heartbeat (latency in seconds, sent in milliseconds, and timestamp in milliseconds, by default now)
+    print(f'Creating heartbeat for probe {probe} with ready={ready}, payload={payload} and latency={latency}...')
     hb = {
         'apiVersion': 'chaos.gardener.cloud/v1',
         'kind': 'Heartbeat',
-        'metadata': {'name': f'{probe}-probe-{zone_name}-{int(datetime.now(tz=timezone.utc).timestamp())}'},
+        'metadata': {'name': f'{probe}-probe-{zone_name}-{timestamp if timestamp else int(datetime.now(tz=timezone.utc).timestamp() * 1000)}', 'labels': heartbeat_labels(zone_name)},
         'ready': ready
         }
     if payload != None:
         hb['payload'] = str(payload).replace('\n', '⏎')
+    if latency != None:
+        hb['latency'] = round(latency * 1000, 3)
     print(f'Enqueuing heartbeat: {hb}')
-    queue.put(hb)
+    queue.put((time.monotonic(), hb))
+
+def heartbeat_labels(zone):
+    return {'chaos.gardener.cloud/run': RUN_ID, 'chaos.gardener.cloud/zone': zone}
+
+def dequeue(max_count):
+    # wait for the first heartbeat (re-check for termination every second), then take whatever else is already queued
+    try:
+        batch = [queue.get(block = True, timeout = 1)]
+    except Empty:
+        return []
+    while len(batch) < max_count:
+        try:
+            batch.append(queue.get_nowait())
+        except Empty:
+            break
+    return batch
+
+def create_pooled_crd_client():
+    # one connection per concurrent sender, so that senders don't wait for (or discard) each other's connections
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = EMITTER_PARALLELISM
+    return client.CustomObjectsApi(client.ApiClient(configuration))
+
+def send(crd_client, hb):
+    # return whether the heartbeat was delivered (or already existed)
+    try:
+        print(f'Sending heartbeat: {hb}')
+        crd_client.create_cluster_custom_object(body = hb, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeats', _request_timeout = 5)
+    except Exception as e:
+        if isinstance(e, ApiException) and e.status == 409:
+            print(f'Sending heartbeat failed (conflict): {hb} -> ApiException: 409')
+            return True
+        print(f'Sending heartbeat failed (other): {hb} -> {type(e)}: {e}')
+        return False
+    print(f'Sending heartbeat succeeded: {hb}')
+    return True
+
+def send_window(crd_client, name, window, body):
+    # return whether the heartbeat window was delivered (created or updated)
+    try:
+        print(f'Sending heartbeat window: {body}')
+        if not window['created']:
+            try:
+                crd_client.create_cluster_custom_object(body = body, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeatwindows', _request_timeout = 5)
+            except ApiException as e:
+                if e.status != 409:
+                    raise e
+                # window exists already (e.g. sent by the previous pod in this zone), so merge what it knows into this window
+                existing = crd_client.get_cluster_custom_object(name = name, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeatwindows', _request_timeout = 5)
+                window['readiness'] = [state if state != '-' else existing_state for state, existing_state in zip(window['readiness'], existing.get('readiness', '').ljust(len(window['readiness']), '-'))]
+                window['payloads'] = {**(existing.get('payloads') or {}), **window['payloads']}
+                window['latencies'] = {**(existing.get('latencies') or {}), **window['latencies']}
+                body = {'interval': interval_ms, 'readiness': ''.join(window['readiness']), 'payloads': dict(window['payloads']), 'latencies': dict(window['latencies'])}
+                crd_client.patch_cluster_custom_object(name = name, body = body, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeatwindows', _request_timeout = 5)
+            window['created'] = True
+        else:
+            crd_client.patch_cluster_custom_object(name = name, body = {'readiness': body['readiness'], 'payloads': body['payloads'], 'latencies': body['latencies']}, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeatwindows', _request_timeout = 5)
+    except Exception as e:
+        print(f'Sending heartbeat window failed: {name} -> {type(e)}: {e}')
+        return False
+    print(f'Sending heartbeat window succeeded: {name}')
+    return True
+
+def emit_heartbeats(executor, crd_client, batch):
+    # send one object per heartbeat, re-queue failed ones and return how many were sent and failed
+    delivered = list(executor.map(lambda item: send(crd_client, item[1]), batch))
+    failed = [item for item, ok in zip(batch, delivered) if not ok]
+    for item in failed:
+        queue.put(item) # retry
+    return len(batch) - len(failed), len(failed)
+
+def emit_windows(executor, crd_client, batch):
+    # aggregate heartbeats into one object per probe, zone and window, send all changed windows and return how many heartbeats were sent and failed
+    now = int(datetime.now(tz=timezone.utc).timestamp() * 1000)
+    for _, hb in batch:
+        probe, zone, timestamp = re.match(r'^(.+)-probe-(.+)-([0-9]+)$', hb['metadata']['name']).groups()
+        timestamp = int(timestamp)
+        start = timestamp - timestamp % window_ms
+        slot = (timestamp - start) // interval_ms
+        window = windows.setdefault(f'{probe}-probe-{zone}-{start}', {'zone': zone, 'readiness': ['-'] * (window_ms // interval_ms), 'payloads': {}, 'latencies': {}, 'last_payload': None, 'created': False, 'unsent': 0})
+        window['readiness'][slot] = 'R' if hb['ready'] else 'N'
+        if hb.get('payload') != window['last_payload']:
+            window['payloads'][str(slot)] = hb.get('payload') or '' # payload samples (whenever the payload changes)
+            window['last_payload'] = hb.get('payload')
+        if hb.get('latency') is not None:
+            window['latencies'][str(slot)] = hb['latency']
+        window['unsent'] += 1
+    changed = [(name, window, window['unsent'], {
+        'apiVersion': 'chaos.gardener.cloud/v1',
+        'kind': 'HeartbeatWindow',
+        'metadata': {'name': name, 'labels': heartbeat_labels(window['zone'])},
+        'interval': interval_ms,
+        'readiness': ''.join(window['readiness']),
+        'payloads': dict(window['payloads']),
+        'latencies': dict(window['latencies'])
+        }) for name, window in windows.items() if window['unsent']]
+    delivered = list(executor.map(lambda change: send_window(crd_client, change[0], change[1], change[3]), changed))
+    sent = failed = 0
+    for (name, window, unsent, _), ok in zip(changed, delivered):
+        if ok:
+            window['unsent'] -= unsent
+            sent += unsent
+        else:
+            failed += unsent
+    for name in [name for name, window in windows.items() if not window['unsent'] and int(name.rsplit('-', 1)[1]) + 2 * window_ms < now]:
+        del windows[name] # forget windows that are complete and sent
+    return sent, failed
 
 def emit():
     # initialise client
     crd_client = None
 
-    # emit heartbeat
-    while not is_terminated() or queue.qsize() > 0:
-        print(f'Emitter queue holds {queue.qsize()} heartbeats')
-        try:
-            hb = queue.get(block = True, timeout = 1) # re-check for termination
+    # emit heartbeats in batches (sent concurrently), so that a backlog (e.g. after a zone outage) drains quickly
+    back_off = 0
+    with ThreadPoolExecutor(max_workers = EMITTER_PARALLELISM, thread_name_prefix = 'heart_beat_sender') as executor:
+        while not is_terminated() or queue.qsize() > 0 or any(window['unsent'] for window in windows.values()):
             try:
-                print(f'Sending heartbeat: {hb}')
+                batch = dequeue(EMITTER_BATCH_SIZE)
+                if not batch and not any(window['unsent'] for window in windows.values()):
+                    continue
                 if not crd_client:
-                    crd_client = client.CustomObjectsApi(client.ApiClient())
-                crd_client.create_cluster_custom_object(body = hb, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeats', _request_timeout = 5)
-            except Exception as e:
-                if isinstance(e, ApiException) and e.status == 409:
-                    print(f'Sending heartbeat failed (conflict): {hb} -> ApiException: 409')
-                else:
-                    print(f'Sending heartbeat failed (other): {hb} -> {type(e)}: {e}')
+                    crd_client = create_pooled_crd_client()
+                started = time.monotonic()
+                sent, failed = emit_windows(executor, crd_client, batch) if HEARTBEAT_WINDOW else emit_heartbeats(executor, crd_client, batch)
+                now = time.monotonic()
+                emitter_metrics['heartbeats_sent'] += sent
+                emitter_metrics['heartbeats_failed'] += failed
+                if batch:
+                    emitter_metrics['drain_latency_seconds'] = max(now - enqueued_at for enqueued_at, _ in batch) # how long the oldest heartbeat of the batch waited to be sent
+                print(f'Emitter sent {sent}/{sent + failed} heartbeats in {now - started:.3f}s (drain latency {emitter_metrics["drain_latency_seconds"]:.3f}s), queue holds {queue.qsize()} heartbeats')
+                if failed:
                     crd_client = None
-                    queue.put(hb) # retry
-                    time.sleep(1) # back-off
-            else:
-                print(f'Sending heartbeat succeeded: {hb}')
-        except:
-            pass
+                    back_off = min(EMITTER_MAX_BACK_OFF, back_off * 2 if back_off else EMITTER_MIN_BACK_OFF)
+                    time.sleep(back_off) # exponential back-off
+                else:
+                    back_off = 0
+            except Exception as e:
+                print(f'Emitter failed: {type(e)}: {e}')
 
 
 ########
@@ -335,6 +639,16 @@ if __name__ == '__main__':
     node = core_client.read_node(pod.spec.node_name)
     zone_name = node.metadata.labels['topology.kubernetes.io/zone']
 
+    # read resolver configuration to resolve DNS in-process (falling back to forked lookups if it isn't usable)
+    if DNS_RESOLVER == 'in-process':
+        try:
+            resolv_conf = read_resolv_conf()
+            assert resolv_conf['nameservers'], 'No nameservers configured'
+            print(f'DNS is resolved in-process using {resolv_conf}')
+        except Exception as e:
+            resolv_conf = None
+            print(f'DNS is resolved in forked processes, reading resolver configuration failed: {type(e)}: {e}')
+
     # start heartbeat emitter
     emitter_thread = Thread(name = 'heart_beat_emitter', target = emit)
     emitter_thread.setDaemon(True)
@@ -1,3 +1,4 @@
+import os
 import sys
 from datetime import datetime, timezone
 
@@ -27,13 +28,13 @@ if __name__ == '__main__':
         zone_name = node.metadata.labels['topology.kubernetes.io/zone']
 
         # create heart beat resource
-        hb_name = f'pod-lifecycle-probe-{zone_name}-{int(datetime.now(tz=timezone.utc).timestamp())}'
+        hb_name = f'pod-lifecycle-probe-{zone_name}-{int(datetime.now(tz=timezone.utc).timestamp() * 1000)}'
         hb_ready = True if restart_count == 0 else False
         print(f'About to send heart beat {hb_name} with readiness {hb_ready}...')
         hb = {
             'apiVersion': 'chaos.gardener.cloud/v1',
             'kind': 'Heartbeat',
-            'metadata': {'name': hb_name},
+            'metadata': {'name': hb_name, 'labels': {'chaos.gardener.cloud/run': os.environ.get('RUN_ID', ''), 'chaos.gardener.cloud/zone': zone_name}},
             'ready': hb_ready
             }
         crd_client.create_cluster_custom_object(body = hb, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeats', _request_timeout=5)
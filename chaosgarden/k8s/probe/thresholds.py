@@ -1,23 +1,63 @@
+import re
 from collections import defaultdict
-from typing import Dict
+from typing import Dict, Iterable, Tuple, Union
 
 DEFAULT_TOLERATION = 0
 NEGATION_SYMBOL = '!'
+DOWNTIME_KEY = 'downtime'
+LATENCY_PERCENTILE_KEY = re.compile(r'^p([0-9]+(\.[0-9]+)?)$') # e.g. `p99` or `p99.9` (latency SLO in milliseconds for that percentile)
 
 
 class Thresholds:
-    def __init__(self, thresholds: Dict[str, Dict[str, int]]):
-        self._thresholds: Dict[str, Dict[str, int]] = defaultdict(dict) # maps zone selector to probe name to outage tolerations in seconds
+    # tolerations are either given as outage toleration in seconds (e.g. `{"api": 60}`) or as outage toleration and/or latency SLOs in
+    # milliseconds per percentile (e.g. `{"api": {"downtime": 60, "p95": 250, "p99": 1000}}`), both per zone selector and probe name
+    def __init__(self, thresholds: Dict[str, Dict[str, Union[int, Dict[str, float]]]]):
+        self._thresholds: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict) # maps zone selector to probe name to outage toleration in seconds and latency SLOs in milliseconds
         for zone_selector, tolerations in thresholds.items():
             for probe, toleration in tolerations.items():
-                self._thresholds[zone_selector.lower()][probe.lower()] = int(toleration)
+                self._thresholds[zone_selector.lower()][probe.lower()] = Thresholds._parse(toleration)
+        self._tolerations: Dict[Tuple[str, str], int] = {}                 # maps probe name and zone to resolved outage toleration in seconds (see `compile()`)
+        self._latency_slos: Dict[Tuple[str, str], Dict[str, float]] = {}   # maps probe name and zone to resolved latency SLOs in milliseconds by percentile (see `compile()`)
 
     @staticmethod
-    def from_dict(thresholds: Dict[str, Dict[str, int]]):
+    def _parse(toleration: Union[int, Dict[str, float]]) -> Dict[str, float]:
+        if not isinstance(toleration, dict):
+            return {DOWNTIME_KEY: int(toleration)}
+        parsed = {}
+        for key, value in toleration.items():
+            key = key.lower()
+            if key == DOWNTIME_KEY:
+                parsed[key] = int(value)
+            elif LATENCY_PERCENTILE_KEY.match(key) and 0 < float(key[1:]) <= 100:
+                parsed[key] = float(value)
+            else:
+                raise ValueError(f'Unknown toleration {key} (expected `{DOWNTIME_KEY}` or a latency percentile like `p99`)!')
+        return parsed
+
+    @staticmethod
+    def from_dict(thresholds: Dict[str, Dict[str, Union[int, Dict[str, float]]]]):
         return Thresholds(thresholds)
 
-    def to_dict(self):
-        return dict(self._thresholds)
+    def to_dict(self, compiled: bool = False):
+        # either the zone selectors as given or the resolved tolerations per zone (itself a valid thresholds definition, but without negations)
+        # (plain outage tolerations are given as number, all others as dictionary)
+        if compiled:
+            thresholds = defaultdict(dict)
+            for (probe, zone), toleration in sorted(self._tolerations.items()):
+                thresholds[zone][probe] = toleration
+            for (probe, zone), latency_slos in sorted(self._latency_slos.items()):
+                if latency_slos:
+                    thresholds[zone][probe] = {DOWNTIME_KEY: thresholds[zone].get(probe, DEFAULT_TOLERATION), **latency_slos}
+            return dict(thresholds)
+        return {zone_selector: {probe: toleration[DOWNTIME_KEY] if list(toleration) == [DOWNTIME_KEY] else dict(toleration) for probe, toleration in tolerations.items()} for zone_selector, tolerations in self._thresholds.items()}
+
+    def compile(self, zones: Iterable[str]):
+        # resolve the tolerations of all probes with thresholds in all given zones once (when the zones are known), so that lookups
+        # don't scan the zone selectors (pairs that weren't compiled are resolved on first lookup and remembered as well)
+        probes = {probe for tolerations in self._thresholds.values() for probe in tolerations}
+        self._tolerations = {(probe, zone.lower()): self._resolve(probe, zone.lower()) for probe in probes for zone in zones}
+        self._latency_slos = {(probe, zone.lower()): self._resolve_latency_slos(probe, zone.lower()) for probe in probes for zone in zones}
+        return self
 
     def substitute_zones(self, zones: Dict[int, str]):
         _thresholds = {}
@@ -30,19 +70,45 @@ class Thresholds:
             except:
                 _thresholds[f'{"!" if negated else ""}{zone_selector}'] = tolerations
         self._thresholds = _thresholds
+        self._tolerations = {}
+        self._latency_slos = {}
         return self
 
     def get_toleration(self, probe: str, zone: str):
-        probe = probe.lower()
-        zone = zone.lower()
+        toleration = self._tolerations.get((probe, zone))
+        if toleration is None:
+            probe, zone = probe.lower(), zone.lower()
+            toleration = self._tolerations.get((probe, zone))
+            if toleration is None:
+                toleration = self._tolerations[(probe, zone)] = self._resolve(probe, zone)
+        return toleration
+
+    def get_latency_slos(self, probe: str, zone: str) -> Dict[str, float]:
+        # latency SLOs in milliseconds by percentile (e.g. `{"p99": 1000.0}`), if any
+        latency_slos = self._latency_slos.get((probe, zone))
+        if latency_slos is None:
+            probe, zone = probe.lower(), zone.lower()
+            latency_slos = self._latency_slos.get((probe, zone))
+            if latency_slos is None:
+                latency_slos = self._latency_slos[(probe, zone)] = self._resolve_latency_slos(probe, zone)
+        return latency_slos
+
+    def _resolve(self, probe: str, zone: str, key: str = DOWNTIME_KEY):
+        # first matching zone selector wins
         for zone_selector, tolerations in self._thresholds.items():
-            if probe in tolerations:
+            if probe in tolerations and key in tolerations[probe]:
                 negated = zone_selector.startswith(NEGATION_SYMBOL)
                 if negated and zone != zone_selector[1:]:
-                    return tolerations[probe]
+                    return tolerations[probe][key]
                 if not negated and zone == zone_selector:
-                    return tolerations[probe]
-        return DEFAULT_TOLERATION
+                    return tolerations[probe][key]
+        return DEFAULT_TOLERATION if key == DOWNTIME_KEY else None
+
+    def _resolve_latency_slos(self, probe: str, zone: str):
+        # each percentile is resolved on its own (first matching zone selector with that percentile wins)
+        percentiles = sorted({key for tolerations in self._thresholds.values() for key in tolerations.get(probe, {}) if key != DOWNTIME_KEY}, key = lambda key: float(key[1:]))
+        latency_slos = {percentile: self._resolve(probe, zone, percentile) for percentile in percentiles}
+        return {percentile: slo for percentile, slo in latency_slos.items() if slo is not None}
 
     def within_toleration(self, probe: str, zone: str, value: int):
         return value <= self.get_toleration(probe, zone)
@@ -1,8 +1,10 @@
 import re
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from threading import Thread
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Set, Tuple
 
 import yaml
 from box import Box
@@ -10,14 +12,35 @@ from chaoslib.types import Secrets
 from kubernetes.client.exceptions import ApiException
 from logzero import logger
 
-from chaosgarden.k8s import (SelectorRequirement, filter_leases, filter_pods,
+from chaosgarden.k8s import (Selector, filter_leases, filter_pods,
                              to_authenticator)
+from chaosgarden.k8s.api.applier import Applier
 from chaosgarden.k8s.api.cluster import API, Cluster
+from chaosgarden.k8s.api.informer import Informer
+from chaosgarden.k8s.api.projections import (NodeProjection, PodProjection,
+                                             Projection, loads,
+                                             parse_conditions, parse_timestamp)
 from chaosgarden.k8s.probe.metrics import Metrics
 from chaosgarden.k8s.probe.resources.generate_resources import render
 from chaosgarden.k8s.probe.thresholds import Thresholds
+from chaosgarden.util.engine import cooperative
 from chaosgarden.util.terminator import Terminator
-from chaosgarden.util.threading import launch_thread
+from chaosgarden.util.threading import launch_thread, signal_all_threads
+from chaosgarden.util.ticker import Ticker
+
+ASSESSMENT_INTERVAL_MILLISECONDS = 5_000 # interval in which thresholds are assessed while probing
+ASSESSMENT_DELAY_MILLISECONDS = 15_000   # heartbeats younger than this are not yet assessed while probing (they may still be on their way)
+PROGRESS_INTERVAL_MILLISECONDS = 60_000  # interval in which intermediate metrics are reported while probing
+HEARTBEAT_PLURALS = ['heartbeats', 'heartbeatwindows', 'acknowledgedheartbeats'] # heartbeats are sent one per object or aggregated into windows
+SETUP_WORKERS = 8                      # max concurrent resource applications per dependency level while setting up the probe
+CRD_ESTABLISHED_TIMEOUT_SECONDS = 60   # max time to wait for the custom resource definitions to be established while setting up the probe
+CRD_ESTABLISHED_POLL_SECONDS = 0.25    # interval in which the custom resource definitions are checked while waiting for them
+CLEANUP_TIMEOUT_SECONDS = 600          # max time to wait for all probe resources to be deleted while cleaning up the probe
+CLEANUP_PROGRESS_SECONDS = 5           # interval in which the remaining probe resources are reported while cleaning up the probe
+CLEANUP_WORKERS = 8                    # max concurrent requests while deleting heartbeats (one collection per plural, run and zone)
+HEARTBEAT_RUN_LABEL = 'chaos.gardener.cloud/run'   # label of heartbeats with the id of the probe run that sent them
+HEARTBEAT_ZONE_LABEL = 'chaos.gardener.cloud/zone' # label of heartbeats with the zone they were sent from (or `regional`)
+HEARTBEAT_RETENTION_ANNOTATION = 'chaos.gardener.cloud/heartbeat-retention' # annotation of the heartbeat definitions with the retention of the last setup
 
 __all__ = [
     'list_cluster_key_resources',
@@ -40,16 +63,19 @@ def list_cluster_key_resources(
         configuration: Dict = None,
         secrets: Dict = None):
     # input validation
-    pod_node_label_selector = [SelectorRequirement(r) for r in pod_node_label_selector.split(',')] if pod_node_label_selector else []
+    pod_node_label_selector = Selector.parse(pod_node_label_selector)
     pod_label_selector      = pod_label_selector if pod_label_selector else None
-    pod_metadata_selector   = [SelectorRequirement(r) for r in pod_metadata_selector.split(',')] if pod_metadata_selector else []
-    pod_owner_selector      = [SelectorRequirement(r) for r in pod_owner_selector.split(',')] if pod_owner_selector else []
+    pod_metadata_selector   = Selector.parse(pod_metadata_selector)
+    pod_owner_selector      = Selector.parse(pod_owner_selector)
     lease_label_selector    = lease_label_selector if lease_label_selector else None
-    lease_metadata_selector = [SelectorRequirement(r) for r in lease_metadata_selector.split(',')] if lease_metadata_selector else []
+    lease_metadata_selector = Selector.parse(lease_metadata_selector)
     cluster = Cluster(f'cluster', to_authenticator(secrets))
 
     # dump key resources
-    dump_key_resources(cluster, pod_node_label_selector, pod_label_selector, pod_metadata_selector, pod_owner_selector, lease_label_selector, lease_metadata_selector)
+    try:
+        dump_key_resources(cluster, pod_node_label_selector, pod_label_selector, pod_metadata_selector, pod_owner_selector, lease_label_selector, lease_metadata_selector)
+    finally:
+        cluster.stop_informers()
 
 
 ###################################
@@ -59,57 +85,91 @@ def list_cluster_key_resources(
 def run_cluster_health_probe_in_background(
         duration: int = 0,
         thresholds: Dict = None,
+        terminate_on_violation: bool = False,
+        heartbeat_window: int = 0,
+        probe_interval: float = 1,
+        heartbeat_retention: int = 0,
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_cluster_health_probe, kwargs = locals())
 
+@cooperative
 def run_cluster_health_probe(
         duration: int = 0,
         thresholds: Dict = None,
         silent: bool = False,
+        terminate_on_violation: bool = False, # terminate the experiment (all simulations) as soon as thresholds are violated
+        heartbeat_window: int = 0,            # aggregate cluster-internal heartbeats into one object per probe, zone and window of this many seconds (0 means one object per heartbeat)
+        probe_interval: float = 1,            # seconds between two heartbeats of a probe (may be sub-second to detect shorter outages)
+        heartbeat_retention: int = 0,         # keep the heartbeats of this many most recent runs (including this one) for post-mortem analysis (0 means all are deleted with the probe)
         secrets: Secrets = None):
     # rollback any left-overs from hard-aborted previous probes
-    rollback_cluster_health_probe(secrets)
+    rollback_cluster_health_probe(heartbeat_retention, secrets)
 
     # input validation
+    thresholds = Thresholds.from_dict(thresholds)
     cluster = Cluster(f'cluster', to_authenticator(secrets))
 
-    # setup cluster probe
-    setup(cluster)
-    start_timestamp = int(datetime.now(tz = timezone.utc).timestamp())
-
-    # probe cluster continuously until terminated
-    logger.info(f'Probing health of {cluster.host}.')
-    successful_api_probe_heartbeats = []
-    failed_api_probe_heartbeats = []
+    # setup cluster probe (heartbeats are labelled with the run id, a timestamp, so that they can be watched and deleted by run)
+    run_id = str(int(datetime.now(tz = timezone.utc).timestamp() * 1000))
+    zones = setup(cluster, heartbeat_window, probe_interval, heartbeat_retention, run_id)
+    if heartbeat_retention > 0:
+        Thread(target = prune_heartbeats, args = (cluster, heartbeat_retention, run_id), name = 'probe-heartbeat-pruning', daemon = True).start()
+    thresholds.compile(zones | {'regional'}) # zonal probes report in the detected zones, regional probes in the pseudo-zone `regional`
+    logger.debug(f'Thresholds: {thresholds.to_dict(compiled = True)}')
+    start_timestamp = int(datetime.now(tz = timezone.utc).timestamp() * 1000)
+
+    # aggregate heartbeats as they arrive (instead of reading and computing all of them at the end)
+    metrics = Metrics(from_timestamp = start_timestamp)
+    heartbeat_informers = watch_heartbeats(cluster, metrics, run_id)
+
+    # probe cluster continuously until terminated (at a fixed rate, heartbeats are named after the tick they belong to)
+    logger.info(f'Probing health of {cluster.host} every {probe_interval}s.')
+    api_probe_heartbeats_sent = 0
+    assessment_timestamp = progress_timestamp = start_timestamp
+    violated = set()
     terminator = Terminator(duration)
+    ticker = Ticker(probe_interval)
+    timestamp = ticker.advance()
+    yield terminator.pause(ticker.wait_time())
     while not terminator.is_terminated():
-        timestamp = int(datetime.now(tz = timezone.utc).timestamp())
         try:
             hb = {
                 'apiVersion': 'chaos.gardener.cloud/v1',
                 'kind': 'Heartbeat',
-                'metadata': {'name': f'api-probe-regional-{timestamp}'},
+                'metadata': {'name': f'api-probe-regional-{timestamp}', 'labels': {HEARTBEAT_RUN_LABEL: run_id, HEARTBEAT_ZONE_LABEL: 'regional'}},
                 'ready': True
                 }
+            api_probe_heartbeats_sent += 1
+            started = time.monotonic()
             cluster.client(API.CustomResources).create_cluster_custom_object(body = hb, group = 'chaos.gardener.cloud', version = 'v1', plural = 'heartbeats', _request_timeout = 5)
-            successful_api_probe_heartbeats.append(Box(hb))
+            metrics.record_latency('api', 'regional', (time.monotonic() - started) * 1000) # round trip is only known after the heartbeat was sent, so it's recorded here rather than sent along
         except Exception as e:
             logger.error(f'API probe failed: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
             hb['ready'] = False
-            failed_api_probe_heartbeats.append(Box(hb))
+            metrics.ingest(hb) # heartbeats that failed to reach the API server, but we know of (what was sent successfully is watched)
         finally:
-            time.sleep(1)
+            if start_informers(heartbeat_informers) and timestamp >= assessment_timestamp + ASSESSMENT_INTERVAL_MILLISECONDS:
+                # assess what is known so far (leaving heartbeats some time to arrive), to report violations as they happen rather than at the end
+                snapshot = metrics.snapshot(timestamp - ASSESSMENT_DELAY_MILLISECONDS)
+                if assess_live(snapshot, thresholds, violated) and terminate_on_violation:
+                    logger.error(f'Thresholds violated while probing. Terminating experiment early.')
+                    signal_all_threads()
+                if timestamp >= progress_timestamp + PROGRESS_INTERVAL_MILLISECONDS:
+                    dump_progress(snapshot)
+                    progress_timestamp = timestamp
+                assessment_timestamp = timestamp
+            timestamp = ticker.advance()
+            yield terminator.pause(ticker.wait_time())
 
     # generate metrics
-    stop_timestamp = int(datetime.now(tz = timezone.utc).timestamp())
-    metrics = generate_metrics(cluster, start_timestamp, stop_timestamp, successful_api_probe_heartbeats, failed_api_probe_heartbeats)
+    stop_timestamp = int(datetime.now(tz = timezone.utc).timestamp() * 1000)
+    metrics = generate_metrics(cluster, metrics, heartbeat_informers, run_id, start_timestamp, stop_timestamp, api_probe_heartbeats_sent)
 
     # rollback
-    rollback_cluster_health_probe(secrets)
+    rollback_cluster_health_probe(heartbeat_retention, secrets)
 
     # dump and assess metrics
-    thresholds = Thresholds.from_dict(thresholds)
     metrics.dump(thresholds)
     violations = metrics.assess(thresholds)
     if violations:
@@ -123,12 +183,13 @@ def run_cluster_health_probe(
         return True
 
 def rollback_cluster_health_probe(
+        heartbeat_retention: int = None, # keep the heartbeats of this many most recent runs (`None` means as set up by the last probe, only `0` deletes all)
         secrets: Secrets = None):
     # input validation
     cluster = Cluster(f'cluster', to_authenticator(secrets))
 
     # cleanup cluster probe
-    cleanup(cluster)
+    cleanup(cluster, heartbeat_retention)
 
 
 ###########
@@ -150,31 +211,20 @@ def seconds2human(n):
             n -= quotient * quantity
     return ''.join(segments[:2]) if segments else '0s'
 
-def resource_age(resource: Dict):
-    return seconds2human(int(datetime.now().timestamp() - resource.metadata.creationTimestamp.timestamp()))
+def resource_age(resource: Projection):
+    return seconds2human(int(datetime.now().timestamp() - resource.creation_timestamp.timestamp()))
 
-def node_status(node: Dict):
-    ready = 'N/A'
-    if 'status' in node and 'conditions' in node.status:
-        for c in node.status.conditions:
-            if c.type == 'Ready':
-                ready = 'Ready' if c.status == 'True' else 'NotReady' if c.status == 'False' else c.status
-                break
-    return ready
-
-def pod_status(pod: Dict):
-    phase = 'N/A'
-    if 'status' in pod and 'phase' in pod.status:
-        phase = pod.status.phase
-    ready = 'N/A'
-    if 'status' in pod and 'conditions' in pod.status:
-        for c in pod.status.conditions:
-            if c.type == 'Ready':
-                ready = 'Ready' if c.status == 'True' else 'NotReady' if c.status == 'False' else c.status
-                break
-    return f'{ready} ({phase})'
+def readiness(conditions: Dict[str, str]):
+    status = conditions.get('Ready', 'N/A')
+    return 'Ready' if status == 'True' else 'NotReady' if status == 'False' else status
 
-def dump_key_resources(cluster: Cluster, pod_node_label_selector: List = None, pod_label_selector: str = None, pod_metadata_selector: List = None, pod_owner_selector: List = None, lease_label_selector: str = None, lease_metadata_selector: str = None):
+def node_status(node: NodeProjection):
+    return readiness(node.conditions)
+
+def pod_status(pod: PodProjection):
+    return f'{readiness(pod.conditions)} ({pod.phase or "N/A"})'
+
+def dump_key_resources(cluster: Cluster, pod_node_label_selector: Selector = None, pod_label_selector: str = None, pod_metadata_selector: Selector = None, pod_owner_selector: Selector = None, lease_label_selector: str = None, lease_metadata_selector: Selector = None):
     nodes = []
     pods = filter_pods(
         cluster = cluster,
@@ -189,186 +239,294 @@ def dump_key_resources(cluster: Cluster, pod_node_label_selector: List = None, p
         lease_metadata_selector = lease_metadata_selector)
     logger.debug(f'Nodes:')
     logger.debug(f'  {"NAME":<75} {"STATUS":<21} {"CREATED":<10} ZONE')
-    for node in sorted(nodes, key = lambda node: (node.metadata.labels.get('topology.kubernetes.io/zone', 'N/A') if 'labels' in node.metadata else 'N/A', node.metadata.name)):
-        logger.debug(f'- {node.metadata.name:<75} {node_status(node):<21} {resource_age(node):<10} {node.metadata.labels.get("topology.kubernetes.io/zone", "N/A") if "labels" in node.metadata else "N/A"}')
+    for node in sorted(nodes, key = lambda node: (node.zone or 'N/A', node.name)):
+        logger.debug(f'- {node.name:<75} {node_status(node):<21} {resource_age(node):<10} {node.zone or "N/A"}')
     logger.debug(f'Pods:')
     logger.debug(f'  {"NAMESPACE/NAME":<75} {"STATUS":<21} {"CREATED":<10} ZONE (NODE)')
-    for pod in sorted(pods, key = lambda pod: (pod.metadata.namespace, pod.metadata.generateName if 'generateName' in pod.metadata else pod.metadata.name, pod.metadata.labels.get('topology.kubernetes.io/zone', 'N/A') if 'labels' in pod.metadata else 'N/A', pod.metadata.name)):
-        logger.debug(f'- {pod.metadata.namespace + "/" + pod.metadata.name:<75} {pod_status(pod):<21} {resource_age(pod):<10} {pod.metadata.labels.get("topology.kubernetes.io/zone", "N/A") if "labels" in pod.metadata else "N/A"} ({pod.spec.nodeName if "nodeName" in pod.spec else "N/A"})')
+    for pod in sorted(pods, key = lambda pod: (pod.namespace, pod.metadata.get('generateName', pod.name), pod.labels.get('topology.kubernetes.io/zone', 'N/A'), pod.name)):
+        logger.debug(f'- {pod.namespace + "/" + pod.name:<75} {pod_status(pod):<21} {resource_age(pod):<10} {pod.labels.get("topology.kubernetes.io/zone", "N/A")} ({pod.node_name or "N/A"})')
     logger.debug(f'Leases:')
     logger.debug(f'  {"NAMESPACE/NAME":<75} {"ACQUIRED":<10} {"RENEWED":<10} {"CREATED":<10} HOLDER')
-    for lease in sorted(leases, key = lambda lease: (lease.metadata.namespace, pod.metadata.name)):
-        logger.debug(f'- {lease.metadata.namespace + "/" + lease.metadata.name:<75} {seconds2human(int(datetime.now().timestamp() - lease.spec.acquireTime.timestamp())) if "acquireTime" in lease.spec and lease.spec.acquireTime else "N/A":<10} {seconds2human(int(datetime.now().timestamp() - lease.spec.renewTime.timestamp())) if "renewTime" in lease.spec and lease.spec.renewTime else "N/A":<10} {resource_age(lease):<10} {lease.spec.holderIdentity if "holderIdentity" in lease.spec and lease.spec.holderIdentity else "N/A"}')
+    for lease in sorted(leases, key = lambda lease: (lease.namespace, lease.name)):
+        logger.debug(f'- {lease.namespace + "/" + lease.name:<75} {seconds2human(int(datetime.now().timestamp() - lease.acquire_time.timestamp())) if lease.acquire_time else "N/A":<10} {seconds2human(int(datetime.now().timestamp() - lease.renew_time.timestamp())) if lease.renew_time else "N/A":<10} {resource_age(lease):<10} {lease.holder_identity or "N/A"}')
 
-def setup(cluster: Cluster):
+def setup(cluster: Cluster, heartbeat_window: int = 0, probe_interval: float = 1, heartbeat_retention: int = 0, run_id: str = '') -> Set[str]:
     # identify zones
     zones = set()
-    for node in cluster.boxed(cluster.sanitize_result(cluster.client(API.CoreV1).list_node(_request_timeout = 60).to_dict())):
-        try:
-            zones.add(node['metadata']['labels']['topology.kubernetes.io/zone'])
-        except:
-            pass
+    for node in cluster.list_items(API.CoreV1, 'list_node'):
+        zone = NodeProjection(node).zone
+        if zone:
+            zones.add(zone)
     logger.info('Cluster spread across the following detected zones: ' + ', '.join(sorted(zones)))
 
     # load to be created resources
-    resources = yaml.load_all(render(zones = zones), Loader = yaml.FullLoader)
+    resources = yaml.load_all(render(zones = zones, heartbeat_window = heartbeat_window, probe_interval = probe_interval, heartbeat_retention = heartbeat_retention, run_id = run_id), Loader = yaml.FullLoader)
     resources = list(resources)
 
-    # create all resources (in template order)
+    # apply all resources level by level (see `apply_level()`), all resources of a level concurrently (server-side apply creates missing
+    # resources and reconciles drifted ones, so that setup is idempotent)
+    setup_start = time.monotonic()
+    applier = Applier(cluster)
+    resources_by_level = defaultdict(list)
     for resource in resources:
-        try:
-            api_version = resource['apiVersion']
-            api = API.from_api_version(api_version)
-            client = cluster.client(api)
-            if (api == API.CustomResources):
-                if 'namespace' in resource['metadata']:
-                    client.create_namespaced_custom_object(
-                        namespace = resource['metadata']['namespace'],
-                        body = resource,
-                        group = api_version.split('/')[0],
-                        version = api_version.split('/')[1],
-                        plural = resource['kind'].lower() + 's', # plural is best guess; proper solution requires reading the CRD first
-                        _request_timeout = 60)
-                else:
-                    client.create_cluster_custom_object(
-                        body = resource,
-                        group = api_version.split('/')[0],
-                        version = api_version.split('/')[1],
-                        plural = resource['kind'].lower() + 's', # plural is best guess; proper solution requires reading the CRD first
-                        _request_timeout = 60)
-            else:
-                kind_snake_case = re.sub('([A-Z]+)', r'_\1', resource['kind']).lower()
-                if 'namespace' in resource['metadata']:
-                    getattr(client, 'create_namespaced' + kind_snake_case)(
-                        namespace = resource['metadata']['namespace'],
-                        body = resource,
-                        _request_timeout = 60)
-                else:
-                    getattr(client, 'create' + kind_snake_case)(
-                        body = resource,
-                        _request_timeout = 60)
-        except ApiException as e:
-            if e.status == 409:
-                pass # ignore conflict (resource already found), which is unexpected
-            else:
-                logger.error(f'Probe setup failed: {type(e)}: {e}')
-                # logger.error(traceback.format_exc())
-                raise e
-        except Exception as e:
+        resources_by_level[apply_level(resource)].append(resource)
+    with ThreadPoolExecutor(max_workers = SETUP_WORKERS, thread_name_prefix = 'probe-setup') as executor:
+        for level in sorted(resources_by_level):
+            level_start = time.monotonic()
+            applications = [executor.submit(apply_resource, applier, resource) for resource in resources_by_level[level]]
+            for application in applications:
+                application.result() # raises the first failure (already logged), after which no further level is applied
+            crd_names = [resource['metadata']['name'] for resource in resources_by_level[level] if resource['kind'] == 'CustomResourceDefinition']
+            if crd_names:
+                wait_for_established_crds(cluster, crd_names)
+            logger.info(f'Probe setup applied {len(applications)} resources of level {level} in {time.monotonic() - level_start:.2f}s.')
+    logger.info(f'Probe setup applied {len(resources)} resources in {time.monotonic() - setup_start:.2f}s.')
+    return zones
+
+def apply_level(resource: Dict) -> int:
+    # dependency level derived from the kind: custom resource definitions first (custom resources need them), then cluster-scoped resources
+    # (e.g. the namespace that namespaced resources need), then namespaced resources, and webhook configurations last (they would otherwise
+    # intercept requests before their backends exist)
+    if resource['kind'] == 'CustomResourceDefinition':
+        return 0
+    elif resource['kind'].endswith('WebhookConfiguration'):
+        return 3
+    elif 'namespace' in resource['metadata']:
+        return 2
+    else:
+        return 1
+
+def apply_resource(applier: Applier, resource: Dict):
+    start = time.monotonic()
+    try:
+        applier.apply(resource)
+    except Exception as e:
+        logger.error(f'Probe setup failed for {resource["kind"]} {resource["metadata"]["name"]}: {type(e)}: {e}')
+        # logger.error(traceback.format_exc())
+        raise e
+    logger.debug(f'Probe setup applied {resource["kind"]} {resource["metadata"]["name"]} in {time.monotonic() - start:.2f}s.')
+
+def wait_for_established_crds(cluster: Cluster, names: List[str]):
+    # custom resources can only be created (and watched) once their definitions are established, which is not the case right after creation
+    start = time.monotonic()
+    pending = set(names)
+    while True:
+        for name in sorted(pending):
+            response = cluster.client(API.ExtensionsV1).read_custom_resource_definition(name = name, _preload_content = False, _request_timeout = 60)
+            if parse_conditions(loads(response.data)).get('Established') == 'True':
+                pending.remove(name)
+        if not pending:
+            break
+        if time.monotonic() - start > CRD_ESTABLISHED_TIMEOUT_SECONDS:
+            e = TimeoutError(f'Custom resource definitions not established after {CRD_ESTABLISHED_TIMEOUT_SECONDS}s: {", ".join(sorted(pending))}')
             logger.error(f'Probe setup failed: {type(e)}: {e}')
-            # logger.error(traceback.format_exc())
             raise e
+        time.sleep(CRD_ESTABLISHED_POLL_SECONDS)
+    logger.debug(f'Probe setup waited {time.monotonic() - start:.2f}s for {len(names)} custom resource definitions to be established.')
 
-def cleanup(cluster: Cluster):
-    # load to be deleted resources
-    resources = yaml.load_all(render(), Loader = yaml.FullLoader)
+def cleanup(cluster: Cluster, heartbeat_retention: int = None, timeout: int = CLEANUP_TIMEOUT_SECONDS):
+    # load to be deleted resources (only names and kinds are needed, so without key and certificate)
+    resources = yaml.load_all(render(tls = False), Loader = yaml.FullLoader)
     resources = list(resources)
+    if heartbeat_retention is None:
+        heartbeat_retention = read_heartbeat_retention(cluster, resources)
+    applier = Applier(cluster)
+    cleanup_start = time.monotonic()
+    deadline = cleanup_start + timeout
 
     # delete pod-based resources, so that all "active" components are terminated before the rest (service accounts, custom resource definitions, ...)
-    namespace = None
-    client = cluster.client(API.AppsV1)
+    namespaces = set()
     for resource in resources:
-        if resource['kind'].lower() == 'deployment': # it is assumed, that only deployments are used
+        if resource['kind'] == 'Deployment': # it is assumed, that only deployments are used
             try:
-                client.delete_namespaced_deployment(
-                    name = resource['metadata']['name'],
-                    namespace = resource['metadata']['namespace'],
-                    propagation_policy = 'Foreground',
-                    _request_timeout = 60)
-                namespace = resource['metadata']['namespace'] # it is assumed, that only one namespace is used
-                logger.info(f'Deleting probe deployment {resource["metadata"]["namespace"]}/{resource["metadata"]["name"]}...')
+                if applier.delete(resource):
+                    namespaces.add(resource['metadata']['namespace'])
+                    logger.info(f'Deleting probe deployment {resource["metadata"]["namespace"]}/{resource["metadata"]["name"]}...')
             except Exception:
                 pass # ignore as this is best-effort
-    if namespace:
-        client = cluster.client(API.CoreV1)
+    try:
+        wait_for_deletion(cluster, [Informer(cluster, API.CoreV1, 'pod', namespace = namespace) for namespace in namespaces], deadline)
+    except Exception:
+        pass # ignore as this is best-effort
+
+    # delete heartbeats in bulk (concurrently by run and zone), which is considerably faster than leaving them to their definitions, unless they are retained
+    # (in which case the definitions are retained as well and older runs are pruned in the background while probing)
+    if not heartbeat_retention:
         try:
-            last_pod_count = 0
-            new_pod_count = len(client.list_namespaced_pod(namespace = namespace).items)
-            while new_pod_count > 0:
-                if new_pod_count != last_pod_count:
-                    logger.info(f'Waiting for {new_pod_count} pods to be deleted...')
-                last_pod_count = new_pod_count
-                time.sleep(1)
-                new_pod_count = len(client.list_namespaced_pod(namespace = namespace).items)
-        except Exception:
-            pass # ignore as this is best-effort
+            delete_heartbeats(cluster)
+        except Exception as e:
+            logger.warning(f'Probe heartbeats not deleted in bulk (left to their definitions): {type(e)}: {e}')
 
-    # delete all resources (in reverse template order)
+    # delete all resources once (in reverse template order) and watch them until they are gone (namespaced resources are deleted with the namespace)
     logger.info(f'Deleting probe resources...')
-    resources.reverse()
-    resources_present = True
-    while resources_present:
-        resources_present = False
-        for resource in resources:
-            try:
-                api_version = resource['apiVersion']
-                api = API.from_api_version(api_version)
-                client = cluster.client(api)
-                if (api == API.CustomResources):
-                    if 'namespace' in resource['metadata']:
-                        pass # will be deleted with the namespace
-                    else:
-                        client.delete_cluster_custom_object(
-                            name = resource['metadata']['name'],
-                            group = api_version.split('/')[0],
-                            version = api_version.split('/')[1],
-                            plural = resource['kind'].lower() + 's', # plural is best guess; proper solution requires reading the CRD first
-                            propagation_policy = 'Foreground',
-                            _request_timeout = 60)
-                        resources_present = True
-                else:
-                    kind_snake_case = re.sub('([A-Z]+)', r'_\1', resource['kind']).lower()
-                    if 'namespace' in resource['metadata']:
-                        pass # will be deleted with the namespace
-                    else:
-                        getattr(client, 'delete' + kind_snake_case)(
-                            name = resource['metadata']['name'],
-                            propagation_policy = 'Foreground',
-                            _request_timeout = 60)
-                        resources_present = True
-            except ApiException as e:
-                if e.status == 404:
-                    pass # ignore resources that are either missing (cluster was already clean) or were eventually deleted (resource is now gone)
-                else:
-                    logger.error(f'Probe cleanup failed: {type(e)}: {e}')
-                    # logger.error(traceback.format_exc())
-                    raise e
-            except Exception as e:
-                logger.error(f'Probe cleanup failed: {type(e)}: {e}')
-                # logger.error(traceback.format_exc())
-                raise e
-        if resources_present:
-            time.sleep(1)
-
-def read_events(cluster: Cluster):
-    retries = 0
-    while True:
+    informers = []
+    for resource in reversed(resources):
+        if 'namespace' in resource['metadata']:
+            continue # will be deleted with the namespace
+        if heartbeat_retention and resource['kind'] == 'CustomResourceDefinition':
+            continue # retained with the heartbeats
         try:
-            retries += 1
-            return cluster.sanitize_result(cluster.client(API.EventsV1).list_event_for_all_namespaces(_request_timeout = 60).to_dict())
+            if applier.delete(resource): # missing resources were never created (cluster was already clean) or are already deleted
+                api = API.from_api_version(resource['apiVersion'])
+                if api != API.CustomResources: # custom resources are deleted with (and watched by way of) their definitions
+                    informers.append(Informer(cluster, api, re.sub('([A-Z]+)', r'_\1', resource['kind']).lower()[1:], field_selector = f'metadata.name={resource["metadata"]["name"]}', namespaced = False))
         except Exception as e:
-            logger.error(f'Reading events failed: {type(e)}: {e}')
+            logger.error(f'Probe cleanup failed: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
-            if retries > 5:
-                raise e
-            else:
-                time.sleep(retries * 5)
-
-def read_custom_resources(cluster: Cluster, plural: str):
-    retries = 0
+            raise e
+    crds = [resource for resource in resources if resource['kind'] == 'CustomResourceDefinition']
+    try:
+        wait_for_deletion(cluster, informers, deadline, progress = lambda: count_custom_resources(cluster, crds))
+    except Exception as e:
+        logger.error(f'Probe cleanup failed: {type(e)}: {e}')
+        # logger.error(traceback.format_exc())
+        raise e
+    logger.info(f'Probe cleanup took {time.monotonic() - cleanup_start:.2f}s.')
+
+def read_heartbeat_retention(cluster: Cluster, resources: List[Dict]) -> int:
+    # retention the heartbeat definitions were last set up with (0 if they are gone, as then there is nothing left to retain)
+    crd = next(resource for resource in resources if resource['kind'] == 'CustomResourceDefinition')
+    try:
+        response = cluster.client(API.ExtensionsV1).read_custom_resource_definition(name = crd['metadata']['name'], _preload_content = False, _request_timeout = 60)
+    except ApiException as e:
+        if e.status == 404:
+            return 0
+        logger.error(f'Probe cleanup failed: {type(e)}: {e}')
+        raise e
+    return int((loads(response.data)['metadata'].get('annotations') or {}).get(HEARTBEAT_RETENTION_ANNOTATION) or 0)
+
+def wait_for_deletion(cluster: Cluster, informers: List[Informer], deadline: float, progress: Callable[[], str] = None):
+    # waits until the stores of all informers are empty, woken up by their deletion events (no repeated deletions or lists), and reports progress
+    try:
+        progress_timestamp = 0
+        while True:
+            cluster.changes.clear()
+            remaining = [item for informer in informers for item in informer.items()]
+            if not remaining:
+                break
+            now = time.monotonic()
+            names = ', '.join(item.name for item in remaining[:10]) + (', ...' if len(remaining) > 10 else '')
+            if now > deadline:
+                raise TimeoutError(f'{len(remaining)} resources not deleted in time: {names}')
+            if now >= progress_timestamp + CLEANUP_PROGRESS_SECONDS:
+                progress_timestamp = now
+                logger.info(f'Waiting for {len(remaining)} resources to be deleted: {names}' + (f' ({progress()})' if progress else ''))
+            cluster.changes.wait(min(deadline - now, CLEANUP_PROGRESS_SECONDS))
+    finally:
+        for informer in informers:
+            informer.stop()
+
+def count_custom_resources(cluster: Cluster, crds: List[Dict]) -> str:
+    # number of custom resources that must still be deleted before their definitions can be deleted (a single list request per definition,
+    # as the API server reports the number of remaining items alongside the first page)
+    counts = []
+    for crd in crds:
+        try:
+            page = cluster.list_raw(API.CustomResources, 'list_cluster_custom_object', group = crd['spec']['group'], version = crd['spec']['versions'][0]['name'], plural = crd['spec']['names']['plural'], limit = 1)
+            count = len(page['items']) + (page['metadata'].get('remainingItemCount') or 0)
+            if count:
+                counts.append(f'{count} {crd["spec"]["names"]["plural"]}')
+        except Exception:
+            pass # ignore as this is best-effort (e.g. definition already gone)
+    return ', '.join(counts) if counts else 'no custom resources left'
+
+def prune_heartbeats(cluster: Cluster, heartbeat_retention: int, run_id: str):
+    # delete the heartbeats of all but the most recent runs (run ids are timestamps), best-effort, as it runs in the background
+    try:
+        delete_heartbeats(cluster, lambda run_ids: set(sorted(run_ids | {run_id})[:-heartbeat_retention]))
+    except Exception as e:
+        logger.warning(f'Probe heartbeats of older runs not pruned: {type(e)}: {e}')
+
+def delete_heartbeats(cluster: Cluster, select_run_ids: Callable[[Set[str]], Set[str]] = None):
+    # delete heartbeats in shards (one collection per plural, run and zone), concurrently, of all runs or only of the selected ones (shards are found
+    # via their labels without listing the heartbeats); heartbeats without labels (sent by older probes) are left to their definitions
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers = CLEANUP_WORKERS, thread_name_prefix = 'probe-cleanup') as executor:
+        run_ids_by_plural = dict(zip(HEARTBEAT_PLURALS, executor.map(lambda plural: list_label_values(cluster, plural, HEARTBEAT_RUN_LABEL), HEARTBEAT_PLURALS)))
+        run_ids = set().union(*run_ids_by_plural.values())
+        selected_run_ids = select_run_ids(run_ids) if select_run_ids else run_ids
+        runs = [(plural, run_id) for plural, run_ids in run_ids_by_plural.items() for run_id in sorted(run_ids) if run_id in selected_run_ids]
+        zones_by_run = executor.map(lambda run: list_label_values(cluster, run[0], HEARTBEAT_ZONE_LABEL, f'{HEARTBEAT_RUN_LABEL}={run[1]}'), runs)
+        shards = [(plural, f'{HEARTBEAT_RUN_LABEL}={run_id},{HEARTBEAT_ZONE_LABEL}={zone}') for (plural, run_id), zones in zip(runs, zones_by_run) for zone in sorted(zones)]
+        if shards:
+            logger.info(f'Deleting probe heartbeats of {len(selected_run_ids)} runs in {len(shards)} shards...')
+        list(executor.map(lambda shard: delete_heartbeat_shard(cluster, *shard), shards))
+    if shards:
+        logger.info(f'Deleting probe heartbeats of {len(selected_run_ids)} runs took {time.monotonic() - start:.2f}s.')
+
+def delete_heartbeat_shard(cluster: Cluster, plural: str, label_selector: str):
+    try:
+        cluster.client(API.CustomResources).delete_collection_cluster_custom_object(group = 'chaos.gardener.cloud', version = 'v1', plural = plural, label_selector = label_selector, _request_timeout = 300)
+    except Exception as e:
+        logger.warning(f'Probe heartbeats {plural} matching {label_selector} not deleted: {type(e)}: {e}') # left to the next pruning or their definition
+
+def list_label_values(cluster: Cluster, plural: str, label: str, label_selector: str = None) -> Set[str]:
+    # distinct values of a label, one single-item list request per value (excluding the values found so far), so that the heartbeats themselves are never listed
+    values = set()
     while True:
+        selector = ','.join(filter(None, [label_selector, label, f'{label} notin ({",".join(sorted(values))})' if values else None]))
         try:
-            retries += 1
-            return cluster.sanitize_result(cluster.client(API.CustomResources).list_cluster_custom_object(group = 'chaos.gardener.cloud', version = 'v1', plural = plural, _request_timeout = 60))
-        except Exception as e:
-            logger.error(f'Reading custom resources failed: {type(e)}: {e}')
-            # logger.error(traceback.format_exc())
-            if retries > 5:
-                raise e
-            else:
-                time.sleep(retries * 5)
+            page = cluster.list_raw(API.CustomResources, 'list_cluster_custom_object', group = 'chaos.gardener.cloud', version = 'v1', plural = plural, label_selector = selector, limit = 1)
+        except ApiException as e:
+            if e.status == 404:
+                return values # definition doesn't exist (cluster is clean)
+            raise e
+        if not page['items']:
+            return values
+        values.add(page['items'][0]['metadata']['labels'][label])
+
+def read_events(cluster: Cluster) -> Iterator[Dict]:
+    # events are listed page by page and yielded lazily (retrying failed pages, and continuing inconsistently rather than failing if the listing takes too long)
+    return cluster.list_items(API.EventsV1, 'list_event_for_all_namespaces', retries = 5, inconsistent = True)
+
+def read_custom_resources(cluster: Cluster, plural: str, label_selector: str = None) -> Iterator[Dict]:
+    # custom resources are listed page by page and yielded lazily (retrying failed pages, and continuing inconsistently rather than failing if the listing takes too long)
+    return cluster.list_items(API.CustomResources, 'list_cluster_custom_object', retries = 5, inconsistent = True, group = 'chaos.gardener.cloud', version = 'v1', plural = plural, label_selector = label_selector)
+
+def watch_heartbeats(cluster: Cluster, metrics: Metrics, run_id: str) -> List[Informer]:
+    # heartbeats that were sent by any probe, here or cluster-internally (one per object or aggregated into windows), and heartbeats that were acknowledged
+    # by the cluster-internal web hook (we see only what successfully made it to the API server from within the cluster) are ingested as they arrive, but not kept in memory
+    def ingest(event_type, heartbeat):
+        if event_type != 'DELETED':
+            metrics.ingest(heartbeat)
+    return [cluster.informer(API.CustomResources, 'cluster_custom_object', label_selector = f'{HEARTBEAT_RUN_LABEL}={run_id}', namespaced = False, project = dict, params = {'group': 'chaos.gardener.cloud', 'version': 'v1', 'plural': plural}, handler = ingest, keep = False) for plural in HEARTBEAT_PLURALS]
+
+def start_informers(informers: List[Informer]) -> bool:
+    # informers are started as soon as possible (listing fails until the custom resource definitions are established) and keep watching thereafter
+    for informer in informers:
+        if not informer.started:
+            try:
+                informer.start()
+            except Exception as e:
+                logger.warning(f'Watching {informer} not yet possible: {type(e)}: {e}')
+    return all(informer.started for informer in informers)
+
+def assess_live(metrics: Metrics, thresholds: Thresholds, violated: Set[Tuple[str, str]]) -> bool:
+    # report downtime violations once per probe and zone as they happen and return whether there were new ones
+    new_violations = False
+    for probe in metrics:
+        for zone in probe:
+            if (probe.get_probe_name(), zone.get_zone_name()) not in violated:
+                violations = zone.assess_downtime(thresholds)
+                for v in violations:
+                    logger.error(v)
+                if violations:
+                    violated.add((probe.get_probe_name(), zone.get_zone_name()))
+                    new_violations = True
+    return new_violations
+
+def dump_progress(metrics: Metrics):
+    logger.info(f'Probe progress after {seconds2human((metrics.get_to_timestamp() - metrics.get_from_timestamp()) // 1000)}: ' + ', '.join(f'{m.get_probe_name()} {m.get_downtime()}s' for m in metrics) + ' total downtime so far.')
+
+def generate_metrics(cluster: Cluster, metrics: Metrics, heartbeat_informers: List[Informer], run_id: str, start_timestamp: int, stop_timestamp: int, api_probe_heartbeats_sent: int):
+    # read all heartbeats once more (consistently, while still watching them), as the watches may lag behind (e.g. while resuming after a back-off) and
+    # whatever they deliver after they were stopped is dropped (heartbeats that were already ingested are ingested again, which is harmless)
+    for plural in HEARTBEAT_PLURALS:
+        for heartbeat in read_custom_resources(cluster, plural, f'{HEARTBEAT_RUN_LABEL}={run_id}'):
+            metrics.ingest(heartbeat)
+    for informer in heartbeat_informers:
+        informer.stop()
 
-def generate_metrics(cluster: Cluster, start_timestamp: int, stop_timestamp: int, successful_api_probe_heartbeats: List[Dict], failed_api_probe_heartbeats: List[Dict]):
     # read events and dump them
     events = []
     regarding_max_width = 0
@@ -376,13 +534,13 @@ def generate_metrics(cluster: Cluster, start_timestamp: int, stop_timestamp: int
     for event in read_events(cluster):
         try:
             severity = event['type'][0] if 'type' in event and event['type'] else '?'
-            if 'metadata' in event and 'creation_timestamp' in event['metadata'] and event['metadata']['creation_timestamp']:
-                timestamp = event['metadata']['creation_timestamp'].timestamp()
-            elif 'event_time' in event and event['event_time']:
-                timestamp = event['event_time'].timestamp()
+            if 'metadata' in event and 'creationTimestamp' in event['metadata'] and event['metadata']['creationTimestamp']:
+                timestamp = parse_timestamp(event['metadata']['creationTimestamp']).timestamp()
+            elif 'eventTime' in event and event['eventTime']:
+                timestamp = parse_timestamp(event['eventTime']).timestamp()
             else:
                 timestamp = 0
-            if timestamp > 0 and (timestamp < (start_timestamp - 5) or timestamp > (stop_timestamp + 15)):
+            if timestamp > 0 and (timestamp < (start_timestamp / 1000 - 5) or timestamp > (stop_timestamp / 1000 + 15)):
                 continue
             if 'regarding' in event and event['regarding']:
                 regarding = \
@@ -403,16 +561,13 @@ def generate_metrics(cluster: Cluster, start_timestamp: int, stop_timestamp: int
     for event in sorted(events, key = lambda event: event['timestamp']):
         logger.debug(f'- ({event.severity}) {datetime.fromtimestamp(event.timestamp).strftime("%H:%M:%S")} {event.regarding:<{regarding_max_width}} {event.reason:<{reason_max_width}} {event.note}')
 
-    # read heartbeats and put them together
-    heartbeats = list(failed_api_probe_heartbeats)                              # heartbeats that failed to reach the API server, but we know of (what was sent successfully will be collected with the next line)
-    heartbeats.extend(read_custom_resources(cluster, 'heartbeats'))             # heartbeats that were sent by any probe, here or cluster-internally (we see only what successfully made it to the API server from within the cluster)
-    heartbeats.extend(read_custom_resources(cluster, 'acknowledgedheartbeats')) # heartbeats that were acknowledged by the cluster-internal web hook (we see only what successfully made it to the API server from within the cluster)
-    if not heartbeats:
+    # close the last phases of the ingested heartbeats
+    if next(iter(metrics), None) is None:
         raise AssertionError('Probe errored (no heartbeats or insufficient runtime)!')
-    metrics = Metrics(heartbeats, start_timestamp, stop_timestamp)
+    metrics.compute(stop_timestamp)
 
     # set sent counter for the API heartbeats that were sent from within this file (only for those we know how many were successfully and unsuccessfully sent)
-    metrics.get_metrics_for_probe('api').get_metrics_for_zone('regional').record_heartbeats_sent(len(successful_api_probe_heartbeats) + len(failed_api_probe_heartbeats))
+    metrics.get_metrics_for_probe('api').get_metrics_for_zone('regional').record_heartbeats_sent(api_probe_heartbeats_sent)
 
     # return the aggregated metrics object
     return metrics
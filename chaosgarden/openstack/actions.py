@@ -1,6 +1,5 @@
 import hashlib
 import random
-import time
 from datetime import datetime, timedelta
 from threading import Thread
 from typing import Dict
@@ -13,6 +12,8 @@ from chaosgarden.openstack import (create_sg, delete_sg, list_servers,
                                    terminate_server)
 from chaosgarden.util import (norm_filters, validate_duration, validate_mode,
                               validate_zone)
+from chaosgarden.util.engine import cooperative
+from chaosgarden.util.scheduler import Scheduler
 from chaosgarden.util.terminator import Terminator
 from chaosgarden.util.threading import launch_thread
 
@@ -68,6 +69,7 @@ def run_compute_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_compute_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_compute_failure_simulation(
         mode: str = 'terminate', # modes: 'terminate'|'restart'
         min_runtime: int = 0,
@@ -98,28 +100,29 @@ def run_compute_failure_simulation(
 
     # mess up servers continuously until terminated
     logger.info(f'Messing up servers matching {servers_filter} in zone {zone} ({mode} between {min_runtime}s and {max_runtime}s).')
-    schedule_by_name = {}
+    scheduler = Scheduler()
     terminator = Terminator(duration)
     while not terminator.is_terminated():
         try:
-            for server in list_servers(conn, zone, status, servers_filter):
-                server_name = server.name
+            server_by_name = {server.name: server for server in list_servers(conn, zone, status, servers_filter)}
+            for server_name, server in server_by_name.items():
+                if server_name not in scheduler:
+                    scheduler.schedule(server_name, datetime.fromisoformat(server.created_at.replace('Z', '+00:00')) + timedelta(seconds = random.randint(min_runtime, max_runtime)))
+                    logger.info(f'Scheduled server to {mode}: {server_name} at {scheduler.get(server_name)}')
+            scheduler.retain(server_by_name.keys())
+            for server_name in scheduler.pop_due(eligible = lambda server_name: server_name in server_by_name):
                 try:
-                    if server_name not in schedule_by_name:
-                        schedule_by_name[server_name] = datetime.fromisoformat(server.created_at.replace('Z', '+00:00')) + timedelta(seconds = random.randint(min_runtime, max_runtime))
-                        logger.info(f'Scheduled server to {mode}: {server_name} at {schedule_by_name[server_name]}')
-                    if datetime.now().astimezone() > schedule_by_name[server_name]:
-                        schedule_by_name[server_name] = datetime.now().astimezone() + reschedule_timedelta
-                        operation(conn, server)
+                    scheduler.schedule(server_name, datetime.now().astimezone() + reschedule_timedelta)
+                    operation(conn, server_by_name[server_name])
                 except Exception as e:
                     logger.error(f'Server failed to {mode}: {type(e)}: {e}')
                     # logger.error(traceback.format_exc())
-                    schedule_by_name[server_name] = datetime.now().astimezone() + timedelta(seconds = 1)
+                    scheduler.schedule(server_name, datetime.now().astimezone() + timedelta(seconds = 1))
         except Exception as e:
             logger.error(f'Servers failed to {mode}: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(1)
+            yield terminator.pause(scheduler.wait_time(1))
 
 
 #############################################
@@ -135,6 +138,7 @@ def run_network_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_network_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_network_failure_simulation(
         mode: str = 'total', # modes: 'total'|'ingress'|'egress'
         zone: str = None,
@@ -167,7 +171,7 @@ def run_network_failure_simulation(
             logger.error(f'Server blocking failed: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(1)
+            yield terminator.pause(1)
 
     # rollback
     rollback_network_failure_simulation(mode, zone, filters, configuration, secrets)
@@ -0,0 +1,211 @@
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_for_futures
+from functools import wraps
+from threading import Event, Lock, Thread, current_thread, local
+
+from logzero import logger
+
+ENGINE_WORKERS = 32 # max steps (blocking code between two yields, e.g. cloud SDK calls) executed at the same time across all cooperative tasks
+ENGINE_TICK = 0.05  # granularity in which cooperative sleeps check events they may be woken up by, but cannot listen to (not `NotifyingEvent`s)
+
+__lock = Lock()
+__loop = None
+__executor = None
+__active_tasks = 0
+__current = local()
+
+
+#########################
+# Cooperative Functions #
+#########################
+
+class NotifyingEvent(Event):
+    # `Event` that also calls its listeners when it is set, so that cooperative sleeps can wait for any of several events (in a thread or on the
+    # event loop) without polling them
+    def __init__(self):
+        super().__init__()
+        self._listeners = set()
+        self._listeners_lock = Lock()
+
+    def set(self):
+        super().set()
+        with self._listeners_lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def add_listener(self, listener):
+        with self._listeners_lock:
+            self._listeners.add(listener)
+
+    def remove_listener(self, listener):
+        with self._listeners_lock:
+            self._listeners.discard(listener)
+
+def cooperative(function):
+    # turns a generator function, that yields how long it wants to sleep between its steps, either as seconds or as `(seconds, *events)`
+    # to be woken up earlier when any of the events is set, into a regular blocking function; the same function can also be run cooperatively
+    # (see `launch_thread`), in which case many of them share one event loop and occupy a worker thread only while they step
+    @wraps(function)
+    def blocking(*args, **kwargs):
+        steps = function(*args, **kwargs)
+        while True:
+            try:
+                wait = next(steps)
+            except StopIteration as e:
+                return e.value
+            seconds, *events = wait if isinstance(wait, tuple) else (wait,)
+            if len(events) == 1:
+                events[0].wait(seconds)
+            else:
+                # block on one combined event that is set by whichever event is set first (no polling, unless some events cannot be listened to)
+                woken = Event()
+                unlisten, polled = listen(events, woken.set)
+                try:
+                    deadline = time.monotonic() + seconds
+                    while (remaining := deadline - time.monotonic()) > 0 and not woken.is_set() and not any(event.is_set() for event in polled):
+                        woken.wait(min(remaining, ENGINE_TICK) if polled else remaining)
+                finally:
+                    unlisten()
+    blocking.steps = function
+    return blocking
+
+def is_cooperative(function) -> bool:
+    return callable(getattr(function, 'steps', None))
+
+def listen(events, listener):
+    # calls the listener (from the setting thread) when any of the events is set, right away if one is set already; returns a function to stop
+    # listening and the events that cannot be listened to (plain `Event`s), which the caller must poll
+    notifying = [event for event in events if isinstance(event, NotifyingEvent)]
+    for event in notifying:
+        event.add_listener(listener)
+    if any(event.is_set() for event in notifying):
+        listener()
+    def unlisten():
+        for event in notifying:
+            event.remove_listener(listener)
+    return unlisten, [event for event in events if not isinstance(event, NotifyingEvent)]
+
+def current_task():
+    # task whose step the current thread executes, else the current thread itself (so that per-thread state such as termination works for both)
+    return getattr(__current, 'task', None) or current_thread()
+
+
+#####################
+# Cooperative Tasks #
+#####################
+
+class Task():
+    # `Thread`-compatible handle of a cooperative function run by the engine (can be joined like a thread or awaited from a coroutine)
+    def __init__(self, target, name = None, args = (), kwargs = None):
+        self.name    = name if name else target.__name__
+        self.daemon  = False
+        self._target = target
+        self._args   = args
+        self._kwargs = kwargs if kwargs else {}
+        self._future = Future()
+
+    def __repr__(self):
+        return f'<Task({self.name}, {"started" if self._future.running() else "initial"}{", stopped" if self._future.done() else ""})>'
+
+    def __await__(self):
+        return asyncio.wrap_future(self._future).__await__()
+
+    def start(self):
+        self._future.set_running_or_notify_cancel()
+        submit(self)
+
+    def join(self, timeout = None):
+        wait_for_futures([self._future], timeout)
+
+    def is_alive(self):
+        return self._future.running()
+
+    def result(self, timeout = None):
+        return self._future.result(timeout)
+
+
+##########
+# Engine #
+##########
+
+def submit(task: Task):
+    global __loop, __executor, __active_tasks
+    with __lock:
+        if not __loop:
+            # the event loop runs in a regular (non-daemon) thread while there are tasks, so that the process doesn't exit before they are done (same as with threads)
+            __loop = asyncio.new_event_loop()
+            __executor = ThreadPoolExecutor(max_workers = ENGINE_WORKERS, thread_name_prefix = 'chaosgarden-engine')
+            __loop.set_default_executor(__executor)
+            started = Event()
+            Thread(target = run_loop, name = 'chaosgarden-engine', args = (__loop, started)).start()
+            started.wait()
+        __active_tasks += 1
+        asyncio.run_coroutine_threadsafe(drive(task), __loop)
+
+def run_loop(loop, started):
+    asyncio.set_event_loop(loop)
+    loop.call_soon(started.set)
+    loop.run_forever()
+    loop.close()
+
+def step(task: Task, steps):
+    # executes the next step of a task in a worker thread, on behalf of the task
+    __current.task = task
+    try:
+        return False, next(steps)
+    except StopIteration as e:
+        return True, e.value
+    finally:
+        __current.task = None
+
+async def drive(task: Task):
+    global __loop, __executor, __active_tasks
+    loop = asyncio.get_running_loop()
+    try:
+        steps = task._target.steps(*task._args, **task._kwargs)
+        while True:
+            done, value = await loop.run_in_executor(None, step, task, steps)
+            if done:
+                task._future.set_result(value)
+                break
+            await sleep(value)
+    except Exception as e:
+        logger.error(f'Cooperative task {task.name} failed: {type(e)}: {e}')
+        task._future.set_exception(e)
+    except BaseException as e:
+        task._future.set_exception(e) # e.g. cancellation, joiners must not wait forever
+        raise e
+    finally:
+        with __lock:
+            __active_tasks -= 1
+            if __active_tasks == 0: # no more tasks, release event loop and workers (a new loop is started with the next task)
+                __executor.shutdown(wait = False)
+                __loop.stop()
+                __loop = __executor = None
+
+async def sleep(wait):
+    # sleeps on the event loop until any of the events is set (bridged into the loop by their listeners, so idle tasks cost no wake-ups)
+    seconds, *events = wait if isinstance(wait, tuple) else (wait,)
+    loop = asyncio.get_running_loop()
+    if not events:
+        await asyncio.sleep(seconds)
+        return
+    woken = loop.create_future()
+    def wake():
+        try:
+            loop.call_soon_threadsafe(lambda: woken.done() or woken.set_result(None))
+        except RuntimeError:
+            pass # loop already closed, i.e. nobody waits anymore
+    unlisten, polled = listen(events, wake)
+    try:
+        deadline = loop.time() + seconds
+        while (remaining := deadline - loop.time()) > 0 and not woken.done() and not any(event.is_set() for event in polled):
+            try:
+                await asyncio.wait_for(asyncio.shield(woken), min(remaining, ENGINE_TICK) if polled else remaining)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        unlisten()
@@ -0,0 +1,21 @@
+import time
+from threading import Lock
+
+
+class RateLimiter():
+    # token bucket that allows short bursts of up to `rate` operations, but no more than `rate` operations per second on average
+    def __init__(self, rate: float):
+        self._rate   = rate
+        self._tokens = rate
+        self._last   = time.monotonic()
+        self._lock   = Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._rate, self._tokens + (now - self._last) * self._rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0 # reserve the token now, pay for it by waiting outside the lock
+        if wait > 0:
+            time.sleep(wait)
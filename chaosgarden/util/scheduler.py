@@ -0,0 +1,72 @@
+from datetime import datetime
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import Callable, Hashable, Iterable, List
+
+
+class Scheduler():
+    # min-heap of due times by resource id, so that loops neither rescan all resources for due ones nor sleep longer (or shorter)
+    # than necessary; rescheduling and removal are lazy, i.e. superseded heap entries are skipped when they surface
+    def __init__(self):
+        self._due_by_id = {}
+        self._heap      = []      # (due time, sequence number, id), sequence number breaks ties without comparing ids
+        self._deferred  = []      # due entries that weren't eligible yet, checked again with the next `pop_due()`
+        self._sequence  = count()
+
+    def __contains__(self, id: Hashable) -> bool:
+        return id in self._due_by_id
+
+    def __len__(self) -> int:
+        return len(self._due_by_id)
+
+    def get(self, id: Hashable) -> datetime:
+        return self._due_by_id.get(id)
+
+    def schedule(self, id: Hashable, due: datetime):
+        self._due_by_id[id] = due
+        heappush(self._heap, (due, next(self._sequence), id))
+        if len(self._heap) > 2 * len(self._due_by_id) + 64: # compact heap, if mostly superseded entries remain
+            self._heap = [(due, next(self._sequence), id) for id, due in self._due_by_id.items()]
+            heapify(self._heap)
+            self._deferred = []
+
+    def unschedule(self, id: Hashable):
+        self._due_by_id.pop(id, None)
+
+    def retain(self, ids: Iterable[Hashable], now: datetime = None):
+        # forget resources that disappeared and missed their due time (resources that are only temporarily gone, e.g. while they
+        # restart, keep their future due time), so that the schedule doesn't grow without bound over long runs
+        now = now or datetime.now().astimezone()
+        ids = set(ids)
+        for id in [id for id, due in self._due_by_id.items() if id not in ids and due < now]:
+            del self._due_by_id[id]
+
+    def pop_due(self, eligible: Callable[[Hashable], bool] = None, now: datetime = None) -> List[Hashable]:
+        # unschedule and return all due ids in due order (due ids that aren't eligible stay scheduled)
+        now = now or datetime.now().astimezone()
+        candidates, self._deferred = self._deferred, []
+        while self._heap and self._heap[0][0] < now:
+            candidates.append(heappop(self._heap))
+        candidates.sort()
+        due_ids = []
+        deferred_ids = set()
+        for entry in candidates:
+            due, _, id = entry
+            if self._due_by_id.get(id) != due or id in deferred_ids:
+                continue # superseded (or duplicate) entry
+            if eligible and not eligible(id):
+                self._deferred.append(entry)
+                deferred_ids.add(id)
+                continue
+            del self._due_by_id[id]
+            due_ids.append(id)
+        return due_ids
+
+    def wait_time(self, max_wait: float, now: datetime = None) -> float:
+        # seconds until the next due time, but at most `max_wait` (deferred ids don't count, as only a new snapshot can make them eligible)
+        now = now or datetime.now().astimezone()
+        while self._heap and self._due_by_id.get(self._heap[0][2]) != self._heap[0][0]:
+            heappop(self._heap) # drop superseded entries
+        if not self._heap:
+            return max_wait
+        return min(max_wait, max(0, (self._heap[0][0] - now).total_seconds()))
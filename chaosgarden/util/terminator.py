@@ -1,11 +1,13 @@
 import inspect
 from datetime import datetime, timedelta
-from threading import current_thread, main_thread
+from threading import Event, main_thread
+from typing import Tuple
 
 from logzero import logger
 
+from chaosgarden.util.engine import current_task
 from chaosgarden.util.threading import (current_time, install_signal_handlers,
-                                        is_terminated)
+                                        termination_event)
 
 # install signal handlers automatically when terminators are used (also critical with `chaostoolkit` CLI and background mode)
 # to terminate all active threads on involuntary signals (note that SIGKILL cannot be handled)
@@ -20,9 +22,10 @@ class Terminator():
         self._end_time          = self._start_time + timedelta(seconds = self._duration) if self._duration > 0 else None
         self._invocations       = 0
         self._single_invocation = True if self._duration == 0 else False
+        self._termination       = termination_event(current_task()) # looked up once, as it is replaced after all threads were signalled (see `signal_all_threads()`)
 
     def _log_termination(self, reason):
-        logger.info(f'{reason} for {current_thread().name if current_thread() != main_thread() else self._caller} at {current_time()} ({(datetime.now() - self._start_time).total_seconds():.1f}s net duration). Terminating now.')
+        logger.info(f'{reason} for {current_task().name if current_task() != main_thread() else self._caller} at {current_time()} ({(datetime.now() - self._start_time).total_seconds():.1f}s net duration). Terminating now.')
 
     def is_terminated(self):
         single_invocation_performed = self._single_invocation and self._invocations == 1
@@ -31,8 +34,20 @@ class Terminator():
         time_is_up = self._end_time and datetime.now() > self._end_time
         if time_is_up:
             self._log_termination(f'Time is up')
-        termination_requested = is_terminated(current_thread())
+        termination_requested = self._termination.is_set()
         if termination_requested:
             self._log_termination(f'Termination requested')
         self._invocations += 1
         return single_invocation_performed or time_is_up or termination_requested
+
+    def pause(self, timeout: float, *events: Event) -> Tuple:
+        # to be yielded by cooperative functions: sleep up to `timeout` seconds, but wake up right away when termination is requested, the duration
+        # is over or any of the (optional) other events is set
+        return (self._time_left(timeout), self._termination, *events)
+
+    def _time_left(self, timeout: float) -> float:
+        if self._single_invocation and self._invocations > 0:
+            return 0 # no need to wait, `is_terminated()` is already decided
+        if self._end_time:
+            return min(timeout, max(0, (self._end_time - datetime.now()).total_seconds() + 0.001))
+        return timeout
@@ -1,48 +1,68 @@
 import signal
 import sys
+import time
 import traceback
 from datetime import datetime
 from threading import Lock, Thread, current_thread, enumerate
-from typing import Dict
+from typing import Dict, Union
 
 from logzero import logger
 
+from chaosgarden.util.engine import NotifyingEvent, Task, is_cooperative
+
 __lock = Lock()
-__threads : Dict[Thread, bool] = {}
+__threads : Dict[Union[Thread, Task], NotifyingEvent] = {}  # termination event per background thread (or task), set when it shall terminate
+__termination = NotifyingEvent()                             # termination event for all other threads (e.g. the main thread), set when all shall terminate (and replaced right after, see below)
 __in_termination = False
 __org_signal_handlers = None
 
 
+def termination_event(thread) -> NotifyingEvent:
+    # lock-free, as lookups are atomic and events are never replaced (only removed after the thread was joined), except for the event of all other
+    # threads, which is why terminators look it up only once when they are created
+    return __threads.get(thread, __termination)
+
 def is_terminated(thread):
-    with __lock:
-        try:
-            return __threads[thread]
-        except KeyError:
-            return __in_termination
+    return termination_event(thread).is_set()
 
-def launch_thread(target, name = None, args = (), kwargs = None) -> Thread:
+def launch_thread(target, name = None, args = (), kwargs = None) -> Union[Thread, Task]:
     with __lock:
         if not __in_termination:
-            thread = Thread(target = target, name = name if name else target.__name__, args = args, kwargs = kwargs)
-            logger.info(f'Launching background thread {thread.name}.')
-            __threads[thread] = False
+            if is_cooperative(target): # run cooperatively on the shared event loop, but return a `Thread`-compatible (and awaitable) handle
+                thread = Task(target = target, name = name if name else target.__name__, args = args, kwargs = kwargs)
+                logger.info(f'Launching background task {thread.name}.')
+            else:
+                thread = Thread(target = target, name = name if name else target.__name__, args = args, kwargs = kwargs)
+                logger.info(f'Launching background thread {thread.name}.')
+            __threads[thread] = NotifyingEvent()
         else:
             thread = Thread() # do not launch anything, but return proper `Thread`` object, so that consecutive calls such as `join()` pass without exception
         thread.start()
         return thread
 
-def terminate_thread(thread):
+def terminate_thread(thread, signalled_at = None):
+    signalled_at = signalled_at or time.monotonic()
     with __lock:
-        try:
-            __threads[thread] = True
-        except KeyError:
-            pass
+        if thread in __threads:
+            __threads[thread].set()
     thread.join()
     with __lock:
-        try:
-            del __threads[thread]
-        except KeyError:
-            pass
+        __threads.pop(thread, None)
+    logger.info(f'Background thread {thread.name} terminated {(time.monotonic() - signalled_at) * 1000:.0f}ms after it was signalled.')
+
+def signal_all_threads():
+    # signal all background threads (and the terminators of all other threads) to terminate without joining them (unlike below),
+    # so that this can also be called from within a background thread, e.g. to abort an experiment early; the event of all other
+    # threads is replaced right away, so that only terminators that exist now are affected, not those of later simulations or probes
+    # (e.g. of the next experiment in the same process)
+    global __termination
+    with __lock:
+        logger.info(f'Signaling all {len(__threads)} active background threads and all other threads to terminate.')
+        __termination.set()
+        if not __in_termination:
+            __termination = NotifyingEvent()
+        for event in __threads.values():
+            event.set()
 
 def terminate_all_threads():
     global __in_termination
@@ -50,6 +70,7 @@ def terminate_all_threads():
         logger.info(f'Looking for still active background threads. Signaling and joining all {len(__threads)} active background threads.')
         if not __in_termination:
             __in_termination = True
+            __termination.set()
         else:
             for thread in enumerate():
                 if thread != current_thread():
@@ -57,14 +78,15 @@ def terminate_all_threads():
                     traceback.print_stack(sys._current_frames()[thread.ident])
     while True:
         try:
+            signalled_at = time.monotonic()
             with __lock:
                 threads = list(__threads.keys())
                 for thread in threads: # shutdown performance optimization: signal all threads in batch before we join them one by one
-                    __threads[thread] = True
+                    __threads[thread].set()
             for thread in threads:
                 logger.info(f'Waiting for background thread {thread.name} to end.')
-                terminate_thread(thread)
-            logger.info(f'Shutdown completed. All background threads terminated at {current_time()} (main thread must terminate on its own accord).')
+                terminate_thread(thread, signalled_at)
+            logger.info(f'Shutdown completed. All background threads terminated at {current_time()} within {(time.monotonic() - signalled_at) * 1000:.0f}ms (main thread must terminate on its own accord).')
             return
         except Exception as e:
             logger.error(f'Shutdown failed: {type(e)}: {e}')
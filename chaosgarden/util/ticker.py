@@ -0,0 +1,22 @@
+import math
+import time
+
+
+class Ticker():
+    # fixed-rate ticks on the monotonic clock (fixed delays drift by the time spent in between), aligned to multiples of the interval on the
+    # wall clock (so that ticks of different probes line up); ticks that were missed by more than one interval are skipped, not caught up
+    def __init__(self, interval: float):
+        wall = time.time()
+        self._interval   = interval
+        self._wall       = math.ceil(wall / interval) * interval # wall clock time of the first tick
+        self._monotonic  = time.monotonic() + self._wall - wall   # monotonic time of the first tick
+        self._tick       = -1
+
+    def advance(self) -> int:
+        # move on to the next tick that wasn't missed and return its (scheduled) wall clock time in milliseconds
+        self._tick = max(self._tick + 1, math.floor((time.monotonic() - self._monotonic) / self._interval))
+        return round((self._wall + self._tick * self._interval) * 1000)
+
+    def wait_time(self) -> float:
+        # seconds until the current tick is due
+        return max(0, self._monotonic + self._tick * self._interval - time.monotonic())
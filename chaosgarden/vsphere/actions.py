@@ -10,6 +10,8 @@ from logzero import logger
 
 from chaosgarden.util import (norm_filters, validate_duration, validate_mode,
                               validate_zone)
+from chaosgarden.util.engine import cooperative
+from chaosgarden.util.scheduler import Scheduler
 from chaosgarden.util.terminator import Terminator
 from chaosgarden.util.threading import launch_thread
 from chaosgarden.vsphere import (delete_instances, list_instances_copy,
@@ -76,6 +78,7 @@ def run_compute_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_compute_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_compute_failure_simulation(
         mode: str = 'terminate', # modes: 'terminate'|'restart'
         min_runtime: int = 0,
@@ -108,25 +111,26 @@ def run_compute_failure_simulation(
 
     # mess up instances continuously until terminated
     logger.info(f'Messing up instances matching {virtual_machines_filter} in zone {zone} ({mode} between {min_runtime}s and {max_runtime}s).')
-    schedule_by_name = {}
+    scheduler = Scheduler()
     terminator = Terminator(duration)
     while not terminator.is_terminated():
         try:
             instances = []
-            for instance in list_instances_copy(si, zone, virtual_machines_filter):
-                if eligible(instance):
-                    if instance.name not in schedule_by_name:
-                        schedule_by_name[instance.name] = instance.bootTime.astimezone() + timedelta(seconds = random.randint(min_runtime, max_runtime))
-                        logger.info(f'Scheduled virtual machine to {mode}: {instance.name} at {schedule_by_name[instance.name]}')
-                    if datetime.now().astimezone() > schedule_by_name[instance.name]:
-                        schedule_by_name[instance.name] = datetime.now().astimezone() + reschedule_timedelta
-                        instances.append(instance)
+            instance_by_name = {instance.name: instance for instance in list_instances_copy(si, zone, virtual_machines_filter)}
+            for instance_name, instance in instance_by_name.items():
+                if eligible(instance) and instance_name not in scheduler:
+                    scheduler.schedule(instance_name, instance.bootTime.astimezone() + timedelta(seconds = random.randint(min_runtime, max_runtime)))
+                    logger.info(f'Scheduled virtual machine to {mode}: {instance_name} at {scheduler.get(instance_name)}')
+            scheduler.retain(instance_by_name.keys())
+            for instance_name in scheduler.pop_due(eligible = lambda instance_name: instance_name in instance_by_name and eligible(instance_by_name[instance_name])):
+                scheduler.schedule(instance_name, datetime.now().astimezone() + reschedule_timedelta)
+                instances.append(instance_by_name[instance_name])
             operation(client, instances)
         except Exception as e:
             logger.error(f'Virtual machines failed to {mode}: {type(e)}: {e}')
             # logger.error(traceback.format_exc())
         finally:
-            time.sleep(1)
+            yield terminator.pause(scheduler.wait_time(1))
 
 
 #############################################
@@ -142,6 +146,7 @@ def run_network_failure_simulation_in_background(
         secrets: Secrets = None) -> Thread:
     return launch_thread(target = run_network_failure_simulation, kwargs = locals())
 
+@cooperative
 def run_network_failure_simulation(
         mode: str = 'total', # modes: 'total'|'ingress'|'egress'
         zone: str = None,
@@ -179,7 +184,7 @@ def run_network_failure_simulation(
     included_uuids = set(uuids)
     terminator = Terminator(duration)
     while not terminator.is_terminated():
-        time.sleep(1)
+        yield terminator.pause(1)
         vms_to_block = list_instances_copy(si, zone, virtual_machines_filter)
         new_vms = [vm for vm in vms_to_block if not vm.instanceUuid in included_uuids]
         if new_vms:
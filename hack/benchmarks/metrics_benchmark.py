@@ -0,0 +1,106 @@
+import random
+import sys
+import time
+
+from chaosgarden.k8s.probe.metrics import (INITIAL_FAILURE_EXCLUSION, INITIAL_GAP_TOLERATION, REGULAR_GAP_TOLERATION, HeartbeatPhaseSeries,
+                                           HeartbeatState, HeartbeatStateSeries)
+
+HOURS = 24
+PROBES = ['api', 'api-external', 'api-internal', 'dns-external', 'dns-internal', 'dns-management', 'pod-lifecycle', 'web-hook']
+ZONES = ['world-1a', 'world-1b', 'world-1c']
+FROM_TIMESTAMP = 1_700_000_000_000 # milliseconds
+TO_TIMESTAMP = FROM_TIMESTAMP + HOURS * 3600 * 1000
+
+
+def synthetic_heartbeats(probe, zone):
+    # one heartbeat per second (as sent by the probe pods), with a few outages and lost heartbeats
+    rnd = random.Random(f'{probe}-{zone}')
+    heartbeats = []
+    outage_until = 0
+    for timestamp in range(FROM_TIMESTAMP, TO_TIMESTAMP, 1000):
+        if rnd.random() < 0.0005:
+            outage_until = timestamp + rnd.randrange(10, 300) * 1000
+        if rnd.random() < 0.01:
+            continue # lost heartbeat
+        heartbeats.append((timestamp, HeartbeatState.NOT_READY if timestamp < outage_until else HeartbeatState.READY, 'Timeout' if timestamp < outage_until else None))
+    return heartbeats
+
+class LegacyHeartbeatStateSeries():
+    # dict of timestamps, re-sorted whenever accessed, as before the columnar series
+    def __init__(self, probe):
+        self._probe = probe
+        self._series = {}
+
+    def record(self, timestamp, ready, payload = None):
+        self._series[timestamp] = (ready, payload)
+
+    def get_timestamps(self, from_timestamp = 0, to_timestamp = sys.maxsize):
+        return sorted([timestamp for timestamp in self._series.keys() if timestamp >= from_timestamp and timestamp < to_timestamp])
+
+    def compute(self, from_timestamp, to_timestamp):
+        for timestamp in self.get_timestamps(to_timestamp = from_timestamp + max(0, INITIAL_FAILURE_EXCLUSION[self._probe])):
+            if self._series[timestamp][0] == HeartbeatState.NOT_READY:
+                self._series.pop(timestamp)
+            else:
+                break
+        initial_gap = max(0, INITIAL_GAP_TOLERATION[self._probe])
+        regular_gap = max(1, REGULAR_GAP_TOLERATION[self._probe])
+        timestamps = self.get_timestamps()
+        if timestamps[0] > from_timestamp + initial_gap:
+            self.record(from_timestamp + initial_gap, HeartbeatState.UNKNOWN, 'Gap (Initial)')
+        if timestamps[-1] + regular_gap < to_timestamp:
+            self.record(to_timestamp, HeartbeatState.UNKNOWN, 'Gap (Final)')
+        timestamps = self.get_timestamps()
+        prev_timestamp = timestamps[0]
+        for next_timestamp in timestamps[1:]:
+            if next_timestamp > prev_timestamp + regular_gap:
+                for timestamp in range(prev_timestamp + regular_gap, next_timestamp, regular_gap):
+                    self.record(timestamp, HeartbeatState.UNKNOWN, 'Gap')
+            prev_timestamp = next_timestamp
+
+    def phases(self):
+        timestamps = self.get_timestamps()
+        phases, downtime = [], 0
+        prev_timestamp = timestamps[0]
+        prev_state = self._series[prev_timestamp][0]
+        for next_timestamp in timestamps[1:]:
+            next_state = self._series[next_timestamp][0]
+            if next_state != prev_state or next_timestamp == timestamps[-1]:
+                phases.append((prev_state, next_timestamp - prev_timestamp))
+                downtime += next_timestamp - prev_timestamp if prev_state != HeartbeatState.READY else 0
+                prev_timestamp, prev_state = next_timestamp, next_state
+        return downtime / 1000
+
+def record(series_class, heartbeats_by_series):
+    series_by_key = {}
+    for (probe, zone), heartbeats in heartbeats_by_series.items():
+        series = series_by_key[(probe, zone)] = series_class(probe)
+        for heartbeat in heartbeats:
+            series.record(*heartbeat)
+    return series_by_key
+
+def legacy_compute(series):
+    series.compute(FROM_TIMESTAMP, TO_TIMESTAMP)
+    return series.phases()
+
+def columnar_compute(series):
+    series.compute(FROM_TIMESTAMP, TO_TIMESTAMP)
+    phases = HeartbeatPhaseSeries(series._probe)
+    phases.compute(series)
+    return phases.get_downtime()
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+if __name__ == '__main__':
+    heartbeats_by_series = {(probe, zone): synthetic_heartbeats(probe, zone) for probe in PROBES for zone in ZONES}
+    print(f'Computing {HOURS}h of heartbeats for {len(PROBES)} probes in {len(ZONES)} zones ({sum(len(heartbeats) for heartbeats in heartbeats_by_series.values())} heartbeats):')
+    legacy_record_duration, legacy_series = measure(record, LegacyHeartbeatStateSeries, heartbeats_by_series)
+    legacy_compute_duration, legacy_downtimes = measure(lambda: [legacy_compute(series) for series in legacy_series.values()])
+    columnar_record_duration, columnar_series = measure(record, HeartbeatStateSeries, heartbeats_by_series)
+    columnar_compute_duration, columnar_downtimes = measure(lambda: [columnar_compute(series) for series in columnar_series.values()])
+    assert legacy_downtimes == columnar_downtimes, f'Result mismatch!'
+    print(f'- legacy   record {legacy_record_duration * 1000:>9.1f}ms, compute {legacy_compute_duration * 1000:>9.1f}ms')
+    print(f'- columnar record {columnar_record_duration * 1000:>9.1f}ms, compute {columnar_compute_duration * 1000:>9.1f}ms ({legacy_compute_duration / columnar_compute_duration:.1f}x)')
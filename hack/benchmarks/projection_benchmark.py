@@ -0,0 +1,64 @@
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from kubernetes.client import ApiClient
+
+from chaosgarden.k8s.api.cluster import Cluster
+from chaosgarden.k8s.api.projections import PodProjection, loads
+
+PODS = 20_000
+ZONES = ['world-1a', 'world-1b', 'world-1c']
+NAMESPACES = ['kube-system', 'garden', 'shoot--project--cluster'] + [f'shoot--project--cluster-{i}' for i in range(50)]
+COMPONENTS = ['kube-apiserver', 'etcd-main', 'etcd-events', 'kube-controller-manager', 'kube-scheduler', 'coredns', 'vpn-seed-server', 'machine-controller-manager']
+
+
+def synthetic_pod_list(n):
+    # realistically sized pods (managed fields, env, volumes, container statuses) as returned by the API server
+    rnd = random.Random(42)
+    items = []
+    for i in range(n):
+        component = rnd.choice(COMPONENTS)
+        name = f'{component}-{rnd.getrandbits(32):08x}'
+        items.append({
+            'metadata': {
+                'uid': f'{i:032x}', 'name': name, 'namespace': rnd.choice(NAMESPACES), 'generateName': f'{component}-', 'resourceVersion': str(i), 'creationTimestamp': '2024-01-01T00:00:00Z',
+                'labels': {'app': component, 'role': 'controlplane', 'pod-template-hash': f'{rnd.getrandbits(32):08x}'},
+                'annotations': {'checksum/config': f'{rnd.getrandbits(128):032x}', 'checksum/secret': f'{rnd.getrandbits(128):032x}'},
+                'ownerReferences': [{'apiVersion': 'apps/v1', 'kind': 'ReplicaSet', 'name': component, 'uid': f'{i:032x}', 'controller': True, 'blockOwnerDeletion': True}],
+                'managedFields': [{'manager': 'kube-controller-manager', 'operation': 'Update', 'apiVersion': 'v1', 'time': '2024-01-01T00:00:00Z', 'fieldsType': 'FieldsV1', 'fieldsV1': {'f:metadata': {'f:labels': {'.': {}, 'f:app': {}}}}}]},
+            'spec': {
+                'nodeName': f'node-{rnd.randrange(100)}',
+                'containers': [{'name': component, 'image': f'registry.example.com/{component}:v1.0.0', 'args': [f'--flag-{j}=value' for j in range(10)],
+                                'env': [{'name': f'ENV_{j}', 'value': f'value-{j}'} for j in range(10)],
+                                'resources': {'requests': {'cpu': '100m', 'memory': '128Mi'}, 'limits': {'memory': '1Gi'}},
+                                'volumeMounts': [{'name': f'volume-{j}', 'mountPath': f'/mnt/{j}'} for j in range(5)]}],
+                'volumes': [{'name': f'volume-{j}', 'secret': {'secretName': f'secret-{j}'}} for j in range(5)]},
+            'status': {
+                'phase': 'Running', 'podIP': '10.0.0.1', 'startTime': '2024-01-01T00:00:00Z',
+                'conditions': [{'type': t, 'status': 'True', 'lastTransitionTime': '2024-01-01T00:00:00Z'} for t in ['Initialized', 'Ready', 'ContainersReady', 'PodScheduled']],
+                'containerStatuses': [{'name': component, 'ready': True, 'restartCount': 0, 'image': f'registry.example.com/{component}:v1.0.0', 'imageID': 'sha256:0', 'containerID': 'containerd://0', 'state': {'running': {'startedAt': '2024-01-01T00:00:00Z'}}}]}})
+    return json.dumps({'apiVersion': 'v1', 'kind': 'PodList', 'metadata': {'resourceVersion': str(n)}, 'items': items}).encode()
+
+def legacy_pipeline(data):
+    # model deserialization, `to_dict()`, camelCase conversion, sanitization and `Box` as before the projections
+    cluster = Cluster.__new__(Cluster) # only the (stateless) conversion helpers are used, no connection needed
+    return cluster.boxed(cluster.sanitize_result(cluster.convert_snakecase_to_camelcase_dict_keys(ApiClient().deserialize(SimpleNamespace(data = data), 'V1PodList').to_dict())))
+
+def projection_pipeline(data):
+    return [PodProjection(pod) for pod in loads(data)['items']]
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, len(result)
+
+if __name__ == '__main__':
+    data = synthetic_pod_list(PODS)
+    print(f'Decoding {PODS} synthetic pods ({len(data) / 1024 / 1024:.1f}MiB):')
+    legacy_duration, legacy_count = measure(legacy_pipeline, data)
+    projection_duration, projection_count = measure(projection_pipeline, data)
+    assert legacy_count == projection_count, f'Result mismatch ({legacy_count} != {projection_count})!'
+    print(f'- legacy     {legacy_duration * 1000:>9.1f}ms')
+    print(f'- projection {projection_duration * 1000:>9.1f}ms ({legacy_duration / projection_duration:.1f}x, using {loads.__module__})')
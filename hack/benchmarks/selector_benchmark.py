@@ -0,0 +1,73 @@
+import random
+import re
+import time
+
+from chaosgarden.k8s import Selector
+
+PODS = 100_000
+ZONES = ['world-1a', 'world-1b', 'world-1c']
+NAMESPACES = ['kube-system', 'garden', 'shoot--project--cluster'] + [f'shoot--project--cluster-{i}' for i in range(50)]
+COMPONENTS = ['kube-apiserver', 'etcd-main', 'etcd-events', 'kube-controller-manager', 'kube-scheduler', 'coredns', 'vpn-seed-server', 'machine-controller-manager']
+SELECTORS = {
+    'node':     'topology.kubernetes.io/zone=world-1a,worker.gardener.cloud/pool=cpu-worker',
+    'metadata': 'namespace=shoot--project--cluster,name=~kube-apiserver.*',
+    'owner':    'kind!=DaemonSet,name=~etcd-.*',
+    'mixed':    'namespace!=kube-system,name!~coredns.*,uid=~.*'}
+
+
+def legacy_matches(requirement, labels):
+    # per-label scan with an on-the-fly regex as before the selector was compiled
+    default = False if requirement.op.startswith('=') else True if requirement.op.startswith('!') else None
+    for key, val in labels.items():
+        if requirement.key == key:
+            if requirement.op == '==':
+                if requirement.val == val:
+                    return True
+            if requirement.op == '!=':
+                if requirement.val == val:
+                    return False
+            if requirement.op == '=~':
+                if re.match(f'^{requirement.val}', val):
+                    return True
+            if requirement.op == '!~':
+                if re.match(f'^{requirement.val}', val):
+                    return False
+    return default
+
+def legacy_filter_by_selector(selector, entity_to_labels):
+    result = []
+    for (entity, labels) in entity_to_labels:
+        matches = True
+        for r in selector:
+            matches &= legacy_matches(r, labels)
+        if matches:
+            result.append(entity)
+    return result
+
+def synthetic_pods(n):
+    rnd = random.Random(42)
+    pods = []
+    for i in range(n):
+        component = rnd.choice(COMPONENTS)
+        pods.append({
+            'node':     {'topology.kubernetes.io/zone': rnd.choice(ZONES), 'worker.gardener.cloud/pool': rnd.choice(['cpu-worker', 'gpu-worker']), 'kubernetes.io/os': 'linux', 'kubernetes.io/arch': 'amd64', 'node.kubernetes.io/instance-type': 'm5.large'},
+            'metadata': {'uid': f'{i:032x}', 'name': f'{component}-{rnd.getrandbits(32):08x}', 'namespace': rnd.choice(NAMESPACES), 'generateName': f'{component}-', 'resourceVersion': str(i)},
+            'owner':    {'apiVersion': 'apps/v1', 'kind': rnd.choice(['ReplicaSet', 'StatefulSet', 'DaemonSet']), 'name': component, 'uid': f'{i:032x}', 'controller': True}})
+    return pods
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, len(result)
+
+if __name__ == '__main__':
+    pods = synthetic_pods(PODS)
+    print(f'Matching {PODS} synthetic pods:')
+    for name, selector_string in SELECTORS.items():
+        selector = Selector.parse(selector_string)
+        field = 'metadata' if name == 'mixed' else name
+        entity_to_labels = [(pod, pod[field]) for pod in pods]
+        legacy_duration, legacy_count = measure(legacy_filter_by_selector, selector.requirements, entity_to_labels)
+        compiled_duration, compiled_count = measure(lambda: [pod for pod, labels in entity_to_labels if selector.matches(labels)])
+        assert legacy_count == compiled_count, f'Result mismatch for {name} selector ({legacy_count} != {compiled_count})!'
+        print(f'- {name:<8} {selector_string:<78} {compiled_count:>6} matches: legacy {legacy_duration * 1000:>7.1f}ms, compiled {compiled_duration * 1000:>7.1f}ms ({legacy_duration / compiled_duration:.1f}x)')
@@ -0,0 +1,35 @@
+from chaosgarden.k8s.probe.metrics import Metrics
+
+FROM_TIMESTAMP = 1_700_000_000_000
+TO_TIMESTAMP = FROM_TIMESTAMP + 60_000
+
+
+def heartbeat(probe, zone, timestamp, ready = True):
+    return {'metadata': {'name': f'{probe}-probe-{zone}-{timestamp}'}, 'ready': ready}
+
+def heartbeats(probe, zone, from_timestamp, to_timestamp, interval = 1000):
+    return [heartbeat(probe, zone, timestamp) for timestamp in range(from_timestamp, to_timestamp + 1, interval)]
+
+def test_zone_with_only_heartbeats_after_the_end_is_not_reported():
+    # heartbeats of a zone that arrive (and are ingested) only after the end are dropped along with the zone, as if they had never been ingested
+    late = heartbeats('dns-internal', 'world-1b', TO_TIMESTAMP + 20_000, TO_TIMESTAMP + 30_000)
+    on_time = heartbeats('dns-internal', 'world-1a', FROM_TIMESTAMP, TO_TIMESTAMP)
+    metrics = Metrics(from_timestamp = FROM_TIMESTAMP)
+    for hb in on_time + late:
+        metrics.ingest(hb)
+    metrics.compute(TO_TIMESTAMP)
+    baseline = Metrics(on_time, FROM_TIMESTAMP, TO_TIMESTAMP)
+
+    assert [zone.get_zone_name() for probe in metrics for zone in probe] == ['world-1a']
+    assert [(zone.get_heartbeats_received(), zone.get_heartbeats_gaps(), zone.get_downtime()) for probe in metrics for zone in probe] == \
+           [(zone.get_heartbeats_received(), zone.get_heartbeats_gaps(), zone.get_downtime()) for probe in baseline for zone in probe]
+
+def test_probe_with_only_heartbeats_after_the_end_is_not_reported():
+    metrics = Metrics(from_timestamp = FROM_TIMESTAMP)
+    for hb in heartbeats('api', 'regional', FROM_TIMESTAMP, TO_TIMESTAMP) + heartbeats('web-hook', 'regional', TO_TIMESTAMP + 20_000, TO_TIMESTAMP + 30_000):
+        metrics.ingest(hb)
+    snapshot = metrics.snapshot(TO_TIMESTAMP)
+    metrics.compute(TO_TIMESTAMP)
+
+    assert [probe.get_probe_name() for probe in snapshot] == ['api']
+    assert [probe.get_probe_name() for probe in metrics] == ['api']